@@ -0,0 +1,547 @@
+"""
+Vectorized spending analytics over an in-memory columnar copy of expenses.
+
+`ExpenseColumns` holds one NumPy array per column: ids, amounts, UTC day
+ordinals (days since 1970-01-01), months since 1970-01 and category
+codes into a list of lower-cased category names, 28 bytes per expense. The first use
+loads the table in chunks. After that `refresh()` compares the expenses
+data version and, when it has moved, reads only the rows above the id
+watermark, so the copy follows inserts from every worker without
+rescanning. Ids are allocated before commit, so a row can become visible
+after a higher id; the last ANALYTICS_ID_WINDOW ids below the watermark
+are re-read and de-duplicated to catch those.
+
+The reports below work on whole arrays (bincount, lexsort, cumsum) rather
+than row by row. They back the GET /analytics/* endpoints and the agent's
+spending_analytics tool.
+
+    python -m app.analytics   (loads the table and prints a summary)
+"""
+
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+from sqlalchemy import text
+
+from .data_version import current_version
+from .database import engine
+
+logger = logging.getLogger("analytics")
+
+# Ids below the watermark re-read on every refresh, for late commits
+ANALYTICS_ID_WINDOW = int(os.getenv("ANALYTICS_ID_WINDOW", "1000"))
+ANALYTICS_LOAD_CHUNK = int(os.getenv("ANALYTICS_LOAD_CHUNK", "50000"))
+_INITIAL_CAPACITY = 1024
+COLUMNS = ("ids", "amounts", "days", "months", "codes")
+EPOCH = date(1970, 1, 1)
+
+LOAD_SQL = """
+SELECT id, amount, category,
+       (date AT TIME ZONE 'UTC')::date - DATE '1970-01-01' AS day
+FROM expenses
+WHERE date IS NOT NULL AND id > :after
+"""
+
+
+@dataclass
+class Columns:
+    """Consistent read-only view of the copy at one point in time."""
+
+    ids: np.ndarray
+    amounts: np.ndarray
+    days: np.ndarray
+    months: np.ndarray
+    codes: np.ndarray
+    categories: Tuple[str, ...]
+
+    def code(self, category: Optional[str]) -> Optional[int]:
+        """Code of `category`, -1 when it never occurs, None for all."""
+        if not category:
+            return None
+        try:
+            return self.categories.index(category.strip().lower())
+        except ValueError:
+            return -1
+
+
+class ExpenseColumns:
+    """Append-only columnar copy of the expenses table."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.size = 0
+        self.ids = np.empty(0, dtype=np.int64)
+        self.amounts = np.empty(0, dtype=np.float64)
+        self.days = np.empty(0, dtype=np.int32)
+        self.months = np.empty(0, dtype=np.int32)
+        self.codes = np.empty(0, dtype=np.int32)
+        self.categories: List[str] = []
+        self._code_of: Dict[str, int] = {}
+        self.version: Optional[int] = None
+        self.watermark = 0
+        self.refreshed_at: Optional[datetime] = None
+
+    def _grow(self, needed: int) -> None:
+        capacity = len(self.ids)
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2, _INITIAL_CAPACITY)
+        for name in COLUMNS:
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[: self.size] = old[: self.size]
+            setattr(self, name, new)
+
+    def _append(self, rows: Sequence[Any], known: np.ndarray) -> int:
+        ids = np.fromiter((row.id for row in rows), dtype=np.int64, count=len(rows))
+        fresh = ~np.isin(ids, known) if len(known) else np.ones(len(rows), bool)
+        count = int(fresh.sum())
+        if not count:
+            return 0
+        codes = np.empty(len(rows), dtype=np.int32)
+        for i, row in enumerate(rows):
+            name = (row.category or "").strip().lower()
+            code = self._code_of.get(name)
+            if code is None:
+                code = self._code_of[name] = len(self.categories)
+                self.categories.append(name)
+            codes[i] = code
+        amounts = np.fromiter((row.amount for row in rows), np.float64, len(rows))
+        days = np.fromiter((row.day for row in rows), np.int32, len(rows))
+
+        start, end = self.size, self.size + count
+        self._grow(end)
+        self.ids[start:end] = ids[fresh]
+        self.amounts[start:end] = amounts[fresh]
+        self.days[start:end] = days[fresh]
+        self.months[start:end] = (
+            days[fresh].astype("datetime64[D]").astype("datetime64[M]").astype(int)
+        )
+        self.codes[start:end] = codes[fresh]
+        # Readers snapshot [:size], so publish the rows only once written
+        self.size = end
+        self.watermark = max(self.watermark, int(ids.max()))
+        return count
+
+    def refresh(self) -> int:
+        """Load rows inserted since the last refresh; returns how many."""
+        version = current_version()
+        if version == self.version:
+            return 0
+        with self._lock:
+            if version == self.version:
+                return 0
+            after = max(self.watermark - ANALYTICS_ID_WINDOW, 0) if self.size else 0
+            ids = self.ids[: self.size]
+            known = ids[ids > after]
+            added = 0
+            started = time.perf_counter()
+            with engine.connect() as connection:
+                result = connection.execution_options(stream_results=True).execute(
+                    text(LOAD_SQL), {"after": after}
+                )
+                for rows in result.partitions(ANALYTICS_LOAD_CHUNK):
+                    added += self._append(rows, known)
+            self.version = version
+            self.refreshed_at = datetime.now(timezone.utc)
+        if added:
+            logger.info(
+                f"Loaded {added} expenses into analytics in "
+                f"{(time.perf_counter() - started) * 1000:.1f} ms"
+            )
+        return added
+
+    def snapshot(self) -> Columns:
+        with self._lock:
+            size = self.size
+            return Columns(
+                self.ids[:size],
+                self.amounts[:size],
+                self.days[:size],
+                self.months[:size],
+                self.codes[:size],
+                tuple(self.categories),
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rows": self.size,
+            "categories": len(self.categories),
+            "bytes": sum(getattr(self, name).nbytes for name in COLUMNS),
+            "data_version": self.version,
+            "id_watermark": self.watermark,
+            "refreshed_at": self.refreshed_at,
+        }
+
+
+@lru_cache(maxsize=None)
+def get_columns() -> ExpenseColumns:
+    return ExpenseColumns()
+
+
+def current() -> Columns:
+    """Snapshot of the copy after catching up with committed inserts."""
+    columns = get_columns()
+    columns.refresh()
+    return columns.snapshot()
+
+
+def _ordinal(day: Optional[date]) -> int:
+    return ((day or datetime.now(timezone.utc).date()) - EPOCH).days
+
+
+def _month_label(month: int) -> str:
+    return f"{1970 + month // 12}-{month % 12 + 1:02d}"
+
+
+def _select(columns: Columns, category: Optional[str], mask=None) -> np.ndarray:
+    """Boolean row mask for `category` (all rows when None) and `mask`."""
+    code = columns.code(category)
+    selected = np.ones(len(columns.ids), bool) if mask is None else mask
+    if code is not None:
+        selected = selected & (columns.codes == code)
+    return selected
+
+
+def _trailing_mean(series: np.ndarray, window: int) -> np.ndarray:
+    """Mean of the last `window` values at each position along the last axis."""
+    sums = np.cumsum(series, axis=-1)
+    shifted = np.zeros_like(sums)
+    shifted[..., window:] = sums[..., :-window]
+    lengths = np.minimum(np.arange(1, series.shape[-1] + 1), window)
+    return (sums - shifted) / lengths
+
+
+def _group_quantiles(
+    values: np.ndarray, codes: np.ndarray, groups: int, quantiles: Sequence[float]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-group quantiles (linear interpolation) and counts.
+
+    Sorting by value and then stably by group is several times faster than
+    np.lexsort; int16 group codes get NumPy's radix sort.
+    """
+    order = np.argsort(values)
+    group_codes = codes[order]
+    if groups <= np.iinfo(np.int16).max:
+        group_codes = group_codes.astype(np.int16)
+    order = order[np.argsort(group_codes, kind="stable")]
+    ordered = values[order]
+    counts = np.bincount(codes, minlength=groups)
+    starts = np.cumsum(counts) - counts
+    positions = (
+        starts[:, None]
+        + np.asarray(quantiles)[None, :] * np.maximum(counts - 1, 0)[:, None]
+    )
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.ceil(positions).astype(np.int64)
+    fraction = positions - lower
+    result = np.full(positions.shape, np.nan)
+    present = counts > 0
+    if present.any():
+        result[present] = (
+            ordered[lower[present]] * (1 - fraction[present])
+            + ordered[upper[present]] * fraction[present]
+        )
+    return result, counts
+
+
+def _round(value) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), 2)
+
+
+def _rounded(values) -> List[Optional[float]]:
+    return [_round(value) for value in values]
+
+
+def _day(ordinal: int) -> date:
+    return date.fromordinal(EPOCH.toordinal() + int(ordinal))
+
+
+def monthly(
+    columns: Columns,
+    category: Optional[str] = None,
+    months: int = 12,
+    window: int = 3,
+    today: Optional[date] = None,
+) -> Dict[str, Any]:
+    """Monthly totals per category with month-over-month deltas, a trailing
+    `window`-month average and this month compared with the usual."""
+    today = today or datetime.now(timezone.utc).date()
+    this_month = (today.year - 1970) * 12 + today.month - 1
+    first = this_month - months + 1
+    row_months = columns.months
+    selected = _select(columns, category, row_months >= first)
+    selected &= row_months <= this_month
+    groups = len(columns.categories)
+
+    cells = columns.codes[selected] * months + (row_months[selected] - first)
+    totals = np.bincount(
+        cells, weights=columns.amounts[selected], minlength=groups * months
+    ).reshape(groups, months)
+    active = np.flatnonzero(totals.sum(axis=1))
+    names = ["all"] + [columns.categories[code] for code in active]
+    series = np.vstack([totals.sum(axis=0, keepdims=True), totals[active]])
+
+    deltas = np.diff(series, axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        delta_pct = np.where(series[:, :-1] > 0, deltas / series[:, :-1] * 100, np.nan)
+    rolling = _trailing_mean(series, window)
+
+    # This month so far, projected to a full month, against the mean of the
+    # `window` full months before it
+    days_in_month = (
+        date(today.year + today.month // 12, today.month % 12 + 1, 1)
+        - today.replace(day=1)
+    ).days
+    projected = series[:, -1] * days_in_month / today.day
+    previous = series[:, max(months - 1 - window, 0) : months - 1]
+    usual = previous.mean(axis=1) if previous.shape[1] else np.full(len(names), np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(usual > 0, projected / usual, np.nan)
+
+    return {
+        "months": [_month_label(month) for month in range(first, this_month + 1)],
+        "window": window,
+        "categories": {
+            name: {
+                "totals": _rounded(series[i]),
+                "rolling_avg": _rounded(rolling[i]),
+                "mom_delta": [None] + _rounded(deltas[i]),
+                "mom_delta_pct": [None] + _rounded(delta_pct[i]),
+                "this_month": round(float(series[i, -1]), 2),
+                "this_month_projected": round(float(projected[i]), 2),
+                "usual": _round(usual[i]),
+                "vs_usual": _round(ratio[i]),
+            }
+            for i, name in enumerate(names)
+        },
+    }
+
+
+def rolling(
+    columns: Columns,
+    category: Optional[str] = None,
+    days: int = 90,
+    window: int = 7,
+    today: Optional[date] = None,
+) -> Dict[str, Any]:
+    """Daily totals over the last `days` days with a trailing mean."""
+    last = _ordinal(today)
+    first = last - days + 1
+    selected = _select(columns, category, columns.days >= first)
+    selected &= columns.days <= last
+    daily = np.bincount(
+        columns.days[selected] - first,
+        weights=columns.amounts[selected],
+        minlength=days,
+    )
+    return {
+        "start_date": _day(first),
+        "end_date": _day(last),
+        "window": window,
+        "daily_totals": _rounded(daily),
+        "rolling_avg": _rounded(_trailing_mean(daily, window)),
+        "total": round(float(daily.sum()), 2),
+        "daily_avg": round(float(daily.mean()), 2),
+    }
+
+
+def percentiles(
+    columns: Columns,
+    quantiles: Sequence[float] = (0.5, 0.9, 0.99),
+    days: Optional[int] = None,
+    today: Optional[date] = None,
+) -> Dict[str, Any]:
+    """Per-category amount percentiles, mean and count."""
+    selected = np.ones(len(columns.ids), bool)
+    if days:
+        selected = columns.days > _ordinal(today) - days
+    groups = len(columns.categories)
+    values = columns.amounts[selected]
+    codes = columns.codes[selected]
+    result, counts = _group_quantiles(values, codes, groups, quantiles)
+    sums = np.bincount(codes, weights=values, minlength=groups)
+    labels = [f"p{round(q * 100, 1):g}" for q in quantiles]
+    return {
+        "categories": {
+            columns.categories[code]: {
+                "count": int(counts[code]),
+                "total": round(float(sums[code]), 2),
+                "mean": round(float(sums[code] / counts[code]), 2),
+                **dict(zip(labels, _rounded(result[code]))),
+            }
+            for code in np.flatnonzero(counts)
+        }
+    }
+
+
+def forecast(
+    columns: Columns,
+    category: Optional[str] = None,
+    history: int = 6,
+    horizon: int = 3,
+    today: Optional[date] = None,
+) -> Dict[str, Any]:
+    """Linear trend over the last `history` full months, extended
+    `horizon` months ahead, fitted for every category at once."""
+    today = today or datetime.now(timezone.utc).date()
+    # The current month is incomplete, so the fit ends with the previous one
+    last_full = (today.year - 1970) * 12 + today.month - 2
+    first = last_full - history + 1
+    row_months = columns.months
+    selected = _select(columns, category, row_months >= first)
+    selected &= row_months <= last_full
+    groups = len(columns.categories)
+
+    cells = columns.codes[selected] * history + (row_months[selected] - first)
+    totals = np.bincount(
+        cells, weights=columns.amounts[selected], minlength=groups * history
+    ).reshape(groups, history)
+    active = np.flatnonzero(totals.sum(axis=1))
+    names = ["all"] + [columns.categories[code] for code in active]
+    series = np.vstack([totals.sum(axis=0, keepdims=True), totals[active]])
+
+    # Least squares for every row at once: y = mean + slope * (x - mean(x))
+    x = np.arange(history) - (history - 1) / 2
+    slope = series @ x / max(float(x @ x), 1.0)
+    intercept = series.mean(axis=1)
+    ahead = np.arange(1, horizon + 1) + (history - 1) / 2
+    predicted = np.maximum(intercept[:, None] + slope[:, None] * ahead[None, :], 0)
+
+    return {
+        "history_months": [
+            _month_label(month) for month in range(first, last_full + 1)
+        ],
+        "forecast_months": [
+            _month_label(last_full + step) for step in range(1, horizon + 1)
+        ],
+        "categories": {
+            name: {
+                "history": _rounded(series[i]),
+                "monthly_trend": round(float(slope[i]), 2),
+                "forecast": _rounded(predicted[i]),
+            }
+            for i, name in enumerate(names)
+        },
+    }
+
+
+def anomalies(
+    columns: Columns,
+    category: Optional[str] = None,
+    days: int = 90,
+    threshold: float = 3.5,
+    min_count: int = 5,
+    limit: int = 50,
+    today: Optional[date] = None,
+) -> Dict[str, Any]:
+    """Expenses of the last `days` days far from their category's usual
+    amount: robust z-score |x - median| / (1.4826 * MAD) above `threshold`,
+    with the median and MAD taken over each category's full history."""
+    groups = len(columns.categories)
+    medians, counts = _group_quantiles(columns.amounts, columns.codes, groups, [0.5])
+    median = medians[:, 0]
+    deviation = np.abs(columns.amounts - median[columns.codes])
+    mad = _group_quantiles(deviation, columns.codes, groups, [0.5])[0][:, 0]
+    scale = 1.4826 * mad
+    # A category whose amounts barely vary would flag every other value
+    scale = np.where(scale > 0, scale, np.maximum(median * 0.1, 1.0))
+
+    recent = _select(columns, category, columns.days > _ordinal(today) - days)
+    recent &= counts[columns.codes] >= min_count
+    rows = np.flatnonzero(recent)
+    scores = deviation[rows] / scale[columns.codes[rows]]
+    flagged = rows[scores > threshold]
+    flagged_scores = scores[scores > threshold]
+    top = np.argsort(-flagged_scores)[:limit]
+    return {
+        "threshold": threshold,
+        "days": days,
+        "anomalies": [
+            {
+                "id": int(columns.ids[row]),
+                "amount": round(float(columns.amounts[row]), 2),
+                "category": columns.categories[columns.codes[row]],
+                "date": _day(columns.days[row]),
+                "usual_amount": round(float(median[columns.codes[row]]), 2),
+                "score": round(float(score), 2),
+            }
+            for row, score in zip(flagged[top], flagged_scores[top])
+        ],
+    }
+
+
+REPORTS = ("monthly", "percentiles", "forecast", "anomalies", "rolling")
+
+
+def describe(report: str = "monthly", category: Optional[str] = None) -> str:
+    """Short plain-text answer from one report, for the agent."""
+    columns = current()
+    key = category.strip().lower() if category else "all"
+    if report == "monthly":
+        data = monthly(columns, category)["categories"].get(key)
+        if not data:
+            return f"No spending recorded for {category} in the last 12 months."
+        text = (
+            f"{category or 'All spending'}: ₹{data['this_month']:.2f} so far this "
+            f"month, on track for ₹{data['this_month_projected']:.2f}"
+        )
+        if data["usual"]:
+            text += (
+                f" against a usual ₹{data['usual']:.2f} per month "
+                f"({data['vs_usual']:.2f}x)"
+            )
+        return text + "."
+    if report == "percentiles":
+        lines = [
+            f"{name}: {stats['count']} expenses, mean ₹{stats['mean']:.2f}, "
+            f"median ₹{stats['p50']:.2f}, 90th percentile ₹{stats['p90']:.2f}"
+            for name, stats in percentiles(columns)["categories"].items()
+            if not category or name == key
+        ]
+        return "\n".join(lines) or f"No expenses recorded for {category}."
+    if report == "forecast":
+        data = forecast(columns, category)
+        series = data["categories"].get(key)
+        if not series:
+            return f"Not enough history to forecast {category}."
+        months = ", ".join(
+            f"{month}: ₹{value:.2f}"
+            for month, value in zip(data["forecast_months"], series["forecast"])
+        )
+        return (
+            f"Forecast for {category or 'all spending'} "
+            f"(trend ₹{series['monthly_trend']:+.2f}/month): {months}."
+        )
+    if report == "anomalies":
+        found = anomalies(columns, category)["anomalies"]
+        if not found:
+            return "No unusual expenses in the last 90 days."
+        return "\n".join(
+            f"₹{item['amount']:.2f} on {item['category']} on {item['date']} "
+            f"(usually about ₹{item['usual_amount']:.2f})"
+            for item in found[:10]
+        )
+    if report == "rolling":
+        data = rolling(columns, category)
+        return (
+            f"{category or 'All spending'} over the last 90 days: "
+            f"₹{data['total']:.2f} in total, ₹{data['daily_avg']:.2f} per day."
+        )
+    raise ValueError(f"report must be one of {REPORTS}")
+
+
+if __name__ == "__main__":
+    started = time.perf_counter()
+    snapshot = current()
+    print(f"✅ Loaded in {(time.perf_counter() - started) * 1000:.1f} ms")
+    print(get_columns().stats())
+    for report in ("monthly", "percentiles", "forecast", "anomalies"):
+        print(f"--- {report}\n{describe(report)}")
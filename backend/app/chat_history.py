@@ -0,0 +1,175 @@
+"""
+Per-session chat histories with bounded size.
+
+Each session keeps only the most recent turns that fit a token budget;
+older turns are dropped or, when a summarizer is configured, folded into a
+rolling summary. Idle sessions expire, the least recently used sessions
+are evicted past `max_sessions`, and the whole store is held under a hard
+byte cap, so memory use stays flat no matter how long the service runs.
+"""
+
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence
+import logging
+import threading
+import time
+
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage, SystemMessage
+
+logger = logging.getLogger("chat_history")
+
+# (previous summary, messages leaving the window) -> new summary
+Summarizer = Callable[[str, List[BaseMessage]], str]
+
+
+def estimate_tokens(message: BaseMessage) -> int:
+    """Cheap token estimate (~4 characters per token plus role overhead)."""
+    return len(str(message.content)) // 4 + 4
+
+
+class BoundedChatMessageHistory(BaseChatMessageHistory):
+    """Message window limited to `max_tokens`, with an optional rolling summary."""
+
+    def __init__(
+        self,
+        max_tokens: int = 1024,
+        summarizer: Optional[Summarizer] = None,
+        summary_max_chars: int = 1000,
+        on_change: Optional[Callable[[], None]] = None,
+    ):
+        self.max_tokens = max_tokens
+        self.summarizer = summarizer
+        self.summary_max_chars = summary_max_chars
+        self.on_change = on_change
+        self.window: List[BaseMessage] = []
+        self.summary = ""
+        self.tokens = 0
+        self.nbytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        with self._lock:
+            window = list(self.window)
+            summary = self.summary
+        if not summary:
+            return window
+        note = SystemMessage(f"Summary of the earlier conversation: {summary}")
+        return [note] + window
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        with self._lock:
+            self.window.extend(messages)
+            self.tokens += sum(estimate_tokens(m) for m in messages)
+            evicted = []
+            # Always keep the latest message, even if it alone is over budget
+            while self.tokens > self.max_tokens and len(self.window) > 1:
+                oldest = self.window.pop(0)
+                self.tokens -= estimate_tokens(oldest)
+                evicted.append(oldest)
+            summary = self.summary
+
+        if evicted and self.summarizer:
+            try:
+                summary = self.summarizer(summary, evicted)[: self.summary_max_chars]
+            except Exception as e:
+                logger.warning(f"Could not summarize {len(evicted)} messages: {e}")
+
+        with self._lock:
+            self.summary = summary
+            self.nbytes = len(self.summary.encode()) + sum(
+                len(str(m.content).encode()) for m in self.window
+            )
+        if self.on_change:
+            self.on_change()
+
+    def clear(self) -> None:
+        with self._lock:
+            self.window = []
+            self.summary = ""
+            self.tokens = 0
+            self.nbytes = 0
+
+
+class SessionHistoryStore:
+    """Session id -> BoundedChatMessageHistory with TTL, LRU and byte-cap eviction."""
+
+    def __init__(
+        self,
+        max_sessions: int = 1000,
+        ttl: float = 1800.0,
+        max_bytes: int = 16 * 1024 * 1024,
+        max_tokens: int = 1024,
+        summarizer: Optional[Summarizer] = None,
+        summary_max_chars: int = 1000,
+    ):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_tokens = max_tokens
+        self.summarizer = summarizer
+        self.summary_max_chars = summary_max_chars
+        self._sessions: "OrderedDict[str, BoundedChatMessageHistory]" = OrderedDict()
+        self._last_used: Dict[str, float] = {}
+        self._lock = threading.RLock()
+        self.evictions = {"ttl": 0, "lru": 0, "bytes": 0}
+
+    def get(self, session_id: str) -> BoundedChatMessageHistory:
+        """History for `session_id`, created on first use."""
+        with self._lock:
+            self._expire(time.monotonic())
+            history = self._sessions.get(session_id)
+            if history is None:
+                history = BoundedChatMessageHistory(
+                    self.max_tokens,
+                    self.summarizer,
+                    self.summary_max_chars,
+                    on_change=self._enforce_byte_cap,
+                )
+                self._sessions[session_id] = history
+            self._sessions.move_to_end(session_id)
+            self._last_used[session_id] = time.monotonic()
+            while len(self._sessions) > self.max_sessions:
+                self._evict_oldest("lru")
+            return history
+
+    def _evict_oldest(self, reason: str) -> None:
+        session_id, _ = self._sessions.popitem(last=False)
+        del self._last_used[session_id]
+        self.evictions[reason] += 1
+
+    def _expire(self, now: float) -> None:
+        # Sessions are ordered by last use, so expired ones are at the front
+        while self._sessions:
+            oldest = next(iter(self._sessions))
+            if now - self._last_used[oldest] <= self.ttl:
+                break
+            self._evict_oldest("ttl")
+
+    def _enforce_byte_cap(self) -> None:
+        with self._lock:
+            total = sum(h.nbytes for h in self._sessions.values())
+            # Never evict the most recent session, which is the one in use
+            while total > self.max_bytes and len(self._sessions) > 1:
+                session_id = next(iter(self._sessions))
+                total -= self._sessions[session_id].nbytes
+                self._evict_oldest("bytes")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sessions.clear()
+            self._last_used.clear()
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "bytes": sum(h.nbytes for h in self._sessions.values()),
+                "tokens": sum(h.tokens for h in self._sessions.values()),
+                "max_sessions": self.max_sessions,
+                "max_bytes": self.max_bytes,
+                "max_tokens_per_session": self.max_tokens,
+                "ttl": self.ttl,
+                "evictions": dict(self.evictions),
+            }
@@ -0,0 +1,145 @@
+"""
+Response compression for large JSON bodies.
+
+CompressionMiddleware compresses responses of compressible types (JSON,
+NDJSON, plain text) with brotli when the client accepts it and the
+optional `brotli` package is installed, and with gzip otherwise. Complete
+bodies smaller than COMPRESS_MIN_SIZE bytes are sent as they are. Streamed
+bodies (GET /expenses?stream=true) are compressed chunk by chunk and
+flushed after every chunk, so the client still sees rows as they are
+read. Server-sent events are never compressed.
+"""
+
+from typing import Dict, Optional
+import os
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+COMPRESS_GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "6"))
+# 4-5 is brotli's sweet spot for dynamic responses; 11 is for static assets
+COMPRESS_BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", "4"))
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "text/plain",
+    "text/csv",
+    "text/html",
+)
+
+
+def _accepted(accept_encoding: str) -> Dict[str, float]:
+    codings = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        codings[coding.strip().lower()] = quality
+    return codings
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """br, gzip or None for an Accept-Encoding header."""
+    accepted = _accepted(accept_encoding)
+
+    def quality(coding: str) -> float:
+        return accepted.get(coding, accepted.get("*", 0.0))
+
+    if brotli is not None and quality("br") > 0 and quality("br") >= quality("gzip"):
+        return "br"
+    if quality("gzip") > 0:
+        return "gzip"
+    return None
+
+
+class _Encoder:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=COMPRESS_BROTLI_QUALITY)
+        else:
+            # wbits 31: deflate in a gzip container
+            self._zlib = zlib.compressobj(COMPRESS_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def encode(self, data: bytes, final: bool) -> bytes:
+        if self.encoding == "br":
+            out = self._brotli.process(data)
+            return out + (self._brotli.finish() if final else self._brotli.flush())
+        out = self._zlib.compress(data)
+        return out + self._zlib.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+def _compressible(headers: Headers) -> bool:
+    if "content-encoding" in headers:
+        return False
+    content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+    return content_type in COMPRESSIBLE_TYPES
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing compressible responses, see module docs."""
+
+    def __init__(self, app, min_size: int = COMPRESS_MIN_SIZE):
+        self.app = app
+        self.min_size = min_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        # The start message is held until the first body chunk shows whether
+        # the response is worth compressing
+        state = {"start": None, "encoder": None}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["start"] = message
+                return
+            if message["type"] != "http.response.body":
+                return await send(message)
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            start = state["start"]
+            if start is not None:
+                state["start"] = None
+                headers = MutableHeaders(raw=start["headers"])
+                if _compressible(headers):
+                    headers.add_vary_header("Accept-Encoding")
+                    if more_body or len(body) >= self.min_size:
+                        state["encoder"] = _Encoder(encoding)
+                        headers["Content-Encoding"] = encoding
+                        if "content-length" in headers:
+                            del headers["content-length"]
+                await send(start)
+
+            encoder = state["encoder"]
+            if encoder is None:
+                return await send(message)
+            await send(
+                {
+                    "type": "http.response.body",
+                    "body": encoder.encode(body, final=not more_body),
+                    "more_body": more_body,
+                }
+            )
+
+        await self.app(scope, receive, send_wrapper)
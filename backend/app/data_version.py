@@ -0,0 +1,56 @@
+"""
+Change counters for the expenses dataset and conversation memory.
+
+Every expense write path bumps the expenses counter in the same
+transaction as the write, so caches keyed on the version are invalidated
+as soon as the write commits, across all worker processes. The memory
+counter is bumped once conversation vectors have been stored.
+"""
+
+from datetime import datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .database import AsyncSessionLocal, SessionLocal
+from .models import DataVersion
+
+EXPENSES = "expenses"
+MEMORY = "memory"
+
+# pyformat placeholders, executed through exec_driver_sql
+BUMP_SQL = """
+INSERT INTO data_versions (name, version, updated_at)
+VALUES (%(name)s, 1, now())
+ON CONFLICT (name) DO UPDATE SET
+    version = data_versions.version + 1,
+    updated_at = now()
+"""
+
+
+def bump(db: Session, name: str = EXPENSES) -> None:
+    """Increment the version inside the caller's transaction."""
+    db.connection().exec_driver_sql(BUMP_SQL, {"name": name})
+
+
+def current(db: Session, name: str = EXPENSES) -> Tuple[int, Optional[datetime]]:
+    """Current (version, updated_at); (0, None) before the first write."""
+    row = db.execute(
+        select(DataVersion.version, DataVersion.updated_at).where(
+            DataVersion.name == name
+        )
+    ).first()
+    return (row.version, row.updated_at) if row else (0, None)
+
+
+def current_version(name: str = EXPENSES) -> int:
+    """Read the version on a short-lived session."""
+    with SessionLocal() as db:
+        return current(db, name)[0]
+
+
+async def acurrent_version(name: str = EXPENSES) -> int:
+    """Async variant of current_version for the async request path."""
+    async with AsyncSessionLocal() as db:
+        return await db.run_sync(lambda session: current(session, name)[0])
@@ -1,13 +1,240 @@
-from sqlalchemy import create_engine
+"""
+Single pooled data-access layer for every database consumer.
+
+All request handlers, PGVector stores, the embedding cache and the CLI
+jobs share the engines below. Pools are sized from the environment, ping
+connections before use so a dropped server connection is transparently
+replaced, and record per-pool metrics (see `pool_metrics`).
+"""
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from typing import Any, Dict, Sequence
 import os
+import re
+import threading
+import time
 from dotenv import load_dotenv
 
+from .metrics import Gauge, db_pool_wait, db_query_duration
+
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(DATABASE_URL)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+
+def _async_url(url: str) -> str:
+    """Point a sync Postgres URL at the psycopg 3 driver, which supports asyncio."""
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+psycopg://" + url[len(prefix) :]
+    return url
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _async_url(DATABASE_URL)
+
+
+class PoolMetrics:
+    """Counters and checkout wait times for one connection pool."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.connects = 0
+        self.checkouts = 0
+        self.invalidations = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self._lock = threading.Lock()
+
+    def record_wait(self, seconds: float) -> None:
+        db_pool_wait.observe(seconds, pool=self.name)
+        with self._lock:
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+    def snapshot(self, pool) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "overflow": pool.overflow(),
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "invalidations": self.invalidations,
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "wait_seconds_max": round(self.wait_seconds_max, 6),
+            }
+
+
+pool_metrics: Dict[str, PoolMetrics] = {}
+
+
+def _instrument(pool, name: str) -> None:
+    metrics = pool_metrics[name] = PoolMetrics(name)
+
+    @event.listens_for(pool, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        metrics.connects += 1
+        # Server-side prepared statements die with their connection
+        connection_record.info.pop("prepared", None)
+
+    @event.listens_for(pool, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        metrics.checkouts += 1
+
+    @event.listens_for(pool, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        metrics.invalidations += 1
+
+
+_pool_args = dict(
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=True,
+)
+
+engine = create_engine(DATABASE_URL, **_pool_args)
+_instrument(engine.pool, "sync")
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# psycopg 3 prepares statements server-side on its own once they have run
+# prepare_threshold (5) times on a connection.
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **_pool_args)
+_instrument(async_engine.sync_engine.pool, "async")
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False
+)
+
+# Statement timing: operation is the leading keyword, table the first
+# relation named after FROM/INTO/UPDATE (labels stay low-cardinality)
+_TABLE_RE = re.compile(r'\b(?:from|into|update)\s+"?([\w.]+)"?', re.IGNORECASE)
+
+
+def _statement_labels(statement: str) -> Dict[str, str]:
+    words = statement.lstrip(" (\n").split(None, 1)
+    operation = words[0].lower() if words else "unknown"
+    table = _TABLE_RE.search(statement)
+    return {"operation": operation, "table": table.group(1) if table else ""}
+
+
+def _time_queries(sync_engine, name: str) -> None:
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        db_query_duration.observe(
+            time.perf_counter() - started, engine=name, **_statement_labels(statement)
+        )
+
+    @event.listens_for(sync_engine, "handle_error")
+    def on_error(context):
+        # after_cursor_execute does not fire for failed statements
+        started = (
+            context.connection.info.get("query_started") if context.connection else None
+        )
+        if started:
+            started.pop()
+
+
+_time_queries(engine, "sync")
+_time_queries(async_engine.sync_engine, "async")
+
 Base = declarative_base()
+
+
+# Request sessions check their connection out up front, so the pool wait
+# (including the pre-ping round trip) is timed through the public API
+def get_db():
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        db.connection()
+        pool_metrics["sync"].record_wait(time.perf_counter() - started)
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        started = time.perf_counter()
+        await db.connection()
+        pool_metrics["async"].record_wait(time.perf_counter() - started)
+        yield db
+
+
+# Hot statements, prepared server-side once per pooled connection
+PREPARED_STATEMENTS = {
+    "insert_expense": (
+        ("float8", "text", "timestamptz", "text"),
+        "INSERT INTO expenses (amount, category, date, description) "
+        "VALUES (%s, %s, %s, %s) RETURNING id, amount, category, date",
+    ),
+    "query_expenses_range": (
+        ("timestamptz", "timestamptz"),
+        "SELECT * FROM expenses WHERE date >= %s AND date < %s",
+    ),
+    "query_expenses_range_category": (
+        ("timestamptz", "timestamptz", "text"),
+        "SELECT * FROM expenses WHERE date >= %s AND date < %s AND category = %s",
+    ),
+}
+
+
+def _numbered(statement: str) -> str:
+    parts = statement.split("%s")
+    return "".join(
+        part + (f"${i}" if i < len(parts) else "") for i, part in enumerate(parts, 1)
+    )
+
+
+def execute_prepared(conn: Connection, name: str, params: Sequence[Any]):
+    """Run a PREPARED_STATEMENTS entry, preparing it on first use per connection."""
+    arg_types, statement = PREPARED_STATEMENTS[name]
+    if conn.dialect.driver == "psycopg":
+        # psycopg 3 binds server-side and prepares repeated statements itself
+        return conn.exec_driver_sql(statement, tuple(params))
+
+    prepared = conn.info.setdefault("prepared", set())
+    if name not in prepared:
+        conn.exec_driver_sql(
+            f"PREPARE {name} ({', '.join(arg_types)}) AS {_numbered(statement)}"
+        )
+        prepared.add(name)
+    placeholders = ", ".join(["%s"] * len(arg_types))
+    return conn.exec_driver_sql(f"EXECUTE {name} ({placeholders})", tuple(params))
+
+
+def pool_status() -> Dict[str, Dict[str, Any]]:
+    return {
+        "sync": pool_metrics["sync"].snapshot(engine.pool),
+        "async": pool_metrics["async"].snapshot(async_engine.sync_engine.pool),
+    }
+
+
+def _pool_gauge_samples():
+    for name, status in pool_status().items():
+        yield (name, "size"), status["size"]
+        yield (name, "checked_out"), status["checked_out"]
+        # QueuePool counts overflow up from -pool_size
+        yield (name, "overflow"), max(status["overflow"], 0)
+
+
+Gauge(
+    "zenspend_db_pool_connections",
+    "Connection pool size, checked-out and overflow connections.",
+    ("pool", "state"),
+    _pool_gauge_samples,
+)
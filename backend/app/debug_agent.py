@@ -1,12 +1,8 @@
 import logging
 from .llm_agent import test_agent_with_simple_query
+from .logging_config import configure_logging
 
-# Configure logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    handlers=[logging.FileHandler("agent_debug.log"), logging.StreamHandler()],
-)
+configure_logging()
 logger = logging.getLogger("debug_agent")
 
 
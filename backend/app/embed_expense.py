@@ -1,38 +1,222 @@
-from .database import SessionLocal
-from .models import Expense
+from . import jobs
+from .database import SessionLocal, engine
+from .embedding_cache import embedding
+from .migrations import migrate
+from .models import ExpenseEmbeddingState
 from .utils import stringify_expense
-from langchain_postgres import PGVector
-from langchain_ollama import OllamaEmbeddings
+from .vector_index import IndexedPGVector, ensure_vector_indexes
+from functools import lru_cache
 from langchain.docstore.document import Document
+from sqlalchemy import delete, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from typing import Iterable
+import argparse
+import logging
 import os
+import uuid
 from dotenv import load_dotenv
 
 load_dotenv()
 
-CONNECTION_STRING = os.getenv("DATABASE_URL")
-embedding = OllamaEmbeddings(model="phi3:mini")
+logger = logging.getLogger("embed_expense")
 
-# Let PGVector create tables with proper schema
-vectorstore = PGVector(
-    embeddings=embedding,
-    connection=CONNECTION_STRING,
-    collection_name="expense_embeddings",
-    use_jsonb=True,
-    pre_delete_collection=False,  # Don't delete existing data
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+# Queue an embedding job for every expense write (see app.jobs)
+EMBED_ON_WRITE = os.getenv("EMBED_ON_WRITE", "1") == "1"
+# Queued jobs (of up to EMBED_BATCH_SIZE expenses each) per embedding run
+EMBED_JOB_BATCH = int(os.getenv("EMBED_JOB_BATCH", "8"))
+EMBED_JOB = "embed_expenses"
+
+
+@lru_cache(maxsize=None)
+def get_vectorstore() -> IndexedPGVector:
+    # Let PGVector create tables with proper schema
+    return IndexedPGVector(
+        embeddings=embedding,
+        connection=engine,
+        collection_name="expense_embeddings",
+        use_jsonb=True,
+        pre_delete_collection=False,  # Don't delete existing data
+    )
+
+
+# Hash of the columns that make up the embedded text; compared in SQL so
+# unchanged rows never leave the database.
+CONTENT_HASH_SQL = (
+    "md5(concat_ws('|', e.amount::text, e.category, "
+    "coalesce(e.description, ''), e.date::text))"
 )
 
+PENDING_SQL = f"""
+SELECT e.id, e.amount, e.category, e.description, e.date,
+       {CONTENT_HASH_SQL} AS content_hash
+FROM expenses e
+LEFT JOIN expense_embedding_state s ON s.expense_id = e.id
+WHERE s.expense_id IS NULL OR s.content_hash <> {CONTENT_HASH_SQL}
+ORDER BY e.id
+"""
+
+# Watermark mode: only rows newer than the highest embedded id
+NEW_ONLY_SQL = f"""
+SELECT e.id, e.amount, e.category, e.description, e.date,
+       {CONTENT_HASH_SQL} AS content_hash
+FROM expenses e
+WHERE e.id > (SELECT coalesce(max(expense_id), 0) FROM expense_embedding_state)
+ORDER BY e.id
+"""
+
+# Rows named by queued jobs that are still missing or stale
+QUEUED_SQL = f"""
+SELECT e.id, e.amount, e.category, e.description, e.date,
+       {CONTENT_HASH_SQL} AS content_hash
+FROM expenses e
+LEFT JOIN expense_embedding_state s ON s.expense_id = e.id
+WHERE e.id = ANY(:ids)
+  AND (s.expense_id IS NULL OR s.content_hash <> {CONTENT_HASH_SQL})
+ORDER BY e.id
+"""
+
+REMOVED_SQL = """
+SELECT s.expense_id
+FROM expense_embedding_state s
+LEFT JOIN expenses e ON e.id = s.expense_id
+WHERE e.id IS NULL
+"""
+
+
+def expense_vector_id(expense_id: int) -> str:
+    """Stable vector id for an expense, so re-embedding upserts in place."""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"zenspend:expense:{expense_id}"))
+
+
+def _expense_document(row) -> Document:
+    expense = dict(row)
+    return Document(
+        page_content=stringify_expense(expense),
+        metadata={
+            "id": expense["id"],
+            "category": expense["category"],
+            "date": expense["date"].date().isoformat(),
+        },
+    )
+
+
+def _embed_batch(session, rows) -> None:
+    get_vectorstore().add_documents(
+        [_expense_document(row) for row in rows],
+        ids=[expense_vector_id(row["id"]) for row in rows],
+    )
+    stmt = insert(ExpenseEmbeddingState).values(
+        [{"expense_id": row["id"], "content_hash": row["content_hash"]} for row in rows]
+    )
+    session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["expense_id"],
+            set_={
+                "content_hash": stmt.excluded.content_hash,
+                "embedded_at": text("now()"),
+            },
+        )
+    )
+    session.commit()
+
+
+def _delete_removed(session) -> int:
+    removed = list(session.scalars(text(REMOVED_SQL)))
+    for start in range(0, len(removed), EMBED_BATCH_SIZE):
+        chunk = removed[start : start + EMBED_BATCH_SIZE]
+        get_vectorstore().delete(
+            ids=[expense_vector_id(expense_id) for expense_id in chunk]
+        )
+        session.execute(
+            delete(ExpenseEmbeddingState).where(
+                ExpenseEmbeddingState.expense_id.in_(chunk)
+            )
+        )
+        session.commit()
+    return len(removed)
+
+
+def embed_expenses(
+    batch_size: int = EMBED_BATCH_SIZE, full: bool = False, new_only: bool = False
+):
+    """Embed new or changed expenses and drop vectors of deleted ones.
+
+    Only rows whose content hash differs from the last embedded version are
+    sent to the embedding model. `full=True` recreates the collection and
+    re-embeds everything; `new_only=True` skips change detection and only
+    embeds rows above the id watermark.
+    """
+    session = SessionLocal()
+    embedded = 0
+    try:
+        if full:
+            get_vectorstore().delete_collection()
+            get_vectorstore().create_collection()
+            session.execute(delete(ExpenseEmbeddingState))
+            session.commit()
+
+        # Read pending rows on a separate connection with a server-side
+        # cursor; the per-batch commits below would otherwise close it.
+        with engine.connect() as reader:
+            result = reader.execution_options(stream_results=True).execute(
+                text(NEW_ONLY_SQL if new_only else PENDING_SQL)
+            )
+            for rows in result.mappings().partitions(batch_size):
+                _embed_batch(session, rows)
+                embedded += len(rows)
+                logger.info(f"Embedded batch of {len(rows)} expenses")
+
+        deleted = 0 if new_only else _delete_removed(session)
+    finally:
+        session.close()
+
+    if embedded or deleted:
+        # The vectors are stored either way; a missing index only slows search
+        try:
+            ensure_vector_indexes()
+        except Exception as e:
+            logger.warning(f"Could not update vector indexes: {e}")
+    print(f"✅ Embedded {embedded} expenses, removed {deleted} stale vectors.")
+    return {"embedded": embedded, "deleted": deleted}
+
+
+def queue_expenses(db: Session, ids: Iterable[int]) -> None:
+    """Queue embedding of newly written expenses in the caller's transaction."""
+    ids = list(ids)
+    if not EMBED_ON_WRITE:
+        return
+    for start in range(0, len(ids), EMBED_BATCH_SIZE):
+        jobs.enqueue(db, EMBED_JOB, {"ids": ids[start : start + EMBED_BATCH_SIZE]})
+
 
-def embed_expenses():
+@jobs.handler(EMBED_JOB, batch_size=EMBED_JOB_BATCH)
+def embed_queued(payloads) -> None:
+    """Embed the expenses named by a batch of queued jobs; rows deleted or
+    already embedded since are skipped."""
+    ids = sorted({expense_id for payload in payloads for expense_id in payload["ids"]})
     session = SessionLocal()
-    expenses = session.query(Expense).all()
-    docs = [
-        Document(page_content=stringify_expense(exp), metadata={"id": exp.id})
-        for exp in expenses
-    ]
-    # Use add_documents without explicit IDs to avoid conflicts
-    vectorstore.add_documents(docs)
-    print(f"✅ Embedded {len(docs)} expenses.")
+    try:
+        rows = session.execute(text(QUEUED_SQL), {"ids": ids}).mappings().all()
+        for start in range(0, len(rows), EMBED_BATCH_SIZE):
+            _embed_batch(session, rows[start : start + EMBED_BATCH_SIZE])
+    finally:
+        session.close()
+    logger.info(f"Embedded {len(rows)} queued expenses")
 
 
 if __name__ == "__main__":
-    embed_expenses()
+    parser = argparse.ArgumentParser(description="Embed expenses into PGVector")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE)
+    parser.add_argument(
+        "--full", action="store_true", help="Re-embed every expense from scratch"
+    )
+    parser.add_argument(
+        "--new-only",
+        action="store_true",
+        help="Only embed expenses above the id watermark",
+    )
+    args = parser.parse_args()
+    migrate()
+    embed_expenses(batch_size=args.batch_size, full=args.full, new_only=args.new_only)
@@ -0,0 +1,188 @@
+"""
+Shared, content-addressed cache in front of the Ollama embedding model.
+
+Vectors are keyed by (model, sha256(text)) and looked up in an in-process
+LRU first, then in the `embedding_cache` table, and only computed by the
+model on a miss. Both PGVector stores use the module-level `embedding`.
+"""
+
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import hashlib
+import logging
+import os
+import threading
+import time
+
+from langchain_core.embeddings import Embeddings
+from langchain_ollama import OllamaEmbeddings
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from . import metrics
+from .database import SessionLocal
+from .models import EmbeddingCacheEntry
+
+logger = logging.getLogger("embedding_cache")
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "phi3:mini")
+EMBEDDING_CACHE_MAX_BYTES = int(
+    os.getenv("EMBEDDING_CACHE_MAX_BYTES", str(64 * 1024 * 1024))
+)
+EMBEDDING_CACHE_PERSIST = os.getenv("EMBEDDING_CACHE_PERSIST", "1") == "1"
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _pack(vector: List[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def _unpack(blob: bytes) -> List[float]:
+    vector = array("f")
+    vector.frombytes(blob)
+    return vector.tolist()
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper with an LRU tier and an optional Postgres tier."""
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        model: str,
+        max_bytes: int = EMBEDDING_CACHE_MAX_BYTES,
+        persist: bool = EMBEDDING_CACHE_PERSIST,
+    ):
+        self.underlying = underlying
+        self.model = model
+        self.max_bytes = max_bytes
+        self.persist = persist
+        self._lru: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lru_bytes = 0
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+
+    # -- LRU tier -------------------------------------------------------
+
+    def _lru_get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            blob = self._lru.get(key)
+            if blob is not None:
+                self._lru.move_to_end(key)
+            return blob
+
+    def _lru_put(self, key: str, blob: bytes) -> None:
+        with self._lock:
+            old = self._lru.pop(key, None)
+            if old is not None:
+                self._lru_bytes -= len(old)
+            self._lru[key] = blob
+            self._lru_bytes += len(blob)
+            while self._lru_bytes > self.max_bytes and self._lru:
+                _, evicted = self._lru.popitem(last=False)
+                self._lru_bytes -= len(evicted)
+
+    # -- Persistent tier ------------------------------------------------
+
+    def _db_get_many(self, hashes: List[str]) -> Dict[str, bytes]:
+        if not self.persist or not hashes:
+            return {}
+        try:
+            with SessionLocal() as db:
+                rows = db.execute(
+                    select(EmbeddingCacheEntry.text_hash, EmbeddingCacheEntry.vector)
+                    .where(EmbeddingCacheEntry.model == self.model)
+                    .where(EmbeddingCacheEntry.text_hash.in_(hashes))
+                )
+                return {h: bytes(v) for h, v in rows}
+        except SQLAlchemyError as e:
+            logger.warning(f"Embedding cache read failed, skipping tier: {e}")
+            return {}
+
+    def _db_put_many(self, entries: Dict[str, bytes]) -> None:
+        if not self.persist or not entries:
+            return
+        try:
+            with SessionLocal() as db:
+                db.execute(
+                    insert(EmbeddingCacheEntry)
+                    .values(
+                        [
+                            {"model": self.model, "text_hash": h, "vector": blob}
+                            for h, blob in entries.items()
+                        ]
+                    )
+                    .on_conflict_do_nothing()
+                )
+                db.commit()
+        except SQLAlchemyError as e:
+            logger.warning(f"Embedding cache write failed: {e}")
+
+    # -- Embeddings interface -------------------------------------------
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts, "documents")
+
+    def _embed(self, texts: List[str], kind: str) -> List[List[float]]:
+        hashes = [text_hash(t) for t in texts]
+        found: Dict[str, bytes] = {}
+
+        for h in hashes:
+            blob = self._lru_get(h)
+            if blob is not None:
+                found[h] = blob
+        memory_hits = len(found)
+
+        db_found = self._db_get_many([h for h in set(hashes) if h not in found])
+        for h, blob in db_found.items():
+            self._lru_put(h, blob)
+        found.update(db_found)
+
+        # Embed each distinct missing text once
+        missing = {h: t for h, t in zip(hashes, texts) if h not in found}
+        if missing:
+            started = time.perf_counter()
+            vectors = self.underlying.embed_documents(list(missing.values()))
+            metrics.embedding_duration.observe(
+                time.perf_counter() - started, model=self.model, kind=kind
+            )
+            computed = {h: _pack(v) for h, v in zip(missing, vectors)}
+            for h, blob in computed.items():
+                self._lru_put(h, blob)
+            self._db_put_many(computed)
+            found.update(computed)
+
+        with self._lock:
+            self.memory_hits += memory_hits
+            self.persistent_hits += len(db_found)
+            self.misses += len(missing)
+        metrics.embedding_texts.inc(memory_hits, source="memory")
+        metrics.embedding_texts.inc(len(db_found), source="persistent")
+        metrics.embedding_texts.inc(len(missing), source="model")
+        return [_unpack(found[h]) for h in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text], "query")[0]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "memory_hits": self.memory_hits,
+                "persistent_hits": self.persistent_hits,
+                "misses": self.misses,
+                "entries": len(self._lru),
+                "bytes": self._lru_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+embedding = CachedEmbeddings(
+    OllamaEmbeddings(model=EMBEDDING_MODEL), model=EMBEDDING_MODEL
+)
@@ -0,0 +1,509 @@
+"""
+Rule-based expense parser used before (and instead of) the LLM.
+
+All patterns are compiled once. Category keywords from a configurable
+dictionary are folded into a single alternation regex, so the input is
+scanned once instead of once per keyword list. Dates support absolute
+formats ("26 July 2025", "2025-07-26", "26/07/2025") as well as relative
+ones ("today", "yesterday", "3 days ago", "last Monday").
+
+A message naming several expenses ("₹200 on groceries and ₹50 on chai
+today") is split by parse_many into one segment per amount, cut at the
+last separator (comma, "and", "plus", ...) between consecutive amounts.
+Each segment is parsed on its own; a date mentioned once applies to every
+segment that has none of its own.
+"""
+
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import json
+import logging
+import os
+import re
+
+logger = logging.getLogger("expense_parser")
+
+DEFAULT_CATEGORY = "Miscellaneous"
+DEFAULT_CURRENCY = "INR"
+
+# Category -> keywords. Override or extend with EXPENSE_CATEGORIES_FILE, a
+# JSON object of the same shape.
+DEFAULT_CATEGORIES: Dict[str, List[str]] = {
+    "Groceries": ["grocery", "groceries", "supermarket", "vegetables", "fruits"],
+    "Food": [
+        "food",
+        "lunch",
+        "dinner",
+        "breakfast",
+        "meal",
+        "restaurant",
+        "snacks",
+        "chai",
+        "coffee",
+        "tea",
+    ],
+    "Transport": [
+        "transport",
+        "uber",
+        "ola",
+        "taxi",
+        "cab",
+        "bus",
+        "train",
+        "metro",
+        "travel",
+        "fuel",
+        "petrol",
+    ],
+    "Furniture": ["table", "chair", "furniture", "desk", "sofa", "couch"],
+    "Rent": ["rent"],
+    "Utilities": ["electricity", "internet", "wifi", "water bill", "phone bill"],
+    "Shopping": ["clothes", "shoes", "shopping"],
+    "Entertainment": ["movie", "movies", "netflix", "concert"],
+    "Health": ["medicine", "doctor", "pharmacy", "hospital", "gym"],
+    "Education": ["books", "course", "tuition"],
+}
+
+MONTHS = {
+    name: number
+    for number, names in enumerate(
+        [
+            ("january", "jan"),
+            ("february", "feb"),
+            ("march", "mar"),
+            ("april", "apr"),
+            ("may",),
+            ("june", "jun"),
+            ("july", "jul"),
+            ("august", "aug"),
+            ("september", "sept", "sep"),
+            ("october", "oct"),
+            ("november", "nov"),
+            ("december", "dec"),
+        ],
+        start=1,
+    )
+    for name in names
+}
+
+WEEKDAY_NAMES = (
+    "monday",
+    "tuesday",
+    "wednesday",
+    "thursday",
+    "friday",
+    "saturday",
+    "sunday",
+)
+WEEKDAYS = {
+    name: number
+    for number, names in enumerate(
+        [
+            ("monday", "mon"),
+            ("tuesday", "tue", "tues"),
+            ("wednesday", "wed"),
+            ("thursday", "thu", "thurs"),
+            ("friday", "fri"),
+            ("saturday", "sat"),
+            ("sunday", "sun"),
+        ]
+    )
+    for name in names
+}
+
+CURRENCIES = {
+    "₹": "INR",
+    "rs": "INR",
+    "rs.": "INR",
+    "inr": "INR",
+    "rupee": "INR",
+    "rupees": "INR",
+    "$": "USD",
+    "usd": "USD",
+    "dollar": "USD",
+    "dollars": "USD",
+    "€": "EUR",
+    "eur": "EUR",
+    "euro": "EUR",
+    "euros": "EUR",
+    "£": "GBP",
+    "gbp": "GBP",
+}
+
+MULTIPLIERS = {"k": 1_000, "lakh": 100_000, "lakhs": 100_000}
+
+
+def _alternation(words) -> str:
+    # Longest first so "rs." wins over "rs" and "water bill" over "water"
+    return "|".join(re.escape(w) for w in sorted(words, key=len, reverse=True))
+
+
+_MONTH = _alternation(MONTHS)
+_WEEKDAY = _alternation(WEEKDAYS)
+_FULL_WEEKDAY = _alternation(WEEKDAY_NAMES)
+_ORDINAL = r"(?:st|nd|rd|th)?"
+
+_PREFIX_CURRENCY = r"₹|\$|€|£|rs\.?|inr|usd|eur|gbp"
+_SUFFIX_CURRENCY = r"rupees?|rs\.?|inr|dollars?|usd|euros?|eur|gbp|bucks"
+
+AMOUNT_RE = re.compile(
+    rf"(?:(?P<pre>{_PREFIX_CURRENCY})\s*)?"
+    r"(?P<num>\d{1,3}(?:,\d{2,3})+(?:\.\d+)?|\d+(?:\.\d+)?)"
+    r"(?:\s*(?P<mult>k|lakhs?)\b)?"
+    rf"(?:\s*(?P<post>{_SUFFIX_CURRENCY})(?![a-z]))?",
+    re.IGNORECASE,
+)
+
+# A bare number followed by an item word ("2 coffees") is a quantity...
+QUANTITY_RE = re.compile(
+    r"\s+(?!(?:for|on|at|in|to|of|from|and|plus|also|then)\b)[a-z]", re.IGNORECASE
+)
+# ...and one after "for"/"on" ("for 100") is the price
+PRICE_PREFIX_RE = re.compile(r"\b(?:for|on)\s+$", re.IGNORECASE)
+
+# Between two amounts, the last of these starts the next expense
+SEPARATOR_RE = re.compile(
+    r"[,;&+\n]|\b(?:and|plus|also|then)\b",
+    re.IGNORECASE,
+)
+
+Period = Tuple[date, date]
+
+
+class UnsupportedCurrency(ValueError):
+    """The amount is not in DEFAULT_CURRENCY; expenses have no currency column."""
+
+
+# (pattern, resolver) pairs tried in order; the first match wins.
+DATE_GRAMMARS: List[Tuple[re.Pattern, Callable[[re.Match, date], date]]] = []
+
+
+def _date_grammar(pattern: str):
+    compiled = re.compile(pattern, re.IGNORECASE)
+
+    def register(resolver):
+        DATE_GRAMMARS.append((compiled, resolver))
+        return resolver
+
+    return register
+
+
+@_date_grammar(r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b")
+def _iso(m, today):
+    return date(int(m[1]), int(m[2]), int(m[3]))
+
+
+@_date_grammar(r"\b(\d{1,2})[/.](\d{1,2})[/.](\d{4})\b")
+def _slashed(m, today):
+    first, second, year = int(m[1]), int(m[2]), int(m[3])
+    # Day first unless that is impossible
+    if first <= 12 < second:
+        return date(year, first, second)
+    return date(year, second, first)
+
+
+@_date_grammar(rf"\b(\d{{1,2}}){_ORDINAL}\s+(?:of\s+)?({_MONTH})\b,?(?:\s+(\d{{4}}))?")
+def _day_month(m, today):
+    year = int(m[3]) if m[3] else today.year
+    return date(year, MONTHS[m[2].lower()], int(m[1]))
+
+
+@_date_grammar(rf"\b({_MONTH})\s+(\d{{1,2}}){_ORDINAL}\b,?(?:\s+(\d{{4}}))?")
+def _month_day(m, today):
+    year = int(m[3]) if m[3] else today.year
+    return date(year, MONTHS[m[1].lower()], int(m[2]))
+
+
+@_date_grammar(r"\bday before yesterday\b")
+def _day_before_yesterday(m, today):
+    return today - timedelta(days=2)
+
+
+@_date_grammar(r"\byesterday\b")
+def _yesterday(m, today):
+    return today - timedelta(days=1)
+
+
+@_date_grammar(r"\btoday\b|\btonight\b|\bthis (?:morning|afternoon|evening)\b")
+def _today(m, today):
+    return today
+
+
+@_date_grammar(r"\b(\d+|a|an|one|two|three)\s+(day|week)s?\s+ago\b")
+def _ago(m, today):
+    words = {"a": 1, "an": 1, "one": 1, "two": 2, "three": 3}
+    count = words.get(m[1].lower()) or int(m[1])
+    return today - timedelta(days=count * (7 if m[2].lower() == "week" else 1))
+
+
+# Abbreviations only after last/this/on: "sun glasses" is not a Sunday
+@_date_grammar(rf"\b(?:(last|this|on)\s+({_WEEKDAY})|({_FULL_WEEKDAY}))\b")
+def _weekday(m, today):
+    back = (today.weekday() - WEEKDAYS[(m[2] or m[3]).lower()]) % 7
+    # "last Monday" never means today
+    if back == 0 and (m[1] or "").lower() == "last":
+        back = 7
+    return today - timedelta(days=back)
+
+
+# Date ranges for questions ("this month", "last week", "in July"); same
+# registration scheme as DATE_GRAMMARS.
+PERIOD_GRAMMARS: List[Tuple[re.Pattern, Callable[[re.Match, date], Period]]] = []
+
+
+def _period_grammar(pattern: str):
+    compiled = re.compile(pattern, re.IGNORECASE)
+
+    def register(resolver):
+        PERIOD_GRAMMARS.append((compiled, resolver))
+        return resolver
+
+    return register
+
+
+def _month_range(year: int, month: int) -> Period:
+    first = date(year, month, 1)
+    following = date(year + month // 12, month % 12 + 1, 1)
+    return first, following - timedelta(days=1)
+
+
+@_period_grammar(r"\b(this|last|past|previous)\s+(week|month|year)\b")
+def _named_period(m, today):
+    previous = m[1].lower() != "this"
+    unit = m[2].lower()
+    if unit == "week":
+        start = today - timedelta(days=today.weekday())
+        if previous:
+            return start - timedelta(days=7), start - timedelta(days=1)
+        return start, today
+    if unit == "month":
+        if previous:
+            last_day = today.replace(day=1) - timedelta(days=1)
+            return last_day.replace(day=1), last_day
+        return today.replace(day=1), today
+    if previous:
+        return date(today.year - 1, 1, 1), date(today.year - 1, 12, 31)
+    return date(today.year, 1, 1), today
+
+
+@_period_grammar(r"\b(?:last|past)\s+(\d+)\s+days\b")
+def _last_days(m, today):
+    return today - timedelta(days=int(m[1]) - 1), today
+
+
+@_period_grammar(rf"\b(?:in|for|during|of)\s+({_MONTH})\b(?:\s+(\d{{4}}))?")
+def _named_month(m, today):
+    month = MONTHS[m[1].lower()]
+    if m[2]:
+        return _month_range(int(m[2]), month)
+    # A month later than the current one means last year's
+    return _month_range(today.year - (month > today.month), month)
+
+
+@dataclass
+class ParseResult:
+    amount: Optional[float] = None
+    currency: str = DEFAULT_CURRENCY
+    category: Optional[str] = None
+    keyword: Optional[str] = None
+    date: Optional[date] = None
+    date_source: str = "default"  # explicit | relative | default
+    confidence: float = 0.0
+    spans: Dict[str, Tuple[int, int]] = field(default_factory=dict)
+
+    def to_expense(self) -> Dict[str, Any]:
+        """Expense dict in the shape of ExpenseCreate (date as ISO string).
+
+        Raises UnsupportedCurrency for amounts in another currency, which
+        would otherwise be stored and totalled as if they were rupees.
+        """
+        if self.currency != DEFAULT_CURRENCY:
+            raise UnsupportedCurrency(
+                f"only {DEFAULT_CURRENCY} amounts can be recorded, "
+                f"got {self.currency} {self.amount:,.2f}"
+            )
+        category = self.category or DEFAULT_CATEGORY
+        return {
+            "amount": self.amount,
+            "category": category,
+            "description": f"Purchase of {self.keyword or category.lower()}",
+            "date": str(self.date),
+        }
+
+
+class ExpenseParser:
+    """Single-pass keyword, amount and date extraction with a confidence score."""
+
+    def __init__(self, categories: Optional[Dict[str, List[str]]] = None):
+        categories = categories or DEFAULT_CATEGORIES
+        self.keyword_category = {
+            keyword.lower(): category
+            for category, keywords in categories.items()
+            for keyword in keywords
+        }
+        # Plurals ("chairs", "buses", "coffees") count as their keyword
+        self.keyword_re = re.compile(
+            rf"\b(?P<keyword>{_alternation(self.keyword_category)})(?:e?s)?\b",
+            re.IGNORECASE,
+        )
+
+    @classmethod
+    def from_env(cls) -> "ExpenseParser":
+        path = os.getenv("EXPENSE_CATEGORIES_FILE")
+        if not path:
+            return cls()
+        with open(path, encoding="utf-8") as f:
+            categories = json.load(f)
+        logger.info(f"Loaded {len(categories)} expense categories from {path}")
+        return cls({**DEFAULT_CATEGORIES, **categories})
+
+    def match_category(self, text: str) -> Optional[Tuple[str, str, Tuple[int, int]]]:
+        """First keyword in the text -> (category, word as written, span)."""
+        m = self.keyword_re.search(text)
+        if not m:
+            return None
+        category = self.keyword_category[m["keyword"].lower()]
+        return category, m.group(0).lower(), m.span()
+
+    @staticmethod
+    def match_date(
+        text: str, today: Optional[date] = None
+    ) -> Optional[Tuple[date, str, Tuple[int, int]]]:
+        today = today or date.today()
+        for index, (pattern, resolver) in enumerate(DATE_GRAMMARS):
+            for m in pattern.finditer(text):
+                try:
+                    resolved = resolver(m, today)
+                except ValueError:  # e.g. 31 February
+                    continue
+                # The first four grammars are absolute dates
+                source = "explicit" if index < 4 else "relative"
+                return resolved, source, m.span()
+        return None
+
+    @classmethod
+    def match_period(
+        cls, text: str, today: Optional[date] = None
+    ) -> Optional[Tuple[Period, Tuple[int, int]]]:
+        """Inclusive (start, end) date range a question refers to.
+
+        Falls back to a single day ("yesterday", "on 26 July") when no
+        range grammar matches.
+        """
+        today = today or date.today()
+        for pattern, resolver in PERIOD_GRAMMARS:
+            m = pattern.search(text)
+            if m:
+                return resolver(m, today), m.span()
+        day = cls.match_date(text, today)
+        if day:
+            return (day[0], day[0]), day[2]
+        return None
+
+    @staticmethod
+    def match_amount(
+        text: str, exclude: Tuple[int, int] = (0, 0)
+    ) -> Optional[Tuple[float, str, Tuple[int, int], bool]]:
+        """Best amount outside `exclude` -> (amount, currency, span, has_currency).
+
+        An amount with a currency marker beats a bare number; otherwise the
+        first bare number wins, unless it is a quantity ("2 coffees for
+        100") and a later one follows "for" or "on".
+        """
+        bare = None
+        quantity = False
+        for m in AMOUNT_RE.finditer(text):
+            start, end = m.span("num")
+            if start < exclude[1] and end > exclude[0]:
+                continue
+            value = float(m["num"].replace(",", ""))
+            if m["mult"]:
+                value *= MULTIPLIERS[m["mult"].lower()]
+            marker = m["pre"] or m["post"]
+            currency = CURRENCIES.get((marker or "").lower(), DEFAULT_CURRENCY)
+            if marker:
+                return value, currency, m.span(), True
+            if bare is None:
+                bare = (value, currency, m.span(), False)
+                quantity = not m["mult"] and bool(QUANTITY_RE.match(text, m.end()))
+            elif quantity and PRICE_PREFIX_RE.search(text, 0, m.start()):
+                bare = (value, currency, m.span(), False)
+                quantity = False
+        return bare
+
+    def parse(self, text: str, today: Optional[date] = None) -> ParseResult:
+        result = ParseResult()
+
+        date_match = self.match_date(text, today)
+        if date_match:
+            result.date, result.date_source, result.spans["date"] = date_match
+            result.confidence += 0.2
+        else:
+            result.date = today or date.today()
+            result.confidence += 0.1
+
+        amount_match = self.match_amount(text, exclude=result.spans.get("date", (0, 0)))
+        if amount_match:
+            result.amount, result.currency, result.spans["amount"], marked = (
+                amount_match
+            )
+            result.confidence += 0.45 if marked else 0.35
+
+        category_match = self.match_category(text)
+        if category_match:
+            result.category, result.keyword, result.spans["category"] = category_match
+            result.confidence += 0.35
+
+        result.confidence = round(min(result.confidence, 1.0), 2)
+        return result
+
+    @staticmethod
+    def segments(text: str) -> List[Tuple[int, int]]:
+        """(start, end) of each expense mentioned in the text.
+
+        Numbers inside dates never count as amounts, and when any amount
+        carries a currency marker, bare numbers ("2 coffees for ₹100") do
+        not either. Consecutive amounts with no separator between them stay
+        in one segment.
+        """
+        dates = [
+            m.span() for pattern, _ in DATE_GRAMMARS for m in pattern.finditer(text)
+        ]
+        amounts = [
+            m
+            for m in AMOUNT_RE.finditer(text)
+            if not any(
+                m.start("num") < end and m.end("num") > start for start, end in dates
+            )
+        ]
+        amounts = [m for m in amounts if m["pre"] or m["post"]] or amounts
+
+        bounds = [0]
+        for previous, current in zip(amounts, amounts[1:]):
+            separators = list(
+                SEPARATOR_RE.finditer(text, previous.end(), current.start())
+            )
+            if separators:
+                bounds.append(separators[-1].start())
+        bounds.append(len(text))
+        return list(zip(bounds, bounds[1:]))
+
+    def parse_many(self, text: str, today: Optional[date] = None) -> List[ParseResult]:
+        """One ParseResult per expense in the text, in order of mention."""
+        shared_date = self.match_date(text, today)
+        results = []
+        for start, end in self.segments(text):
+            result = self.parse(text[start:end], today)
+            result.spans = {
+                name: (span[0] + start, span[1] + start)
+                for name, span in result.spans.items()
+            }
+            if result.date_source == "default" and shared_date:
+                result.date, result.date_source, result.spans["date"] = shared_date
+                result.confidence = round(min(result.confidence + 0.1, 1.0), 2)
+            results.append(result)
+        return results
+
+
+parser = ExpenseParser.from_env()
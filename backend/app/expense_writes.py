@@ -0,0 +1,29 @@
+"""
+Bookkeeping that goes with every expense insert.
+
+Each insert path (the REST endpoints, bulk ingestion, /chat-expense and the
+intent router's add path) calls `record` in its own transaction, so the
+rollups, the expenses data version and the embedding queue cannot drift
+apart between them.
+"""
+
+from typing import Any, Iterable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from . import data_version, embed_expense, rollups
+
+
+def record(
+    db: Session, expenses: Iterable[Any], ids: Optional[List[int]] = None
+) -> None:
+    """Update rollups, bump the data version and queue embeddings for
+    `expenses` (ORM objects or row mappings); `ids` defaults to those of
+    the ORM objects, which are flushed to get them."""
+    expenses = list(expenses)
+    if ids is None:
+        db.flush()
+        ids = [expense.id for expense in expenses]
+    rollups.record_expenses(db, expenses)
+    data_version.bump(db)
+    embed_expense.queue_expenses(db, ids)
@@ -0,0 +1,89 @@
+"""
+Conditional GET for responses derived from the expenses table.
+
+Such responses carry a weak ETag made of the expenses data version (see
+app.data_version, bumped in every write transaction) and the request's
+path and query, Last-Modified from the time of the last write, and
+`Cache-Control: no-cache` so browsers revalidate on every poll. When the
+client's If-None-Match (or, without one, If-Modified-Since) still matches,
+the route answers 304 after a single primary-key read of data_versions,
+without querying expenses at all.
+"""
+
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Optional
+import hashlib
+
+from fastapi import Request, Response
+from sqlalchemy.orm import Session
+
+from . import data_version
+from .database import SessionLocal
+
+
+def etag(version: int, request: Request) -> str:
+    # Weak: the compression middleware changes the bytes, not the content
+    query = "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+    digest = hashlib.sha1(f"{request.url.path}?{query}".encode()).hexdigest()[:12]
+    return f'W/"{version}-{digest}"'
+
+
+def validators(
+    version: int, updated_at: Optional[datetime], request: Request
+) -> Dict[str, str]:
+    headers = {"ETag": etag(version, request), "Cache-Control": "no-cache"}
+    if updated_at is not None:
+        headers["Last-Modified"] = format_datetime(
+            updated_at.astimezone(timezone.utc), usegmt=True
+        )
+    return headers
+
+
+def _etag_matches(if_none_match: str, tag: str) -> bool:
+    # If-None-Match uses the weak comparison: W/ prefixes are ignored
+    if if_none_match.strip() == "*":
+        return True
+    opaque = tag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
+    )
+
+
+def _unmodified_since(if_modified_since: str, updated_at: Optional[datetime]) -> bool:
+    if updated_at is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    # HTTP dates have whole seconds
+    return updated_at.replace(microsecond=0) <= since
+
+
+def check(
+    request: Request, response: Response, db: Optional[Session] = None
+) -> Optional[Response]:
+    """Put the validators on `response`; return a 304 response to send
+    instead when the client's copy is still current."""
+    if db is None:
+        with SessionLocal() as session:
+            version, updated_at = data_version.current(session)
+    else:
+        version, updated_at = data_version.current(db)
+    headers = validators(version, updated_at, request)
+    response.headers.update(headers)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        fresh = _etag_matches(if_none_match, headers["ETag"])
+    else:
+        fresh = _unmodified_since(
+            request.headers.get("if-modified-since", ""), updated_at
+        )
+    if fresh:
+        return Response(status_code=304, headers=headers)
+    return None
@@ -0,0 +1,208 @@
+"""
+Deterministic intent routing in front of the ReAct agent.
+
+Every chat message is classified as add, query, chit-chat or complex using
+the rule-based parser. Confident add/query messages are executed directly
+against the database and chit-chat gets a canned reply; only "complex"
+messages reach the agent (and its LLM calls). Queries asking to show or
+list expenses get the matching rows, the others get totals.
+"""
+
+from collections import Counter
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Any, Dict, Optional, Tuple
+import logging
+import os
+import re
+import threading
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import expense_writes, models, rollups
+from .expense_parser import AMOUNT_RE, ParseResult, UnsupportedCurrency, parser
+
+logger = logging.getLogger("intent_router")
+
+INTENT_ROUTER_ENABLED = os.getenv("INTENT_ROUTER_ENABLED", "1") == "1"
+INTENT_ROUTER_MIN_CONFIDENCE = float(os.getenv("INTENT_ROUTER_MIN_CONFIDENCE", "0.8"))
+# Most expenses a listing reply shows
+INTENT_ROUTER_MAX_ROWS = int(os.getenv("INTENT_ROUTER_MAX_ROWS", "20"))
+
+ADD, QUERY, CHITCHAT, COMPLEX = "add", "query", "chit-chat", "complex"
+
+CHITCHAT_RE = re.compile(
+    r"^\s*(?:hi|hii+|hello|hey|yo|thanks|thank you|thx|ok|okay|cool|great|"
+    r"good (?:morning|afternoon|evening|night)|bye|goodbye)\b[\s!.,]*"
+    r"(?:zenspend|there)?[\s!.]*$",
+    re.IGNORECASE,
+)
+TOTALS_RE = re.compile(
+    r"\b(?:how much|how many|total|summary|summari[sz]e|"
+    r"what did i spend|what have i spent|did i spend|have i spent)\b",
+    re.IGNORECASE,
+)
+LIST_RE = re.compile(r"\b(?:show|list)\b", re.IGNORECASE)
+# Things the fast path cannot answer correctly on its own
+COMPLEX_RE = re.compile(
+    r"\b(?:and|also|plus|split|each|per|average|compare|budget|save|why|"
+    r"delete|remove|update|change|undo|instead)\b",
+    re.IGNORECASE,
+)
+
+CHITCHAT_REPLY = (
+    'Hi! Tell me what you spent (e.g. "500 on groceries yesterday") '
+    'or ask about your spending (e.g. "how much on food this month?").'
+)
+
+
+@dataclass
+class Intent:
+    route: str
+    parsed: Optional[ParseResult] = None
+    period: Optional[Tuple[date, date]] = None
+    # A query for the expenses themselves rather than their totals
+    listing: bool = False
+    reason: str = ""
+
+
+class RouterStats:
+    """Per-route message counters and the number of agent runs avoided."""
+
+    def __init__(self):
+        self._counts: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, route: str) -> None:
+        with self._lock:
+            self._counts[route] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._counts)
+        handled = sum(n for route, n in counts.items() if route != COMPLEX)
+        return {
+            "enabled": INTENT_ROUTER_ENABLED,
+            "min_confidence": INTENT_ROUTER_MIN_CONFIDENCE,
+            "routes": counts,
+            "agent_runs_avoided": handled,
+        }
+
+
+stats = RouterStats()
+
+
+def _amount_count(text: str, parsed: ParseResult) -> int:
+    date_start, date_end = parsed.spans.get("date", (0, 0))
+    return sum(
+        1
+        for m in AMOUNT_RE.finditer(text)
+        if not (m.start("num") < date_end and m.end("num") > date_start)
+    )
+
+
+def classify(text: str, today: Optional[date] = None) -> Intent:
+    """Pick the cheapest route that can handle `text` correctly."""
+    if not INTENT_ROUTER_ENABLED:
+        return Intent(COMPLEX, reason="router disabled")
+    if CHITCHAT_RE.match(text):
+        return Intent(CHITCHAT)
+    if COMPLEX_RE.search(text):
+        return Intent(COMPLEX, reason="compound or unsupported request")
+
+    parsed = parser.parse(text, today)
+
+    totals = TOTALS_RE.search(text)
+    listing = LIST_RE.search(text)
+    if totals or listing or text.rstrip().endswith("?"):
+        period = parser.match_period(text, today)
+        if period is None:
+            return Intent(COMPLEX, parsed, reason="question without a date range")
+        return Intent(
+            QUERY, parsed, period=period[0], listing=bool(listing and not totals)
+        )
+
+    if parsed.amount is None or parsed.category is None:
+        return Intent(COMPLEX, parsed, reason="missing amount or category")
+    if _amount_count(text, parsed) > 1:
+        return Intent(COMPLEX, parsed, reason="more than one amount")
+    if parsed.confidence < INTENT_ROUTER_MIN_CONFIDENCE:
+        return Intent(COMPLEX, parsed, reason=f"confidence {parsed.confidence}")
+    return Intent(ADD, parsed)
+
+
+def _money(amount: float, currency: str) -> str:
+    if currency == "INR":
+        return f"₹{amount:,.2f}"
+    return f"{currency} {amount:,.2f}"
+
+
+def _list_expenses(
+    db: Session, start: date, end: date, category: Optional[str], count: int
+) -> str:
+    """One line per expense in [start, end], oldest first."""
+    query = (
+        select(models.Expense)
+        .where(
+            models.Expense.date >= start,
+            models.Expense.date < end + timedelta(days=1),
+        )
+        .order_by(models.Expense.date, models.Expense.id)
+        .limit(INTENT_ROUTER_MAX_ROWS)
+    )
+    if category:
+        query = query.where(models.Expense.category == category)
+    lines = [
+        f"- {e.date.date()}: {_money(e.amount, 'INR')} on {e.category}"
+        + (f" ({e.description})" if e.description else "")
+        for e in db.scalars(query)
+    ]
+    if count > len(lines):
+        lines.append(f"...and {count - len(lines)} more.")
+    return "\n".join(lines)
+
+
+def execute(db: Session, intent: Intent) -> str:
+    """Run a non-complex intent and return the assistant's reply."""
+    if intent.route == CHITCHAT:
+        return CHITCHAT_REPLY
+
+    if intent.route == ADD:
+        try:
+            fields = intent.parsed.to_expense()
+        except UnsupportedCurrency as e:
+            return f"I couldn't add that expense: {e}. Please give the amount in ₹."
+        expense = models.Expense(
+            amount=fields["amount"],
+            category=fields["category"],
+            description=fields["description"],
+            date=intent.parsed.date,
+        )
+        db.add(expense)
+        expense_writes.record(db, [expense])
+        db.commit()
+        return (
+            f"I've added your expense of "
+            f"{_money(intent.parsed.amount, intent.parsed.currency)} "
+            f"for {expense.category} on {intent.parsed.date}."
+        )
+
+    if intent.route == QUERY:
+        start, end = intent.period
+        category = intent.parsed.category if intent.parsed else None
+        summary = rollups.summarize(db, start, end, category)
+        scope = f"on {category}" if category else "in total"
+        span = f"on {start}" if start == end else f"from {start} to {end}"
+        total = (
+            f"You spent {_money(summary['total'], 'INR')} {scope} {span} "
+            f"across {summary['count']} expenses."
+        )
+        if not intent.listing:
+            return total
+        if not summary["count"]:
+            scope = f"on {category} " if category else ""
+            return f"You have no expenses {scope}{span}."
+        return total + "\n" + _list_expenses(db, start, end, category, summary["count"])
+
+    raise ValueError(f"Intent {intent.route!r} must go through the agent")
@@ -0,0 +1,464 @@
+"""
+Durable background jobs, queued in Postgres.
+
+Work that does not have to finish before the response (embedding new
+expenses, writing conversations to memory) is inserted into the jobs table,
+in the same transaction as the write that caused it where there is one.
+Workers claim ready jobs with SELECT ... FOR UPDATE SKIP LOCKED, so any
+number of them share the queue without claiming a job twice or blocking
+each other. A worker claims up to its handler's `batch_size` jobs of one
+kind at a time and passes all their payloads to a single handler call, so
+queued expenses are embedded with one model request.
+
+A claimed job is leased for JOB_LEASE seconds; when its worker dies the
+job is queued again once the lease runs out. A failing batch is retried
+job by job, and a failing job is retried with exponential backoff
+(JOB_RETRY_BASE * 2^attempt seconds) until it has run JOB_MAX_ATTEMPTS
+times, then kept as failed. Done jobs are deleted after JOB_RETENTION
+seconds.
+
+Handlers are registered with `@handler` in the modules listed in
+HANDLER_MODULES. The API runs JOB_API_WORKERS worker threads of its own
+(set it to 0 when dedicated workers run); dedicated worker processes:
+
+    python -m app.jobs [--workers N] [--status] [--retry-failed]
+"""
+
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+import argparse
+import importlib
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+
+from sqlalchemy import Connection
+from sqlalchemy.orm import Session
+
+from . import metrics
+from .database import AsyncSessionLocal, SessionLocal, engine
+
+logger = logging.getLogger("jobs")
+
+JOB_API_WORKERS = int(os.getenv("JOB_API_WORKERS", "1"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+JOB_LEASE = float(os.getenv("JOB_LEASE", "300"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_RETRY_BASE = float(os.getenv("JOB_RETRY_BASE", "5"))
+JOB_RETENTION = float(os.getenv("JOB_RETENTION", "86400"))
+# How often a worker requeues expired leases and deletes old done jobs
+JOB_MAINTENANCE_INTERVAL = float(os.getenv("JOB_MAINTENANCE_INTERVAL", "60"))
+
+# Modules whose import registers handlers
+HANDLER_MODULES = ("app.embed_expense", "app.memory")
+
+STATUSES = ("queued", "running", "done", "failed")
+
+# pyformat placeholders, executed through exec_driver_sql
+ENQUEUE_SQL = """
+INSERT INTO jobs (kind, payload, max_attempts, run_at)
+VALUES (%(kind)s, %(payload)s::jsonb, %(max_attempts)s,
+        now() + make_interval(secs => %(delay)s))
+RETURNING id
+"""
+
+# The oldest ready job picks the kind; the batch is the oldest ready jobs
+# of that kind, up to that kind's batch size. Rows locked by another
+# worker's claim are skipped, not waited for.
+CLAIM_SQL = """
+WITH head AS (
+    SELECT j.kind, k.batch_size
+    FROM jobs j
+    JOIN unnest(%(kinds)s::text[], %(batch_sizes)s::int[]) AS k(kind, batch_size)
+      ON k.kind = j.kind
+    WHERE j.status = 'queued' AND j.run_at <= now()
+    ORDER BY j.run_at, j.id
+    LIMIT 1
+    FOR UPDATE OF j SKIP LOCKED
+), batch AS (
+    SELECT j.id
+    FROM jobs j
+    WHERE j.status = 'queued' AND j.run_at <= now()
+      AND j.kind = (SELECT kind FROM head)
+    ORDER BY j.run_at, j.id
+    LIMIT (SELECT batch_size FROM head)
+    FOR UPDATE SKIP LOCKED
+)
+UPDATE jobs SET
+    status = 'running',
+    attempts = jobs.attempts + 1,
+    locked_by = %(worker)s,
+    locked_until = now() + make_interval(secs => %(lease)s)
+FROM batch
+WHERE jobs.id = batch.id
+RETURNING jobs.id, jobs.kind, jobs.payload, jobs.attempts, jobs.max_attempts
+"""
+
+COMPLETE_SQL = """
+UPDATE jobs SET status = 'done', finished_at = now(),
+    locked_by = NULL, locked_until = NULL, last_error = NULL
+WHERE id = ANY(%(ids)s) AND locked_by = %(worker)s
+"""
+
+FAIL_SQL = """
+UPDATE jobs SET
+    status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END,
+    finished_at = CASE WHEN attempts >= max_attempts THEN now() END,
+    run_at = now() + make_interval(secs => %(retry_base)s * 2 ^ (attempts - 1)),
+    last_error = %(error)s,
+    locked_by = NULL,
+    locked_until = NULL
+WHERE id = ANY(%(ids)s) AND locked_by = %(worker)s
+RETURNING id, status
+"""
+
+REQUEUE_EXPIRED_SQL = """
+UPDATE jobs SET
+    status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END,
+    finished_at = CASE WHEN attempts >= max_attempts THEN now() END,
+    last_error = 'lease expired on ' || locked_by,
+    locked_by = NULL,
+    locked_until = NULL
+WHERE status = 'running' AND locked_until < now()
+"""
+
+PRUNE_SQL = """
+DELETE FROM jobs
+WHERE status = 'done' AND finished_at < now() - make_interval(secs => %(retention)s)
+"""
+
+RETRY_FAILED_SQL = """
+UPDATE jobs SET status = 'queued', attempts = 0, run_at = now(), finished_at = NULL
+WHERE status = 'failed'
+"""
+
+STATUS_SQL = """
+SELECT kind, status, count(*) AS jobs,
+       extract(epoch FROM now() - min(run_at) FILTER (
+           WHERE status = 'queued' AND run_at <= now()
+       )) AS oldest_ready_seconds
+FROM jobs
+GROUP BY kind, status
+ORDER BY kind, status
+"""
+
+FAILURES_SQL = """
+SELECT id, kind, status, attempts, last_error, run_at, finished_at
+FROM jobs
+WHERE last_error IS NOT NULL AND status IN ('queued', 'failed')
+ORDER BY coalesce(finished_at, run_at) DESC
+LIMIT %(limit)s
+"""
+
+JOB_SQL = """
+SELECT id, kind, status, attempts, max_attempts, run_at, locked_by,
+       locked_until, last_error, created_at, finished_at
+FROM jobs WHERE id = %(id)s
+"""
+
+
+@dataclass
+class Handler:
+    func: Callable[[List[Dict[str, Any]]], None]
+    batch_size: int
+    max_attempts: int
+
+
+HANDLERS: Dict[str, Handler] = {}
+
+
+def handler(kind: str, batch_size: int = 1, max_attempts: int = JOB_MAX_ATTEMPTS):
+    """Register `func(payloads)` to run queued jobs of `kind`, up to
+    `batch_size` of them per call."""
+
+    def register(func: Callable[[List[Dict[str, Any]]], None]):
+        if kind in HANDLERS:
+            raise ValueError(f"Duplicate job handler for {kind}")
+        HANDLERS[kind] = Handler(func, max(batch_size, 1), max_attempts)
+        return func
+
+    return register
+
+
+def import_handlers() -> None:
+    for module in HANDLER_MODULES:
+        importlib.import_module(module)
+
+
+def _max_attempts(kind: str) -> int:
+    registered = HANDLERS.get(kind)
+    return registered.max_attempts if registered else JOB_MAX_ATTEMPTS
+
+
+def enqueue(db: Session, kind: str, payload: Dict[str, Any], delay: float = 0.0) -> int:
+    """Queue a job inside the caller's transaction; it becomes visible to
+    workers when that transaction commits."""
+    return (
+        db.connection()
+        .exec_driver_sql(
+            ENQUEUE_SQL,
+            {
+                "kind": kind,
+                "payload": json.dumps(payload, default=str),
+                "max_attempts": _max_attempts(kind),
+                "delay": delay,
+            },
+        )
+        .scalar()
+    )
+
+
+def submit(kind: str, payload: Dict[str, Any], delay: float = 0.0) -> int:
+    """Queue a job in a transaction of its own."""
+    with SessionLocal() as db:
+        job_id = enqueue(db, kind, payload, delay)
+        db.commit()
+    return job_id
+
+
+async def asubmit(kind: str, payload: Dict[str, Any], delay: float = 0.0) -> int:
+    """Async variant of submit for the async request path."""
+    async with AsyncSessionLocal() as db:
+        job_id = await db.run_sync(enqueue, kind, payload, delay)
+        await db.commit()
+    return job_id
+
+
+@dataclass
+class ClaimedJob:
+    id: int
+    kind: str
+    payload: Dict[str, Any]
+    attempts: int
+    max_attempts: int
+
+
+class Worker:
+    """Claims and runs batches of jobs until stopped."""
+
+    def __init__(self, name: Optional[str] = None):
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.processed = 0
+        self.failed = 0
+        self._last_maintenance = 0.0
+
+    def claim(self, connection: Connection) -> List[ClaimedJob]:
+        kinds = sorted(HANDLERS)
+        rows = connection.exec_driver_sql(
+            CLAIM_SQL,
+            {
+                "kinds": kinds,
+                "batch_sizes": [HANDLERS[kind].batch_size for kind in kinds],
+                "worker": self.name,
+                "lease": JOB_LEASE,
+            },
+        ).all()
+        connection.commit()
+        return sorted((ClaimedJob(*row) for row in rows), key=lambda job: job.id)
+
+    def _complete(self, connection: Connection, jobs: List[ClaimedJob]) -> None:
+        connection.exec_driver_sql(
+            COMPLETE_SQL, {"ids": [job.id for job in jobs], "worker": self.name}
+        )
+        connection.commit()
+        self.processed += len(jobs)
+        metrics.jobs_processed.inc(len(jobs), kind=jobs[0].kind, result="done")
+
+    def _fail(self, connection: Connection, jobs: List[ClaimedJob], error) -> None:
+        rows = connection.exec_driver_sql(
+            FAIL_SQL,
+            {
+                "ids": [job.id for job in jobs],
+                "worker": self.name,
+                "error": f"{type(error).__name__}: {error}"[:2000],
+                "retry_base": JOB_RETRY_BASE,
+            },
+        ).all()
+        connection.commit()
+        self.failed += len(jobs)
+        for job_id, status in rows:
+            result = "failed" if status == "failed" else "retried"
+            metrics.jobs_processed.inc(kind=jobs[0].kind, result=result)
+            logger.warning(f"Job {job_id} ({jobs[0].kind}) {result}: {error}")
+
+    def _run(self, jobs: List[ClaimedJob]) -> None:
+        kind = jobs[0].kind
+        with metrics.job_duration.time(kind=kind):
+            HANDLERS[kind].func([job.payload for job in jobs])
+
+    def run_once(self) -> int:
+        """Claim and run one batch; returns the number of jobs claimed."""
+        with engine.connect() as connection:
+            jobs = self.claim(connection)
+            if not jobs:
+                return 0
+            try:
+                self._run(jobs)
+            except Exception as e:
+                if len(jobs) == 1:
+                    self._fail(connection, jobs, e)
+                    return 1
+                # Find the bad jobs instead of retrying the whole batch
+                logger.warning(f"Batch of {len(jobs)} {jobs[0].kind} jobs failed: {e}")
+                for job in jobs:
+                    try:
+                        self._run([job])
+                    except Exception as job_error:
+                        self._fail(connection, [job], job_error)
+                    else:
+                        self._complete(connection, [job])
+                return len(jobs)
+            self._complete(connection, jobs)
+            return len(jobs)
+
+    def maintain(self) -> None:
+        """Requeue jobs whose lease expired and delete old done jobs."""
+        with engine.begin() as connection:
+            requeued = connection.exec_driver_sql(REQUEUE_EXPIRED_SQL).rowcount
+            pruned = connection.exec_driver_sql(
+                PRUNE_SQL, {"retention": JOB_RETENTION}
+            ).rowcount
+        if requeued:
+            logger.warning(f"Requeued {requeued} jobs with expired leases")
+        if pruned:
+            logger.info(f"Deleted {pruned} finished jobs")
+
+    def run(self, stop: threading.Event) -> None:
+        logger.info(f"Job worker {self.name} started for {sorted(HANDLERS)}")
+        while not stop.is_set():
+            try:
+                if time.monotonic() - self._last_maintenance > JOB_MAINTENANCE_INTERVAL:
+                    self._last_maintenance = time.monotonic()
+                    self.maintain()
+                if self.run_once():
+                    continue
+            except Exception as e:
+                # Database unavailable and the like: back off and try again
+                logger.error(f"Job worker {self.name} error: {e}")
+            stop.wait(JOB_POLL_INTERVAL)
+        logger.info(f"Job worker {self.name} stopped")
+
+
+_workers: List[Worker] = []
+
+
+def start_workers(count: int = JOB_API_WORKERS) -> Callable[[], None]:
+    """Run `count` worker threads in this process; returns a function that
+    stops them and waits for their current batch."""
+    import_handlers()
+    stop = threading.Event()
+    workers, threads = [], []
+    for i in range(count):
+        worker = Worker(f"{socket.gethostname()}:{os.getpid()}:{i}")
+        workers.append(worker)
+        thread = threading.Thread(
+            target=worker.run, args=(stop,), name=f"job-worker-{i}", daemon=True
+        )
+        thread.start()
+        threads.append(thread)
+    _workers.extend(workers)
+
+    def shutdown() -> None:
+        stop.set()
+        for thread in threads:
+            thread.join()
+        for worker in workers:
+            _workers.remove(worker)
+
+    return shutdown
+
+
+def get_job(job_id: int) -> Optional[Dict[str, Any]]:
+    with engine.connect() as connection:
+        row = connection.exec_driver_sql(JOB_SQL, {"id": job_id}).mappings().first()
+    return dict(row) if row else None
+
+
+def status(failures: int = 10) -> Dict[str, Any]:
+    """Job counts per kind and status, plus the most recent failures."""
+    with engine.connect() as connection:
+        rows = connection.exec_driver_sql(STATUS_SQL).all()
+        recent = connection.exec_driver_sql(FAILURES_SQL, {"limit": failures})
+        recent = [dict(row) for row in recent.mappings()]
+    kinds: Dict[str, Dict[str, Any]] = {}
+    for kind, job_status, count, oldest in rows:
+        entry = kinds.setdefault(kind, {name: 0 for name in STATUSES})
+        entry[job_status] = count
+        if oldest is not None:
+            entry["oldest_ready_seconds"] = round(float(oldest), 3)
+    return {
+        "kinds": kinds,
+        "recent_failures": recent,
+        "handlers": {
+            kind: {"batch_size": h.batch_size, "max_attempts": h.max_attempts}
+            for kind, h in sorted(HANDLERS.items())
+        },
+        "local_workers": [
+            {"name": w.name, "processed": w.processed, "failed": w.failed}
+            for w in _workers
+        ],
+    }
+
+
+def _process_main() -> None:
+    from .logging_config import configure_logging
+
+    configure_logging()
+    import_handlers()
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop.set())
+    Worker(f"{socket.gethostname()}:{os.getpid()}").run(stop)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Background job workers")
+    parser.add_argument("--workers", type=int, default=2, help="Worker processes")
+    parser.add_argument(
+        "--status", action="store_true", help="Print queue status and exit"
+    )
+    parser.add_argument(
+        "--retry-failed", action="store_true", help="Queue failed jobs again"
+    )
+    args = parser.parse_args()
+    if args.retry_failed:
+        with engine.begin() as connection:
+            retried = connection.exec_driver_sql(RETRY_FAILED_SQL).rowcount
+        print(f"✅ Queued {retried} failed jobs again")
+    if args.status or args.retry_failed:
+        import_handlers()
+        print(json.dumps(status(), indent=2, default=str))
+        return
+
+    # Spawned, not forked: children must not share the parent's pooled connections
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=_process_main, name=f"job-worker-{i}")
+        for i in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    print(f"✅ Started {len(processes)} job workers")
+
+    def stop_children(*_):
+        # Each child finishes its current batch, then exits
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, stop_children)
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    # Handlers register with app.jobs, not with this __main__ copy of it
+    from app.jobs import main as jobs_main
+
+    jobs_main()
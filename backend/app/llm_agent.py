@@ -1,4 +1,3 @@
-from langchain_ollama import ChatOllama
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain.tools import Tool
 from langchain.agents import create_react_agent, AgentExecutor
@@ -7,25 +6,30 @@ from langchain.agents.format_scratchpad import format_log_to_messages
 from langchain.agents.output_parsers import ReActSingleInputOutputParser
 from langchain.output_parsers import OutputFixingParser
 from langchain_core.output_parsers import PydanticOutputParser
-from .memory import save_conversation, query_memory
-from datetime import date, timedelta
+from .memory import (
+    queue_conversation,
+    query_memory,
+    aqueue_conversation,
+    aquery_memory,
+)
+from .database import AsyncSessionLocal, SessionLocal
+from . import analytics, intent_router
+from .rollups import summarize
+from .expense_parser import UnsupportedCurrency, parser as rule_parser
+from .llm_cache import chat_ollama
+from .llm_scheduler import AdmissionError
+from . import metrics
+from .tracing import stage, trace, tracing_callbacks
+from datetime import date
+from functools import lru_cache
 import re
 import json
 import logging
-import sys
-from typing import Dict, Any
+import os
+import time
+from typing import Any, AsyncIterator, Dict, List
 from pydantic import BaseModel, Field
-from langchain.callbacks.base import BaseCallbackHandler
-
-# Set up logging for debugging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    handlers=[
-        logging.FileHandler("agent_debug.log"),
-        logging.StreamHandler(sys.stdout),
-    ],
-)
+
 logger = logging.getLogger("llm_agent")
 
 # Define the input schema for creating an expense
@@ -44,9 +48,16 @@ Final Answer: the final answer to the original input question
 CRITICAL: You MUST include "Action:" immediately after "Thought:" when using tools.
 """
 
-# Set up the local LLM (chat model)
-llm = ChatOllama(model="phi3:mini", temperature=0)
-logger.info("Initialized Ollama LLM with model: phi3:mini")
+# The model, agent and fixing parser are built on first use (or by
+# app.warmup) so importing this module stays cheap.
+
+
+@lru_cache(maxsize=None)
+def get_llm():
+    """The local LLM (chat model)."""
+    llm = chat_ollama("phi3:mini", temperature=0)
+    logger.info("Initialized Ollama LLM with model: phi3:mini")
+    return llm
 
 
 # Define tool schemas
@@ -70,28 +81,6 @@ class ExpenseQueryInput(BaseModel):
 
 
 # Tool functions (accept flexible, non-JSON inputs too)
-MONTHS = {
-    m.lower(): i
-    for i, m in enumerate(
-        [
-            "January",
-            "February",
-            "March",
-            "April",
-            "May",
-            "June",
-            "July",
-            "August",
-            "September",
-            "October",
-            "November",
-            "December",
-        ],
-        start=1,
-    )
-}
-
-
 def _parse_flexible_input(input_str: str) -> Dict[str, Any]:
     """Parse various input formats into a structured dictionary."""
     logger.debug(f"Parsing flexible input: {input_str}")
@@ -110,37 +99,15 @@ def _parse_flexible_input(input_str: str) -> Dict[str, Any]:
         logger.debug(f"Key-value parsing successful: {kv}")
         return kv
 
+    # Only report fields the rule-based parser actually found
+    parsed = rule_parser.parse(input_str)
     out: Dict[str, Any] = {}
-
-    amt = re.search(r"(?:₹|rs\.?\s*)?(\d+(?:\.\d+)?)", input_str, flags=re.IGNORECASE)
-    if amt:
-        out["amount"] = float(amt.group(1))
-        logger.debug(f"Extracted amount: {out['amount']}")
-
-    lower = input_str.lower()
-    if any(w in lower for w in ["grocery", "groceries", "supermarket"]):
-        out["category"] = "Groceries"
-    elif any(w in lower for w in ["food", "lunch", "dinner", "breakfast"]):
-        out["category"] = "Food"
-    elif any(w in lower for w in ["transport", "uber", "ola", "taxi", "bus"]):
-        out["category"] = "Transport"
-
-    if "category" in out:
-        logger.debug(f"Extracted category: {out['category']}")
-
-    m1 = re.search(r"\b([A-Za-z]+)\s+(\d{1,2})\b", input_str)
-    m2 = re.search(r"\b(\d{1,2})\s+([A-Za-z]+)\b", input_str)
-    year = date.today().year
-    if m1 and m1.group(1).lower() in MONTHS:
-        mm = MONTHS[m1.group(1).lower()]
-        dd = int(m1.group(2))
-        out["date"] = f"{year:04d}-{mm:02d}-{dd:02d}"
-        logger.debug(f"Extracted date (pattern 1): {out['date']}")
-    elif m2 and m2.group(2).lower() in MONTHS:
-        mm = MONTHS[m2.group(2).lower()]
-        dd = int(m2.group(1))
-        out["date"] = f"{year:04d}-{mm:02d}-{dd:02d}"
-        logger.debug(f"Extracted date (pattern 2): {out['date']}")
+    if parsed.amount is not None:
+        out["amount"] = parsed.amount
+    if parsed.category:
+        out["category"] = parsed.category
+    if parsed.date_source != "default":
+        out["date"] = str(parsed.date)
 
     logger.debug(f"Final flexible parsing result: {out}")
     return out
@@ -186,7 +153,20 @@ def query_expenses(input_json: str) -> str:
         raw = _parse_flexible_input(input_json)
         logger.debug(f"Parsed query parameters: {raw}")
         data = ExpenseQueryInput(**raw)
-        result = f"Querying expenses from {data.start_date} to {data.end_date} in category {data.category or 'all'}"
+        db = SessionLocal()
+        try:
+            summary = summarize(
+                db,
+                date.fromisoformat(data.start_date),
+                date.fromisoformat(data.end_date),
+                data.category,
+            )
+        finally:
+            db.close()
+        result = (
+            f"Found {summary['count']} expenses totalling ₹{summary['total']:.2f} "
+            f"from {data.start_date} to {data.end_date} in category {data.category or 'all'}"
+        )
         logger.info(f"Query executed: {result}")
         return result
     except Exception as e:
@@ -213,6 +193,25 @@ def add_expense_tool(amount: int, category: str, date: str):
         return error_msg
 
 
+def spending_analytics(input_str: str) -> str:
+    """Answer trend, average, forecast and outlier questions from the
+    analytics engine instead of raw rows."""
+    logger.info(f"Spending analytics with input: {input_str}")
+    try:
+        bare = input_str.strip().strip("'\"").lower()
+        if bare in analytics.REPORTS:
+            return analytics.describe(bare)
+        raw = _parse_flexible_input(input_str)
+        if not isinstance(raw, dict):
+            raw = {}
+        report = str(raw.get("report") or "monthly").strip().lower()
+        return analytics.describe(report, raw.get("category"))
+    except Exception as e:
+        error_msg = f"Error computing analytics: {str(e)}"
+        logger.error(error_msg)
+        return error_msg
+
+
 # Define tools with improved descriptions
 tools = [
     Tool.from_function(
@@ -231,6 +230,16 @@ tools = [
         Example: {"start_date": "2023-07-01", "end_date": "2023-07-31", "category": "Food"}""",
         args_schema=ExpenseQueryInput,
     ),
+    Tool(
+        name="spending_analytics",
+        func=spending_analytics,
+        description="""Trends and statistics over all recorded expenses.
+        Usage: Provide JSON with 'report' and optional 'category'. Reports:
+        'monthly' (this month against the usual monthly spend), 'percentiles'
+        (typical amounts per category), 'forecast' (next months' spending),
+        'anomalies' (unusual recent expenses), 'rolling' (last 90 days).
+        Example: {"report": "monthly", "category": "Food"}""",
+    ),
     Tool(
         name="add_expense_tool",
         func=add_expense_tool,
@@ -258,6 +267,7 @@ prompt = ChatPromptTemplate.from_messages(
 You help users add expenses to their tracker and query information about their spending.
 When a user mentions spending money, help them add it as an expense.
 When they ask about their spending, help them query their expenses.
+For averages, trends, forecasts or unusual expenses use spending_analytics.
 
 IMPORTANT FORMATTING INSTRUCTIONS:
 {format_instructions}
@@ -304,172 +314,192 @@ prompt = prompt.partial(
     format_instructions=FORMAT_INSTRUCTIONS.format(tool_names=", ".join(tool_names)),
 )
 
-# Create the ReAct agent and executor with proper scratchpad handling and debugging
-logger.info("Creating ReAct agent with structured prompt")
-
-
-class DebugCallbackHandler(BaseCallbackHandler):
-    def on_llm_start(self, serialized, prompts, **kwargs):
-        logger.debug(f"LLM PROMPT:\n{prompts[0]}")
-
-    def on_llm_end(self, response, **kwargs):
-        logger.debug(f"LLM RESPONSE:\n{response.generations[0][0].text}")
+# Echo each ReAct step to stdout; prompts are traced by tracing_callbacks
+AGENT_VERBOSE = os.getenv("AGENT_VERBOSE", "0") == "1"
 
-    def on_tool_start(self, serialized, input_str, **kwargs):
-        logger.debug(f"TOOL START: {serialized['name']} with input: {input_str}")
 
-    def on_tool_end(self, output, **kwargs):
-        logger.debug(f"TOOL OUTPUT: {output}")
+@lru_cache(maxsize=None)
+def get_agent_executor() -> AgentExecutor:
+    """The ReAct agent and executor with proper scratchpad handling."""
+    logger.info("Creating ReAct agent with structured prompt")
+    agent = create_react_agent(
+        get_llm(), tools, prompt, output_parser=ReActSingleInputOutputParser()
+    )
+    return AgentExecutor.from_agent_and_tools(
+        agent=agent,
+        tools=tools,
+        verbose=AGENT_VERBOSE,
+        handle_parsing_errors=True,
+        max_iterations=10,
+        max_execution_time=60,
+        # Plan through invoke() so LLM calls go through the completion cache;
+        # astream_events still receives the tokens of uncached calls
+        stream_runnable=False,
+    )
 
-    def on_chain_start(self, serialized, inputs, **kwargs):
-        logger.debug(f"CHAIN START: {serialized['name']} with inputs: {inputs}")
 
-    def on_chain_end(self, outputs, **kwargs):
-        logger.debug(f"CHAIN END: {outputs}")
+# Passed per call: constructor callbacks are not inherited by the LLM and
+# tool runs inside the executor
+AGENT_RUN_CONFIG = {"callbacks": tracing_callbacks}
 
-    def on_agent_action(self, action, **kwargs):
-        logger.debug(f"AGENT ACTION: {action}")
 
-    def on_agent_finish(self, finish, **kwargs):
-        logger.debug(f"AGENT FINISH: {finish}")
+def _with_memory_context(user_input: str, memory_docs) -> str:
+    """Prefix the user input with relevant past conversation snippets."""
+    context = "\n".join(doc.page_content for doc in memory_docs)
+    logger.debug(
+        f"Retrieved context: {context[:200]}..." if context else "No context retrieved"
+    )
 
+    if not context:
+        return user_input
+    logger.debug(f"Enhanced input with context")
+    return (
+        f"Context from previous conversations:\n{context}\n\nUser input: {user_input}"
+    )
 
-debug_callbacks = [DebugCallbackHandler()]
 
-agent = create_react_agent(
-    llm, tools, prompt, output_parser=ReActSingleInputOutputParser()
-)
-agent_executor = AgentExecutor.from_agent_and_tools(
-    agent=agent,
-    tools=tools,
-    verbose=True,
-    handle_parsing_errors=True,
-    max_iterations=10,
-    max_execution_time=60,
-    callbacks=debug_callbacks,
-)
+def _route(user_input: str) -> intent_router.Intent:
+    intent = intent_router.classify(user_input)
+    intent_router.stats.record(intent.route)
+    logger.info(f"Intent route: {intent.route} {intent.reason}".rstrip())
+    return intent
 
 
 def get_llm_response(user_input: str) -> str:
     """Process user input through the agent with enhanced debugging."""
     logger.info(f"Processing user input: {user_input}")
-    try:
-        # Get relevant context from memory
-        memory_docs = query_memory(user_input)
-        context = "\n".join(doc.page_content for doc in memory_docs)
-        logger.debug(
-            f"Retrieved context: {context[:200]}..."
-            if context
-            else "No context retrieved"
-        )
-
-        # Enhance the user input with context if available
-        enhanced_input = user_input
-        if context:
-            enhanced_input = f"Context from previous conversations:\n{context}\n\nUser input: {user_input}"
-            logger.debug(f"Enhanced input with context")
-
-        # Execute the agent with proper input format
-        logger.debug(f"Executing agent with input: {enhanced_input}")
-        response = agent_executor.invoke({"input": enhanced_input})
-        output = response["output"]
-        logger.info(f"Agent response: {output[:100]}...")
-
-        # Save conversation
-        save_conversation(user_input, output)
-        logger.debug("Saved conversation to memory")
-
-        return output
-    except Exception as e:
-        error_msg = f"Error processing request: {e}"
-        logger.error(error_msg, exc_info=True)
-        return f"I'm sorry, I encountered an error: {str(e)}"
+    with trace("ask") as request_trace:
+        try:
+            intent = _route(user_input)
+            request_trace.fields["route"] = intent.route
+            if intent.route != intent_router.COMPLEX:
+                with stage("fast_path"):
+                    db = SessionLocal()
+                    try:
+                        output = intent_router.execute(db, intent)
+                    finally:
+                        db.close()
+                try:
+                    with stage("queue_conversation"):
+                        queue_conversation(user_input, output)
+                except Exception as e:
+                    logger.warning(f"Could not queue routed conversation: {e}")
+                return output
+
+            # Get relevant context from memory
+            with stage("memory_lookup"):
+                memory_docs = query_memory(user_input)
+            enhanced_input = _with_memory_context(user_input, memory_docs)
+
+            # Execute the agent with proper input format
+            logger.debug(f"Executing agent with input: {enhanced_input}")
+            with stage("agent"):
+                response = get_agent_executor().invoke(
+                    {"input": enhanced_input}, config=AGENT_RUN_CONFIG
+                )
+            output = response["output"]
+            logger.info(f"Agent response: {output[:100]}...")
+
+            # Save conversation
+            with stage("queue_conversation"):
+                queue_conversation(user_input, output)
+            logger.debug("Queued conversation for memory")
+
+            return output
+        except AdmissionError:
+            raise  # answered with 429/503 by the API
+        except Exception as e:
+            error_msg = f"Error processing request: {e}"
+            logger.error(error_msg, exc_info=True)
+            return f"I'm sorry, I encountered an error: {str(e)}"
+
+
+async def aget_llm_response(user_input: str) -> str:
+    """Async variant of get_llm_response that never blocks the event loop."""
+    logger.info(f"Processing user input (async): {user_input}")
+    with trace("ask") as request_trace:
+        try:
+            intent = _route(user_input)
+            request_trace.fields["route"] = intent.route
+            if intent.route != intent_router.COMPLEX:
+                with stage("fast_path"):
+                    async with AsyncSessionLocal() as db:
+                        output = await db.run_sync(intent_router.execute, intent)
+                try:
+                    with stage("queue_conversation"):
+                        await aqueue_conversation(user_input, output)
+                except Exception as e:
+                    logger.warning(f"Could not queue routed conversation: {e}")
+                return output
+
+            with stage("memory_lookup"):
+                memory_docs = await aquery_memory(user_input)
+            enhanced_input = _with_memory_context(user_input, memory_docs)
+
+            logger.debug(f"Executing agent with input: {enhanced_input}")
+            with stage("agent"):
+                response = await get_agent_executor().ainvoke(
+                    {"input": enhanced_input}, config=AGENT_RUN_CONFIG
+                )
+            output = response["output"]
+            logger.info(f"Agent response: {output[:100]}...")
+
+            with stage("queue_conversation"):
+                await aqueue_conversation(user_input, output)
+            logger.debug("Queued conversation for memory")
+
+            return output
+        except AdmissionError:
+            raise  # answered with 429/503 by the API
+        except Exception as e:
+            error_msg = f"Error processing request: {e}"
+            logger.error(error_msg, exc_info=True)
+            return f"I'm sorry, I encountered an error: {str(e)}"
 
 
 # Create a Pydantic parser for expense data
 expense_parser = PydanticOutputParser(pydantic_object=ExpenseCreateInput)
 
-# Wrap with fixing capability for more robust parsing
-fixing_parser = OutputFixingParser.from_llm(parser=expense_parser, llm=llm)
-logger.info("Initialized output fixing parser for expense data")
 
+@lru_cache(maxsize=None)
+def get_fixing_parser() -> OutputFixingParser:
+    """Wrap with fixing capability for more robust parsing."""
+    fixing_parser = OutputFixingParser.from_llm(parser=expense_parser, llm=get_llm())
+    logger.info("Initialized output fixing parser for expense data")
+    return fixing_parser
 
-def extract_expense(user_input: str) -> Dict[str, Any]:
-    """Extract expense details from user input with enhanced debugging."""
-    logger.info(f"Extracting expense from: {user_input}")
+
+def extract_expenses(user_input: str) -> List[Dict[str, Any]]:
+    """Extract every expense in the user input, in order of mention."""
+    logger.info(f"Extracting expenses from: {user_input}")
 
     try:
-        # Try direct pattern matching first (more reliable than agent for simple patterns)
-        amount_match = re.search(r"(\d+)", user_input)
-        if amount_match:
-            amount = float(amount_match.group(1))
-
-            # Extract category - look for common expense categories or default to "Miscellaneous"
-            category = "Miscellaneous"
-            furniture_terms = ["table", "chair", "furniture", "desk", "sofa", "couch"]
-            food_terms = ["food", "lunch", "dinner", "breakfast", "meal", "restaurant"]
-            transport_terms = ["uber", "taxi", "bus", "train", "transport", "travel"]
-
-            for term in furniture_terms:
-                if term.lower() in user_input.lower():
-                    category = "Furniture"
-                    break
-
-            for term in food_terms:
-                if term.lower() in user_input.lower():
-                    category = "Food"
-                    break
-
-            for term in transport_terms:
-                if term.lower() in user_input.lower():
-                    category = "Transport"
-                    break
-
-            # Extract date - try to find date patterns
-            expense_date = date.today()  # Default to today
-
-            # Look for date formats like "26 July 2025" or "July 26, 2025"
-            date_patterns = [
-                r"(\d{1,2})\s+([A-Za-z]+)\s+(\d{4})",  # 26 July 2025
-                r"([A-Za-z]+)\s+(\d{1,2})(?:,|\s)+(\d{4})",  # July 26, 2025
-                r"(\d{1,2})/(\d{1,2})/(\d{4})",  # MM/DD/YYYY or DD/MM/YYYY
-                r"(\d{4})-(\d{1,2})-(\d{1,2})",  # YYYY-MM-DD
-            ]
-
-            for pattern in date_patterns:
-                date_match = re.search(pattern, user_input)
-                if date_match:
-                    if pattern == r"(\d{1,2})\s+([A-Za-z]+)\s+(\d{4})":
-                        day, month_name, year = date_match.groups()
-                        month = MONTHS.get(
-                            month_name.lower(), 1
-                        )  # Default to January if not found
-                        expense_date = date(int(year), month, int(day))
-                    elif pattern == r"([A-Za-z]+)\s+(\d{1,2})(?:,|\s)+(\d{4})":
-                        month_name, day, year = date_match.groups()
-                        month = MONTHS.get(month_name.lower(), 1)
-                        expense_date = date(int(year), month, int(day))
-                    # Add other pattern handling as needed
-                    break
-
-            result = {
-                "amount": amount,
-                "category": category,
-                "description": f"Purchase of {category.lower()}",
-                "date": str(expense_date),
-            }
-
-            logger.info(f"Direct extraction result: {result}")
-            return result
+        # Rule-based parsing first (more reliable than agent for simple patterns)
+        results = [
+            parsed.to_expense()
+            for parsed in rule_parser.parse_many(user_input)
+            if parsed.amount is not None
+        ]
+        if results:
+            logger.info(f"Direct extraction result: {results}")
+            return results
 
         # Fall back to agent-based extraction if direct pattern matching fails
         # Your existing agent-based extraction code...
 
+    except UnsupportedCurrency:
+        raise
     except Exception as e:
-        logger.error(f"Error extracting expense: {e}", exc_info=True)
+        logger.error(f"Error extracting expenses: {e}", exc_info=True)
 
     logger.error("Expense extraction failed completely")
-    return None
+    return []
+
+
+def extract_expense(user_input: str) -> Dict[str, Any]:
+    """Extract the first expense from user input."""
+    expenses = extract_expenses(user_input)
+    return expenses[0] if expenses else None
 
 
 # Debug utility to test agent behavior
@@ -483,3 +513,116 @@ def test_agent_with_simple_query(query="I spent 500 on food yesterday"):
     except Exception as e:
         logger.error(f"TEST ERROR: {e}", exc_info=True)
         return f"Test failed with error: {str(e)}"
+
+
+FINAL_ANSWER_MARKER = "Final Answer:"
+
+
+async def astream_llm_response(user_input: str) -> AsyncIterator[Dict[str, Any]]:
+    """Stream agent steps and final-answer tokens as they are produced.
+
+    Yields dicts keyed by "event": route, step, token, final or error.
+    Closing the generator cancels the agent run and its in-flight LLM call.
+    """
+    logger.info(f"Processing user input (stream): {user_input}")
+    with trace("ask_stream") as request_trace:
+        stream = _astream_llm_response(user_input, request_trace)
+        try:
+            async for event in stream:
+                yield event
+        finally:
+            await stream.aclose()
+
+
+async def _astream_llm_response(user_input: str, request_trace):
+    try:
+        intent = _route(user_input)
+        request_trace.fields["route"] = intent.route
+        yield {"event": "route", "route": intent.route}
+        if intent.route != intent_router.COMPLEX:
+            with stage("fast_path"):
+                async with AsyncSessionLocal() as db:
+                    output = await db.run_sync(intent_router.execute, intent)
+            yield {"event": "final", "response": output}
+            try:
+                with stage("queue_conversation"):
+                    await aqueue_conversation(user_input, output)
+            except Exception as e:
+                logger.warning(f"Could not queue routed conversation: {e}")
+            return
+
+        with stage("memory_lookup"):
+            memory_docs = await aquery_memory(user_input)
+        enhanced_input = _with_memory_context(user_input, memory_docs)
+    except Exception as e:
+        logger.error(f"Error processing request: {e}", exc_info=True)
+        yield {"event": "error", "detail": str(e)}
+        return
+
+    # Text generated so far by each LLM call; tokens are only forwarded once
+    # the ReAct output reaches its "Final Answer:" section.
+    generated: Dict[str, str] = {}
+    output = None
+    started = time.perf_counter()
+    events = get_agent_executor().astream_events(
+        {"input": enhanced_input}, config=AGENT_RUN_CONFIG, version="v2"
+    )
+    try:
+        async for event in events:
+            kind = event["event"]
+            if kind == "on_chat_model_stream":
+                run_id = event["run_id"]
+                before = generated.get(run_id, "")
+                text = generated[run_id] = before + event["data"]["chunk"].content
+                marker = text.find(FINAL_ANSWER_MARKER)
+                if marker == -1:
+                    continue
+                answer_start = marker + len(FINAL_ANSWER_MARKER)
+                token = text[max(answer_start, len(before)) :]
+                if len(before) <= answer_start:
+                    token = token.lstrip()
+                if token:
+                    yield {"event": "token", "token": token}
+            elif kind in ("on_tool_start", "on_tool_end"):
+                # Internal tools such as _Exception report parsing retries
+                if event["name"].startswith("_"):
+                    continue
+                if kind == "on_tool_start":
+                    yield {
+                        "event": "step",
+                        "type": "action",
+                        "tool": event["name"],
+                        "input": event["data"].get("input"),
+                    }
+                else:
+                    yield {
+                        "event": "step",
+                        "type": "observation",
+                        "tool": event["name"],
+                        "output": str(event["data"].get("output")),
+                    }
+            elif kind == "on_chain_end" and not event["parent_ids"]:
+                output = event["data"]["output"]["output"]
+
+        # The agent stage spans yields, so it is timed by hand
+        elapsed = time.perf_counter() - started
+        metrics.stage_duration.observe(elapsed, stage="agent")
+        request_trace.add("agent", elapsed)
+        logger.info(f"Agent response: {output[:100]}...")
+        yield {"event": "final", "response": output}
+        with stage("queue_conversation"):
+            await aqueue_conversation(user_input, output)
+        logger.debug("Queued conversation for memory")
+    except AdmissionError as e:
+        logger.warning(f"LLM call not admitted: {e}")
+        yield {
+            "event": "error",
+            "detail": str(e),
+            "status": e.status_code,
+            "retry_after": e.retry_after,
+        }
+    except Exception as e:
+        logger.error(f"Error processing request: {e}", exc_info=True)
+        yield {"event": "error", "detail": str(e)}
+    finally:
+        await events.aclose()
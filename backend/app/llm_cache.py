@@ -0,0 +1,240 @@
+"""
+Persistent, size-bounded cache of chat completions.
+
+Every ChatOllama in the app is built with `chat_ollama()`, which binds a
+`CompletionCache` for that model and temperature; only misses are queued
+by the LLM scheduler (see llm_scheduler.py). Entries are keyed on
+sha256(model, temperature, call parameters, full prompt) and stored in
+the `llm_cache` table; the least recently used are evicted once the
+table exceeds LLM_CACHE_MAX_BYTES.
+
+LLM_CACHE_MODE selects the behaviour:
+  on      serve and store completions of deterministic (temperature=0) calls
+  record  always call the model and store every completion
+  replay  serve every call from the cache and never call the model; a miss
+          raises ReplayMiss (for tests and benchmarks)
+  off     bypass the cache
+
+In "on" mode a model built without a temperature samples at Ollama's
+default, so it is never served from the cache. All of the app's models
+are built with temperature=0 and are cacheable: the agent (llm_agent),
+the semantic-search answer chain (semantic_search) and the chat-history
+summariser (memory).
+
+Usage: python -m app.llm_cache [--evict | --clear]   (prints stats)
+"""
+
+from typing import Any, Dict, Optional, Sequence
+import argparse
+import hashlib
+import json
+import logging
+import os
+import threading
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, Generation
+from sqlalchemy import delete, func, select, text, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from . import metrics
+from .database import SessionLocal
+from .llm_scheduler import OLLAMA_KEEP_ALIVE, ScheduledChatOllama
+from .models import LLMCacheEntry
+
+logger = logging.getLogger("llm_cache")
+
+LLM_CACHE_MODE = os.getenv("LLM_CACHE_MODE", "on")  # on | record | replay | off
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Eviction scans the table, so it runs once per this many writes
+LLM_CACHE_EVICT_EVERY = int(os.getenv("LLM_CACHE_EVICT_EVERY", "100"))
+
+# Drop the least recently used rows beyond the byte budget
+EVICT_SQL = """
+DELETE FROM llm_cache WHERE key_hash IN (
+    SELECT key_hash FROM (
+        SELECT key_hash,
+               SUM(size) OVER (ORDER BY last_used_at DESC, key_hash) AS used
+        FROM llm_cache
+    ) ranked
+    WHERE used > :max_bytes
+)
+"""
+
+
+# Only revive what a chat completion contains
+CACHED_TYPES = [ChatGeneration, Generation, AIMessage]
+
+
+class ReplayMiss(LookupError):
+    """Replay mode found no stored completion for a prompt."""
+
+
+class CompletionCache(BaseCache):
+    """LangChain cache for one (model, temperature) pair."""
+
+    def __init__(
+        self,
+        model: str,
+        temperature: Optional[float],
+        mode: str = LLM_CACHE_MODE,
+        max_bytes: int = LLM_CACHE_MAX_BYTES,
+    ):
+        self.model = model
+        self.temperature = temperature
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    @property
+    def deterministic(self) -> bool:
+        return self.temperature == 0
+
+    def _serves(self) -> bool:
+        return self.mode == "replay" or (self.mode == "on" and self.deterministic)
+
+    def _stores(self) -> bool:
+        return self.mode == "record" or (self.mode == "on" and self.deterministic)
+
+    def _key(self, prompt: str, llm_string: str) -> str:
+        # ChatOllama leaves model and temperature out of llm_string
+        digest = hashlib.sha256()
+        for part in (self.model, repr(self.temperature), llm_string, prompt):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        if not self._serves():
+            return None
+        key = self._key(prompt, llm_string)
+        try:
+            with SessionLocal() as db:
+                row = db.execute(
+                    update(LLMCacheEntry)
+                    .where(LLMCacheEntry.key_hash == key)
+                    .values(hits=LLMCacheEntry.hits + 1, last_used_at=func.now())
+                    .returning(LLMCacheEntry.generations)
+                ).first()
+                db.commit()
+        except SQLAlchemyError as e:
+            if self.mode == "replay":
+                raise
+            logger.warning(f"LLM cache read failed, calling the model: {e}")
+            return None
+
+        metrics.llm_cache_requests.inc(
+            model=self.model, result="hit" if row else "miss"
+        )
+        if row is not None:
+            return [
+                loads(g, allowed_objects=CACHED_TYPES)
+                for g in json.loads(row.generations)
+            ]
+        if self.mode == "replay":
+            raise ReplayMiss(f"No recorded {self.model} completion for this prompt")
+        return None
+
+    def update(
+        self, prompt: str, llm_string: str, return_val: Sequence[Generation]
+    ) -> None:
+        if not self._stores():
+            return
+        generations = json.dumps([dumps(g) for g in return_val])
+        values = {
+            "key_hash": self._key(prompt, llm_string),
+            "model": self.model,
+            "temperature": self.temperature,
+            "generations": generations,
+            "size": len(generations) + len(prompt),
+            "hits": 0,
+        }
+        try:
+            with SessionLocal() as db:
+                db.execute(
+                    insert(LLMCacheEntry)
+                    .values(**values)
+                    .on_conflict_do_update(
+                        index_elements=[LLMCacheEntry.key_hash],
+                        set_={
+                            "generations": values["generations"],
+                            "size": values["size"],
+                            "last_used_at": func.now(),
+                        },
+                    )
+                )
+                db.commit()
+        except SQLAlchemyError as e:
+            logger.warning(f"LLM cache write failed: {e}")
+            return
+
+        with self._lock:
+            self._writes += 1
+            due = self._writes % LLM_CACHE_EVICT_EVERY == 0
+        if due:
+            evict(self.max_bytes)
+
+    def clear(self, **kwargs: Any) -> None:
+        with SessionLocal() as db:
+            db.execute(delete(LLMCacheEntry).where(LLMCacheEntry.model == self.model))
+            db.commit()
+
+
+def chat_ollama(model: str, **kwargs) -> ScheduledChatOllama:
+    """ChatOllama backed by the completion cache for its model and
+    temperature; cache misses go through the LLM scheduler."""
+    cache = CompletionCache(model, kwargs.get("temperature"))
+    kwargs.setdefault("keep_alive", OLLAMA_KEEP_ALIVE)
+    return ScheduledChatOllama(model=model, cache=cache, **kwargs)
+
+
+def evict(max_bytes: int = LLM_CACHE_MAX_BYTES) -> int:
+    """Delete least recently used entries until the cache fits in max_bytes."""
+    try:
+        with SessionLocal() as db:
+            removed = db.execute(text(EVICT_SQL), {"max_bytes": max_bytes}).rowcount
+            db.commit()
+    except SQLAlchemyError as e:
+        logger.warning(f"LLM cache eviction failed: {e}")
+        return 0
+    if removed:
+        logger.info(f"Evicted {removed} LLM cache entries")
+    return removed
+
+
+def stats() -> Dict[str, Any]:
+    with SessionLocal() as db:
+        entries, size, hits = db.execute(
+            select(
+                func.count(),
+                func.coalesce(func.sum(LLMCacheEntry.size), 0),
+                func.coalesce(func.sum(LLMCacheEntry.hits), 0),
+            ).select_from(LLMCacheEntry)
+        ).one()
+    return {
+        "mode": LLM_CACHE_MODE,
+        "entries": entries,
+        "bytes": int(size),
+        "max_bytes": LLM_CACHE_MAX_BYTES,
+        "stored_hits": int(hits),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect the LLM completion cache")
+    action = parser.add_mutually_exclusive_group()
+    action.add_argument("--evict", action="store_true", help="Enforce the size cap")
+    action.add_argument("--clear", action="store_true", help="Delete every entry")
+    args = parser.parse_args()
+    if args.clear:
+        with SessionLocal() as db:
+            db.execute(delete(LLMCacheEntry))
+            db.commit()
+        print("✅ Cleared the LLM cache.")
+    elif args.evict:
+        print(f"✅ Evicted {evict()} entries.")
+    print(stats())
@@ -0,0 +1,373 @@
+"""
+Admission control in front of every chat model call.
+
+A local Ollama serves only a few generations at once, so every ChatOllama
+in the app (built by `llm_cache.chat_ollama`) is a `ScheduledChatOllama`
+that holds a scheduler slot for the length of each generation. Cache hits
+never get that far, so they are never queued. At most LLM_MAX_CONCURRENCY
+generations run at once; the others wait in a priority queue:
+
+  interactive  /ask and /ask/stream
+  default      untagged work such as the debug endpoints and warm-up
+  bulk         /semantic-search/
+
+Routes tag their work with `admission(priority, ...)`, which also starts
+the request deadline (LLM_REQUEST_TIMEOUT) and can be given a probe for
+client disconnects. A call is refused with Overloaded (HTTP 429 with a
+Retry-After estimate) when LLM_MAX_QUEUE calls are already waiting, or
+LLM_MAX_QUEUE_BULK for bulk work. A queued call is dropped once its
+deadline passes or its client has gone away. Models are kept resident in
+Ollama for OLLAMA_KEEP_ALIVE after their last call.
+"""
+
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import os
+import threading
+import time
+
+from langchain_ollama import ChatOllama
+
+from . import metrics
+from .metrics import Gauge
+
+logger = logging.getLogger("llm_scheduler")
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "2"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "16"))
+LLM_MAX_QUEUE_BULK = int(os.getenv("LLM_MAX_QUEUE_BULK", str(LLM_MAX_QUEUE // 2)))
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "60"))
+# How often a queued async call checks that its client is still connected
+LLM_DISCONNECT_POLL = float(os.getenv("LLM_DISCONNECT_POLL", "0.5"))
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+
+# Lower runs first
+PRIORITIES = {"interactive": 0, "default": 1, "bulk": 2}
+_PRIORITY_NAMES = {rank: name for name, rank in PRIORITIES.items()}
+
+
+class AdmissionError(Exception):
+    """An LLM call was refused or dropped before it reached the model."""
+
+    status_code = 503
+
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Overloaded(AdmissionError):
+    """The queue is full; the caller should retry later."""
+
+    status_code = 429
+
+
+class DeadlineExceeded(AdmissionError):
+    """The request deadline passed while the call was queued."""
+
+
+class ClientGone(AdmissionError):
+    """The client disconnected while the call was queued."""
+
+
+@dataclass
+class Ticket:
+    priority: str = "default"
+    deadline: Optional[float] = None  # time.monotonic()
+    disconnected: Optional[Callable[[], Awaitable[bool]]] = None
+
+    def remaining(self) -> Optional[float]:
+        if self.deadline is None:
+            return None
+        return self.deadline - time.monotonic()
+
+
+_ticket: ContextVar[Ticket] = ContextVar("llm_ticket", default=Ticket())
+
+
+@contextmanager
+def admission(
+    priority: str = "default",
+    timeout: Optional[float] = LLM_REQUEST_TIMEOUT,
+    disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+):
+    """Run the LLM calls made inside this block at `priority`, queueing
+    them no later than `timeout` seconds from now."""
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown LLM priority: {priority}")
+    deadline = time.monotonic() + timeout if timeout else None
+    # Restored with set(): streaming routes enter and leave in different contexts
+    previous = _ticket.get()
+    _ticket.set(Ticket(priority, deadline, disconnected))
+    try:
+        yield
+    finally:
+        _ticket.set(previous)
+
+
+@contextmanager
+def shared():
+    """Keep the current priority and deadline but drop the disconnect probe,
+    for a call whose result several requests wait on."""
+    previous = _ticket.get()
+    _ticket.set(Ticket(previous.priority, previous.deadline))
+    try:
+        yield
+    finally:
+        _ticket.set(previous)
+
+
+class _Waiter:
+    """A queued call, woken through a threading.Event or an asyncio future."""
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.granted = False
+        self.abandoned = False
+        self.loop = loop
+        if loop is None:
+            self.event = threading.Event()
+        else:
+            self.future = loop.create_future()
+
+    def wake(self) -> bool:
+        if self.loop is None:
+            self.event.set()
+            return True
+        try:
+            self.loop.call_soon_threadsafe(self._resolve)
+        except RuntimeError:  # the waiting loop has closed
+            return False
+        return True
+
+    def _resolve(self) -> None:
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+class LLMScheduler:
+    """Counting semaphore with a priority queue, shared by threads and
+    event loops. A released slot passes straight to the next waiter."""
+
+    def __init__(
+        self,
+        concurrency: int = LLM_MAX_CONCURRENCY,
+        max_queue: int = LLM_MAX_QUEUE,
+        max_queue_bulk: int = LLM_MAX_QUEUE_BULK,
+    ):
+        self.concurrency = max(concurrency, 1)
+        self.max_queue = max_queue
+        self.max_queue_bulk = max_queue_bulk
+        self._lock = threading.Lock()
+        self._heap: List[Tuple[int, int, _Waiter]] = []
+        self._seq = itertools.count()
+        self._active = 0
+        self._queued = 0
+        # Moving average of how long a call holds its slot, for Retry-After
+        self._service_time = 5.0
+        self._results_lock = threading.Lock()
+        self.results: Dict[Tuple[str, str], int] = {}
+
+    def _count(self, priority: str, result: str) -> None:
+        with self._results_lock:
+            key = (priority, result)
+            self.results[key] = self.results.get(key, 0) + 1
+        metrics.llm_admissions.inc(priority=priority, result=result)
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue should have drained."""
+        estimate = (self._queued + 1) * self._service_time / self.concurrency
+        return min(max(math.ceil(estimate), 1), 60)
+
+    def _enqueue(self, ticket: Ticket, waiter: _Waiter) -> bool:
+        """Take a free slot (True) or queue `waiter` (False)."""
+        remaining = ticket.remaining()
+        if remaining is not None and remaining <= 0:
+            self._count(ticket.priority, "expired")
+            raise DeadlineExceeded("Request deadline passed before the LLM call")
+        with self._lock:
+            if self._active < self.concurrency and not self._queued:
+                self._active += 1
+                self._count(ticket.priority, "admitted")
+                return True
+            limit = self.max_queue_bulk if ticket.priority == "bulk" else self.max_queue
+            if self._queued >= limit:
+                self._count(ticket.priority, "rejected")
+                logger.warning(f"LLM queue full, rejecting {ticket.priority} call")
+                raise Overloaded(
+                    f"LLM queue is full ({self._queued} calls waiting)",
+                    self.retry_after(),
+                )
+            rank = (PRIORITIES[ticket.priority], next(self._seq), waiter)
+            heapq.heappush(self._heap, rank)
+            self._queued += 1
+            return False
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        """Leave the queue; False if a slot was already handed to `waiter`."""
+        with self._lock:
+            if waiter.granted:
+                return False
+            waiter.abandoned = True
+            self._queued -= 1
+            return True
+
+    def _drop(self, waiter: _Waiter, ticket: Ticket, result: str) -> None:
+        if not self._abandon(waiter):
+            self.release()
+        self._count(ticket.priority, result)
+
+    def release(self, held_for: Optional[float] = None) -> None:
+        """Return a slot, handing it to the highest-priority waiter."""
+        while True:
+            with self._lock:
+                if held_for is not None:
+                    self._service_time = 0.8 * self._service_time + 0.2 * held_for
+                    held_for = None
+                while self._heap:
+                    _, _, waiter = heapq.heappop(self._heap)
+                    if not waiter.abandoned:
+                        break
+                else:
+                    self._active -= 1
+                    return
+                waiter.granted = True
+                self._queued -= 1
+            if waiter.wake():
+                return
+
+    def acquire(self, ticket: Ticket) -> None:
+        waiter = _Waiter()
+        if self._enqueue(ticket, waiter):
+            return
+        started = time.monotonic()
+        remaining = ticket.remaining()
+        timeout = None if remaining is None else max(remaining, 0)
+        if not waiter.event.wait(timeout):
+            self._drop(waiter, ticket, "expired")
+            raise DeadlineExceeded("Request deadline passed while queued for the LLM")
+        self._count(ticket.priority, "admitted")
+        metrics.llm_queue_wait.observe(
+            time.monotonic() - started, priority=ticket.priority
+        )
+
+    async def aacquire(self, ticket: Ticket) -> None:
+        waiter = _Waiter(asyncio.get_running_loop())
+        if self._enqueue(ticket, waiter):
+            return
+        started = time.monotonic()
+        try:
+            while not waiter.future.done():
+                timeout = LLM_DISCONNECT_POLL if ticket.disconnected else None
+                remaining = ticket.remaining()
+                if remaining is not None:
+                    if remaining <= 0:
+                        self._drop(waiter, ticket, "expired")
+                        raise DeadlineExceeded(
+                            "Request deadline passed while queued for the LLM"
+                        )
+                    timeout = remaining if timeout is None else min(timeout, remaining)
+                await asyncio.wait([waiter.future], timeout=timeout)
+                if (
+                    not waiter.future.done()
+                    and ticket.disconnected
+                    and await ticket.disconnected()
+                ):
+                    self._drop(waiter, ticket, "disconnected")
+                    raise ClientGone("Client disconnected while queued for the LLM")
+        except asyncio.CancelledError:
+            self._drop(waiter, ticket, "cancelled")
+            raise
+        self._count(ticket.priority, "admitted")
+        metrics.llm_queue_wait.observe(
+            time.monotonic() - started, priority=ticket.priority
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            waiting = {}
+            for rank, _, waiter in self._heap:
+                if not waiter.abandoned:
+                    name = _PRIORITY_NAMES[rank]
+                    waiting[name] = waiting.get(name, 0) + 1
+            active, queued = self._active, self._queued
+        return {
+            "concurrency": self.concurrency,
+            "active": active,
+            "queued": queued,
+            "queued_by_priority": waiting,
+            "max_queue": self.max_queue,
+            "max_queue_bulk": self.max_queue_bulk,
+            "avg_call_seconds": round(self._service_time, 3),
+            "keep_alive": OLLAMA_KEEP_ALIVE,
+            "results": {
+                f"{priority}.{result}": count
+                for (priority, result), count in sorted(self.results.items())
+            },
+        }
+
+
+scheduler = LLMScheduler()
+
+
+@contextmanager
+def slot():
+    """Hold a scheduler slot for one synchronous LLM call."""
+    scheduler.acquire(_ticket.get())
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        scheduler.release(time.monotonic() - started)
+
+
+@asynccontextmanager
+async def aslot():
+    await scheduler.aacquire(_ticket.get())
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        scheduler.release(time.monotonic() - started)
+
+
+class ScheduledChatOllama(ChatOllama):
+    """ChatOllama whose generations wait for a scheduler slot."""
+
+    def _generate(self, *args, **kwargs):
+        with slot():
+            return super()._generate(*args, **kwargs)
+
+    async def _agenerate(self, *args, **kwargs):
+        async with aslot():
+            return await super()._agenerate(*args, **kwargs)
+
+    def _stream(self, *args, **kwargs):
+        with slot():
+            yield from super()._stream(*args, **kwargs)
+
+    async def _astream(self, *args, **kwargs):
+        async with aslot():
+            async for chunk in super()._astream(*args, **kwargs):
+                yield chunk
+
+
+def _scheduler_gauge_samples():
+    with scheduler._lock:
+        active, queued = scheduler._active, scheduler._queued
+    yield ("active",), active
+    yield ("queued",), queued
+
+
+Gauge(
+    "zenspend_llm_scheduler_calls",
+    "LLM calls holding a scheduler slot or waiting in its queue.",
+    ("state",),
+    _scheduler_gauge_samples,
+)
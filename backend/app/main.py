@@ -1,27 +1,70 @@
-from numbers import Real
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta, timezone
+from fastapi import Depends, FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from app.routes import router
-from app.database import engine
-from app import models
+from app.database import async_engine, engine, execute_prepared, get_db
+from app import (
+    expense_writes,
+    jobs,
+    migrations,
+    partitions,
+    vector_index,
+    warmup,
+)
+from app.llm_scheduler import AdmissionError
+from app.compression import CompressionMiddleware
+from app.logging_config import configure_logging
+from app.metrics import MetricsMiddleware
 from dotenv import load_dotenv
-import psycopg2
-from psycopg2.extras import RealDictCursor
+import logging
 import os
-from langchain.tools import tool
+import time
+from sqlalchemy.orm import Session
 
-from app.schemas import ExpenseCreate
+from app.schemas import ExpenseCreate, ExpenseQuery
 
 load_dotenv()
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-app = FastAPI(title="ZenSpend API")
+logger = logging.getLogger("api")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Migrate the schema, create indexes (and optionally warm up) before
+    serving, and run the in-process job workers while serving.
+
+    Nothing here runs at import time, so importing the app never needs
+    Postgres or Ollama.
+    """
+    configure_logging()
+    started = time.perf_counter()
+    timings = {}
+    with warmup.step(timings, "migrations", fatal=True):
+        await run_in_threadpool(migrations.migrate)
+    if partitions.EXPENSES_PARTITIONING == "monthly":
+        with warmup.step(timings, "partitions", fatal=True):
+            await run_in_threadpool(partitions.ensure_expense_partitions)
+    with warmup.step(timings, "vector_indexes"):
+        await run_in_threadpool(vector_index.ensure_vector_indexes)
+    if warmup.STARTUP_WARMUP:
+        await warmup.run(timings)
+    stop_job_workers = jobs.start_workers(jobs.JOB_API_WORKERS)
+    timings["total"] = round((time.perf_counter() - started) * 1000, 2)
+    app.state.startup = timings
+    logger.info("Startup complete", extra={"startup_ms": timings})
 
-models.Base.metadata.create_all(bind=engine)
+    yield
 
-# Database connection
-conn = psycopg2.connect(DATABASE_URL)
-cur = conn.cursor(cursor_factory=RealDictCursor)
+    await run_in_threadpool(stop_job_workers)
+    await async_engine.dispose()
+    engine.dispose()
+
+
+app = FastAPI(title="ZenSpend API", lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -30,28 +73,54 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Retry-After", "ETag", "Last-Modified"],
 )
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(MetricsMiddleware)
 app.include_router(router)
 
 
+@app.exception_handler(AdmissionError)
+async def llm_not_admitted(request: Request, exc: AdmissionError):
+    """Queue full (429) or dropped from the LLM queue (503)."""
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
 @app.post("/expenses/add")
-def add_expense(data: ExpenseCreate):
-    cur.execute(
-        "INSERT INTO expenses (amount, category, date, description) VALUES (%s, %s, %s, %s)",
+def add_expense(data: ExpenseCreate, db: Session = Depends(get_db)):
+    conn = db.connection()
+    inserted = execute_prepared(
+        conn,
+        "insert_expense",
         (data.amount, data.category, data.date, data.description),
     )
-    conn.commit()
+    rows = inserted.mappings().all()
+    expense_writes.record(db, rows, [row["id"] for row in rows])
+    db.commit()
     return {"status": "ok", "message": "Expense added successfully"}
 
 
-@app.post("/expenses/query")
-def query_expenses(data: ExpenseCreate):
-    query = "SELECT * FROM expenses WHERE date >= %s AND date <= %s"
-    params = [data.start_date, data.end_date]
+def _utc_midnight(day: date) -> datetime:
+    # Bound as timestamptz rather than date, so a partitioned expenses table
+    # is pruned at plan time instead of planning every partition
+    return datetime.combine(day, datetime.min.time(), timezone.utc)
 
-    if data.category:
-        query += " AND category = %s"
-        params.append(data.category)
 
-    cur.execute(query, tuple(params))
-    return {"expenses": cur.fetchall()}
+@app.post("/expenses/query")
+def query_expenses(data: ExpenseQuery, db: Session = Depends(get_db)):
+    # end_date is inclusive: everything before the following midnight
+    start = _utc_midnight(data.start_date)
+    end = _utc_midnight(data.end_date + timedelta(days=1))
+    if data.category:
+        result = execute_prepared(
+            db.connection(),
+            "query_expenses_range_category",
+            (start, end, data.category),
+        )
+    else:
+        result = execute_prepared(db.connection(), "query_expenses_range", (start, end))
+    return {"expenses": [dict(row) for row in result.mappings()]}
@@ -1,50 +1,215 @@
-from langchain_postgres import PGVector
-from langchain_ollama import OllamaEmbeddings
 from langchain_core.messages import AIMessage, HumanMessage
 from langchain_core.runnables import RunnablePassthrough, RunnableWithMessageHistory
-from langchain_ollama import ChatOllama
 from langchain_core.chat_history import BaseChatMessageHistory
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.output_parsers import StrOutputParser
 from langchain.docstore.document import Document
-from langchain_core.chat_history import InMemoryChatMessageHistory
-from sqlalchemy import create_engine
+from .chat_history import SessionHistoryStore
+from .database import SessionLocal, async_engine, engine
+from .embedding_cache import embedding
+from .llm_cache import chat_ollama
+from . import data_version, jobs
+from . import vector_index  # applies the ANN search settings to the pools
+from .numpy_index import MmapVectorIndex, NumpyVectorStore
+from .vector_index import IndexedPGVector
+from datetime import date
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
 
 import os
+import uuid
 from dotenv import load_dotenv
 
 load_dotenv()
 
-CONNECTION_STRING = os.getenv("DATABASE_URL")
-engine = create_engine(CONNECTION_STRING)
+# Stores, models and chains are built on first use (or by app.warmup), so
+# importing this module never touches Postgres or Ollama.
 
-embedding = OllamaEmbeddings(model="phi3:mini")
 
-# Let PGVector create tables with proper schema
-vectorstore = PGVector(
-    embeddings=embedding,
-    connection=engine,
-    collection_name="memory_store",
-    use_jsonb=True,
-    pre_delete_collection=False,
-)
+def _pgvector(connection, async_mode: bool = False) -> IndexedPGVector:
+    # Let PGVector create tables with proper schema
+    return IndexedPGVector(
+        embeddings=embedding,
+        connection=connection,
+        collection_name="memory_store",
+        use_jsonb=True,
+        pre_delete_collection=False,
+        async_mode=async_mode,
+    )
+
+
+@lru_cache(maxsize=None)
+def get_vectorstore() -> IndexedPGVector:
+    return _pgvector(engine)
+
+
+@lru_cache(maxsize=None)
+def get_async_vectorstore() -> IndexedPGVector:
+    """Same collection on the async engine, used by the async request path."""
+    return _pgvector(async_engine, async_mode=True)
+
+
+@lru_cache(maxsize=None)
+def get_filtered_vectorstore() -> IndexedPGVector:
+    """Same collection again for metadata-filtered searches (see vector_index.filtered)."""
+    return _pgvector(vector_index.filtered(engine))
+
+
+@lru_cache(maxsize=None)
+def get_async_filtered_vectorstore() -> IndexedPGVector:
+    return _pgvector(vector_index.filtered(async_engine), async_mode=True)
+
+
+# "numpy" answers memory searches from an in-process, memory-mapped copy of
+# the collection instead of a Postgres round trip; writes still go to both.
+MEMORY_RETRIEVER = os.getenv("MEMORY_RETRIEVER", "pgvector")  # pgvector | numpy
+
+
+@lru_cache(maxsize=None)
+def get_local_store() -> Optional[NumpyVectorStore]:
+    if MEMORY_RETRIEVER != "numpy":
+        return None
+    local_store = NumpyVectorStore(embedding, MmapVectorIndex("memory_store"))
+    local_store.sync_from_pgvector(engine, "memory_store")
+    return local_store
 
 
-def save_conversation(user_msg: str, ai_msg: str):
-    docs = [
-        Document(page_content=user_msg, metadata={"role": "user"}),
-        Document(page_content=ai_msg, metadata={"role": "ai"}),
+# Stores to search, by path: the local store serves all of them when enabled
+def get_search_store(filtered: bool = False):
+    return get_local_store() or (
+        get_filtered_vectorstore() if filtered else get_vectorstore()
+    )
+
+
+def get_async_search_store(filtered: bool = False):
+    return get_local_store() or (
+        get_async_filtered_vectorstore() if filtered else get_async_vectorstore()
+    )
+
+
+def _conversation_docs(user_msg: str, ai_msg: str, day: Optional[str] = None):
+    today = day or str(date.today())
+    return [
+        Document(page_content=user_msg, metadata={"role": "user", "date": today}),
+        Document(page_content=ai_msg, metadata={"role": "ai", "date": today}),
+    ]
+
+
+def _add_documents(docs, ids: Optional[List[str]] = None) -> None:
+    local_store = get_local_store()
+    if local_store is None:
+        # PGVector generates ids when none are given
+        get_vectorstore().add_documents(docs, ids=ids)
+        return
+    texts = [doc.page_content for doc in docs]
+    metadatas = [doc.metadata for doc in docs]
+    vectors = embedding.embed_documents(texts)
+    ids = get_vectorstore().add_embeddings(texts, vectors, metadatas, ids=ids)
+    local_store.add_embeddings(texts, vectors, metadatas, ids)
+
+
+# The request path queues conversations; a job worker embeds and stores
+# them in batches (see app.jobs)
+CONVERSATION_JOB = "save_conversation"
+MEMORY_JOB_BATCH = int(os.getenv("MEMORY_JOB_BATCH", "16"))
+
+
+def _conversation_job(user_msg: str, ai_msg: str) -> Dict[str, Any]:
+    # The key gives stable vector ids, so a retried job overwrites its rows
+    return {
+        "user": user_msg,
+        "ai": ai_msg,
+        "date": str(date.today()),
+        "key": uuid.uuid4().hex,
+    }
+
+
+def queue_conversation(user_msg: str, ai_msg: str) -> int:
+    return jobs.submit(CONVERSATION_JOB, _conversation_job(user_msg, ai_msg))
+
+
+async def aqueue_conversation(user_msg: str, ai_msg: str) -> int:
+    return await jobs.asubmit(CONVERSATION_JOB, _conversation_job(user_msg, ai_msg))
+
+
+@jobs.handler(CONVERSATION_JOB, batch_size=MEMORY_JOB_BATCH)
+def save_queued_conversations(payloads) -> None:
+    docs, ids = [], []
+    for payload in payloads:
+        docs += _conversation_docs(payload["user"], payload["ai"], payload["date"])
+        ids += [
+            str(
+                uuid.uuid5(
+                    uuid.NAMESPACE_URL, f"zenspend:memory:{payload['key']}:{role}"
+                )
+            )
+            for role in ("user", "ai")
+        ]
+    _add_documents(docs, ids)
+    # Invalidates semantic search answers (see app.semantic_search)
+    with SessionLocal() as db:
+        data_version.bump(db, data_version.MEMORY)
+        db.commit()
+
+
+def query_memory(query: str, k: int = 3, filter: Optional[Dict[str, Any]] = None):
+    """Nearest conversation snippets, optionally pre-filtered by metadata
+    (see `vector_index.metadata_filter`)."""
+    if filter:
+        return get_search_store(filtered=True).similarity_search(
+            query, k=k, filter=filter
+        )
+    return get_search_store().similarity_search(query, k=k)
+
+
+async def aquery_memory(
+    query: str, k: int = 3, filter: Optional[Dict[str, Any]] = None
+):
+    if filter:
+        return await get_async_search_store(filtered=True).asimilarity_search(
+            query, k=k, filter=filter
+        )
+    return await get_async_search_store().asimilarity_search(query, k=k)
+
+
+@lru_cache(maxsize=None)
+def get_llm():
+    # Deterministic, so the completion cache serves repeated summaries
+    return chat_ollama("phi3:mini", temperature=0)
+
+
+CHAT_HISTORY_MAX_TOKENS = int(os.getenv("CHAT_HISTORY_MAX_TOKENS", "1024"))
+CHAT_HISTORY_MAX_SESSIONS = int(os.getenv("CHAT_HISTORY_MAX_SESSIONS", "1000"))
+CHAT_HISTORY_TTL = float(os.getenv("CHAT_HISTORY_TTL", "1800"))
+CHAT_HISTORY_MAX_BYTES = int(os.getenv("CHAT_HISTORY_MAX_BYTES", str(16 * 1024 * 1024)))
+CHAT_HISTORY_SUMMARY = os.getenv("CHAT_HISTORY_SUMMARY", "0") == "1"
+
+summary_prompt = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            "Condense the conversation below into a short summary that keeps "
+            "amounts, categories, dates and the user's preferences.",
+        ),
+        ("human", "Summary so far: {summary}\n\nNew lines:\n{lines}"),
     ]
-    # Let PGVector handle ID generation automatically
-    vectorstore.add_documents(docs)
+)
 
 
-def query_memory(query: str):
-    return vectorstore.similarity_search(query, k=3)
+def summarize_messages(summary: str, messages) -> str:
+    """Fold messages that left the history window into the rolling summary."""
+    lines = "\n".join(f"{m.type}: {m.content}" for m in messages)
+    chain = summary_prompt | get_llm() | StrOutputParser()
+    return chain.invoke({"summary": summary or "(none)", "lines": lines})
 
 
-llm = ChatOllama(model="phi3:mini")
-chat_history = InMemoryChatMessageHistory()
+session_histories = SessionHistoryStore(
+    max_sessions=CHAT_HISTORY_MAX_SESSIONS,
+    ttl=CHAT_HISTORY_TTL,
+    max_bytes=CHAT_HISTORY_MAX_BYTES,
+    max_tokens=CHAT_HISTORY_MAX_TOKENS,
+    summarizer=summarize_messages if CHAT_HISTORY_SUMMARY else None,
+)
 
 prompt = ChatPromptTemplate.from_messages(
     [
@@ -55,15 +220,13 @@ prompt = ChatPromptTemplate.from_messages(
 )
 
 
+@lru_cache(maxsize=None)
 def get_chat_chain():
-    chain = prompt | llm | StrOutputParser()
+    chain = prompt | get_llm() | StrOutputParser()
     chain_with_history = RunnableWithMessageHistory(
         chain,
-        lambda session_id: chat_history,
+        session_histories.get,
         input_messages_key="input",
         history_messages_key="chat_history",
     )
     return chain_with_history
-
-
-conversation_chain = get_chat_chain()
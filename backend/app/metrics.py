@@ -0,0 +1,273 @@
+"""
+In-process metrics rendered in the Prometheus text exposition format.
+
+A deliberately small subset of the Prometheus client: labelled counters,
+histograms and callback gauges in one registry, served by GET /metrics.
+`MetricsMiddleware` times every HTTP route by its path template.
+"""
+
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+import threading
+import time
+
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+COUNT_BUCKETS = (1, 2, 3, 4, 5, 6, 8, 10, 15, 20)
+
+_registry: List["_Metric"] = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.kind}"
+        yield from self._samples()
+
+    def _samples(self) -> Iterable[str]:
+        return ()
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}{labels} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> ([per-bucket counts..., +Inf count], sum)
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][index] += 1
+            series[1][0] += value
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+    def _samples(self):
+        with self._lock:
+            series = {k: (list(c), s[0]) for k, (c, s) in self._series.items()}
+        for key, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = _format_labels(
+                    self.labelnames, key, f'le="{_format_value(bound)}"'
+                )
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: Dict[str, str]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+
+
+class Gauge(_Metric):
+    """Gauge whose samples are read from `collect()` at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name,
+        documentation,
+        labelnames,
+        collect: Callable[[], Iterable[Tuple[Sequence[str], float]]],
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.collect = collect
+
+    def _samples(self):
+        for key, value in self.collect():
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}{labels} {_format_value(value)}"
+
+
+def render() -> str:
+    return "\n".join(line for metric in _registry for line in metric.render()) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+http_request_duration = Histogram(
+    "zenspend_http_request_duration_seconds",
+    "HTTP request latency by route template, until the response completes.",
+    ("method", "route", "status"),
+)
+llm_call_duration = Histogram(
+    "zenspend_llm_call_duration_seconds", "Latency of each LLM call.", ("model",)
+)
+llm_tokens = Counter(
+    "zenspend_llm_tokens_total", "LLM tokens by model and kind.", ("model", "kind")
+)
+llm_cache_requests = Counter(
+    "zenspend_llm_cache_requests_total",
+    "Completion cache lookups by model and result.",
+    ("model", "result"),
+)
+llm_queue_wait = Histogram(
+    "zenspend_llm_queue_wait_seconds",
+    "Time queued LLM calls waited for a scheduler slot.",
+    ("priority",),
+)
+llm_admissions = Counter(
+    "zenspend_llm_admissions_total",
+    "LLM scheduler decisions by priority and result.",
+    ("priority", "result"),
+)
+agent_iterations = Histogram(
+    "zenspend_agent_llm_calls",
+    "LLM calls (ReAct iterations) per agent request.",
+    buckets=COUNT_BUCKETS,
+)
+tool_duration = Histogram(
+    "zenspend_tool_duration_seconds", "Latency of each agent tool call.", ("tool",)
+)
+stage_duration = Histogram(
+    "zenspend_stage_duration_seconds",
+    "Latency of request stages such as memory lookup and save.",
+    ("stage",),
+)
+db_query_duration = Histogram(
+    "zenspend_db_query_duration_seconds",
+    "Database statement latency by engine, operation and table.",
+    ("engine", "operation", "table"),
+)
+db_pool_wait = Histogram(
+    "zenspend_db_pool_wait_seconds",
+    "Time spent waiting to check a connection out of the pool.",
+    ("pool",),
+)
+embedding_duration = Histogram(
+    "zenspend_embedding_duration_seconds",
+    "Latency of embedding model calls (cache misses only).",
+    ("model", "kind"),
+)
+embedding_texts = Counter(
+    "zenspend_embedding_texts_total",
+    "Texts embedded, by where the vector came from.",
+    ("source",),
+)
+jobs_processed = Counter(
+    "zenspend_jobs_processed_total",
+    "Background jobs finished, by kind and result (done, retried, failed).",
+    ("kind", "result"),
+)
+job_duration = Histogram(
+    "zenspend_job_duration_seconds",
+    "Latency of each background job handler call (one batch).",
+    ("kind",),
+)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording http_request_duration for every request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router stores the matched route on the scope; use its
+            # template so path parameters do not explode label cardinality
+            route = scope.get("route")
+            http_request_duration.observe(
+                time.perf_counter() - started,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=status["code"],
+            )
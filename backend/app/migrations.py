@@ -0,0 +1,131 @@
+"""
+Versioned schema migrations.
+
+`Base.metadata.create_all` creates missing tables, with their indexes, but
+never changes a table that already exists. Anything that has to change an
+existing table is a migration: a numbered function registered with
+`@migration`, applied once in version order inside its own transaction and
+recorded in schema_migrations. `migrate()` runs create_all and then every
+pending migration while holding an advisory lock, so several workers
+starting together apply each migration exactly once.
+
+    python -m app.migrations [--status]
+"""
+
+from typing import Callable, Dict, List, Tuple
+import argparse
+import logging
+
+from sqlalchemy import Connection, inspect, select, text
+
+from .database import Base, engine
+from .models import SchemaMigration
+
+logger = logging.getLogger("migrations")
+
+# Held for the whole run; shared with app.partitions
+LOCK_SQL = "SELECT pg_advisory_lock(hashtext('zenspend_schema'))"
+UNLOCK_SQL = "SELECT pg_advisory_unlock(hashtext('zenspend_schema'))"
+
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = []
+
+
+def migration(version: int, name: str):
+    """Register a migration; versions must be unique and only ever grow."""
+
+    def register(func: Callable[[Connection], None]):
+        if any(existing == version for existing, _, _ in MIGRATIONS):
+            raise ValueError(f"Duplicate migration version {version}")
+        MIGRATIONS.append((version, name, func))
+        MIGRATIONS.sort(key=lambda entry: entry[0])
+        return func
+
+    return register
+
+
+@migration(1, "expenses (date, id) and (category, date) indexes")
+def _expense_indexes(connection: Connection) -> None:
+    # Tables created before these indexes were declared on models.Expense
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_expenses_date_id ON expenses (date, id)"
+    )
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_expenses_category_date "
+        "ON expenses (category, date)"
+    )
+
+
+@migration(2, "drop the fixed dimension from langchain_pg_embedding.embedding")
+def _unpin_embedding_dimension(connection: Connection) -> None:
+    # An earlier app.vector_index pinned the column to the first model's
+    # width; its indexes are now built on a cast instead (rebuilt at startup)
+    pinned = connection.exec_driver_sql(
+        "SELECT atttypmod > 0 FROM pg_attribute "
+        "WHERE attrelid = to_regclass('langchain_pg_embedding') "
+        "AND attname = 'embedding'"
+    ).scalar()
+    if not pinned:
+        return
+    for collection in ("expense_embeddings", "memory_store"):
+        for kind in ("hnsw", "ivfflat"):
+            connection.exec_driver_sql(
+                f"DROP INDEX IF EXISTS ix_langchain_pg_embedding_{collection}_{kind}"
+            )
+    connection.exec_driver_sql(
+        "ALTER TABLE langchain_pg_embedding ALTER COLUMN embedding TYPE vector"
+    )
+
+
+def applied(connection: Connection) -> Dict[int, str]:
+    if not inspect(connection).has_table(SchemaMigration.__tablename__):
+        return {}
+    rows = connection.execute(select(SchemaMigration.version, SchemaMigration.name))
+    return {version: name for version, name in rows}
+
+
+def migrate() -> List[int]:
+    """Create missing tables and apply pending migrations; returns the
+    versions applied by this call."""
+    done = []
+    with engine.connect() as connection:
+        connection.exec_driver_sql(LOCK_SQL)
+        connection.commit()
+        try:
+            Base.metadata.create_all(connection)
+            connection.commit()
+            already = applied(connection)
+            connection.commit()
+            for version, name, func in MIGRATIONS:
+                if version in already:
+                    continue
+                logger.info(f"Applying migration {version}: {name}")
+                with connection.begin():
+                    func(connection)
+                    connection.execute(
+                        text(
+                            "INSERT INTO schema_migrations (version, name) "
+                            "VALUES (:version, :name)"
+                        ),
+                        {"version": version, "name": name},
+                    )
+                done.append(version)
+        finally:
+            connection.exec_driver_sql(UNLOCK_SQL)
+            connection.commit()
+    return done
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply schema migrations")
+    parser.add_argument(
+        "--status", action="store_true", help="List migrations without applying"
+    )
+    args = parser.parse_args()
+    if not args.status:
+        print(f"✅ Applied migrations: {migrate() or 'none pending'}")
+    with engine.connect() as connection:
+        already = applied(connection)
+    for version, name, _ in MIGRATIONS:
+        print(
+            f"{version:4d} {'applied' if version in already else 'pending':8s} {name}"
+        )
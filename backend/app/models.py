@@ -1,12 +1,133 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, func
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    Integer,
+    String,
+    Text,
+    Float,
+    Date,
+    DateTime,
+    Index,
+    LargeBinary,
+    UniqueConstraint,
+    func,
+    text,
+)
+from sqlalchemy.dialects.postgresql import JSONB
 from app.database import Base
 
 
 class Expense(Base):
     __tablename__ = "expenses"
+    __table_args__ = (
+        # Date-range scans and keyset pagination (ORDER BY date, id)
+        Index("ix_expenses_date_id", "date", "id"),
+        Index("ix_expenses_category_date", "category", "date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     amount = Column(Float, nullable=False)
     category = Column(String, nullable=False)
     description = Column(String)
     date = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class ExpenseRollup(Base):
+    """Pre-aggregated totals per (granularity, bucket, category), see app.rollups."""
+
+    __tablename__ = "expense_rollups"
+    __table_args__ = (UniqueConstraint("granularity", "bucket_start", "category"),)
+
+    id = Column(Integer, primary_key=True)
+    granularity = Column(String, nullable=False)  # day | week | month
+    bucket_start = Column(Date, nullable=False)
+    category = Column(String, nullable=False)
+    total = Column(Float, nullable=False, default=0)
+    count = Column(Integer, nullable=False, default=0)
+    min_amount = Column(Float, nullable=False)
+    max_amount = Column(Float, nullable=False)
+
+
+class ExpenseEmbeddingState(Base):
+    """Content hash of the last embedded version of each expense, see app.embed_expense."""
+
+    __tablename__ = "expense_embedding_state"
+
+    expense_id = Column(Integer, primary_key=True)
+    content_hash = Column(String, nullable=False)
+    embedded_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class EmbeddingCacheEntry(Base):
+    """Persistent tier of the embedding cache, see app.embedding_cache."""
+
+    __tablename__ = "embedding_cache"
+
+    model = Column(String, primary_key=True)
+    text_hash = Column(String(64), primary_key=True)  # sha256 hex digest
+    vector = Column(LargeBinary, nullable=False)  # packed float32
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class DataVersion(Base):
+    """Monotonic change counter per dataset, see app.data_version."""
+
+    __tablename__ = "data_versions"
+
+    name = Column(String, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class LLMCacheEntry(Base):
+    """Stored chat completion, see app.llm_cache."""
+
+    __tablename__ = "llm_cache"
+
+    # sha256 of (model, temperature, call parameters, full prompt)
+    key_hash = Column(String(64), primary_key=True)
+    model = Column(String, nullable=False)
+    temperature = Column(Float)
+    generations = Column(Text, nullable=False)  # langchain_core.load.dumps
+    size = Column(Integer, nullable=False)
+    hits = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_used_at = Column(
+        DateTime(timezone=True), server_default=func.now(), index=True
+    )
+
+
+class SchemaMigration(Base):
+    """Applied schema migration, see app.migrations."""
+
+    __tablename__ = "schema_migrations"
+
+    version = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+    applied_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class Job(Base):
+    """Background job, see app.jobs."""
+
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # Claim order among ready jobs; finished jobs drop out of the index
+        Index(
+            "ix_jobs_ready", "run_at", "id", postgresql_where=text("status = 'queued'")
+        ),
+    )
+
+    id = Column(BigInteger, primary_key=True)
+    kind = Column(String, nullable=False)
+    payload = Column(JSONB, nullable=False)
+    # queued | running | done | failed
+    status = Column(String, nullable=False, server_default="queued")
+    attempts = Column(Integer, nullable=False, server_default="0")
+    max_attempts = Column(Integer, nullable=False)
+    run_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    locked_by = Column(String)
+    locked_until = Column(DateTime(timezone=True))
+    last_error = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True))
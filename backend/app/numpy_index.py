@@ -0,0 +1,500 @@
+"""
+In-process vector index backed by a memory-mapped float32 matrix.
+
+The matrix lives in `{VECTOR_CACHE_DIR}/{name}.f32` next to a JSON-lines
+file with each row's id, text and metadata and a small header file. Every
+worker maps the same files, so the OS page cache holds one copy of the
+vectors. Writers append under an exclusive file lock and bump the header;
+readers notice the header change and map the new rows before searching.
+Adding an id that is already indexed overwrites its vector in place and
+appends a record naming the replaced row, so ids stay unique the way
+PGVector's upserts keep them.
+
+`NumpyVectorStore` implements the LangChain VectorStore interface, so it
+drops in wherever a PGVector store is searched (`similarity_search`,
+`as_retriever`). Search is an exact, batched dot product over normalized
+rows followed by a partial sort for the top k.
+"""
+
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import fcntl
+import json
+import logging
+import os
+import threading
+import uuid
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+logger = logging.getLogger("numpy_index")
+
+VECTOR_CACHE_DIR = os.getenv("VECTOR_CACHE_DIR", ".vector_index")
+# Rows scored per matrix product, bounding the temporary score buffer
+SEARCH_BLOCK_ROWS = int(os.getenv("NUMPY_INDEX_BLOCK_ROWS", "65536"))
+_INITIAL_CAPACITY = 1024
+
+PGVECTOR_ROWS_SQL = """
+SELECT e.id, e.document, e.cmetadata, e.embedding::text
+FROM langchain_pg_embedding e
+JOIN langchain_pg_collection c ON c.uuid = e.collection_id
+WHERE c.name = %s
+"""
+PGVECTOR_IDS_SQL = """
+SELECT e.id FROM langchain_pg_embedding e
+JOIN langchain_pg_collection c ON c.uuid = e.collection_id
+WHERE c.name = %s
+"""
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def _compare(value: Any, condition: Any) -> bool:
+    if not isinstance(condition, dict):
+        return value == condition
+    for op, operand in condition.items():
+        if op == "$eq" and not value == operand:
+            return False
+        if op == "$ne" and not value != operand:
+            return False
+        if op == "$in" and value not in operand:
+            return False
+        if op == "$nin" and value in operand:
+            return False
+        if op in ("$gt", "$gte", "$lt", "$lte"):
+            if value is None:
+                return False
+            if op == "$gt" and not value > operand:
+                return False
+            if op == "$gte" and not value >= operand:
+                return False
+            if op == "$lt" and not value < operand:
+                return False
+            if op == "$lte" and not value <= operand:
+                return False
+    return True
+
+
+def matches(metadata: Dict[str, Any], filter: Dict[str, Any]) -> bool:
+    """Evaluate a PGVector-style metadata filter in Python."""
+    for key, condition in filter.items():
+        if key == "$and":
+            if not all(matches(metadata, f) for f in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(metadata, f) for f in condition):
+                return False
+        elif not _compare(metadata.get(key), condition):
+            return False
+    return True
+
+
+class MmapVectorIndex:
+    """Float32 matrix plus row payloads, shared through mmap; upserts by id."""
+
+    def __init__(self, name: str, directory: str = VECTOR_CACHE_DIR):
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, name)
+        self.vectors_path = base + ".f32"
+        self.rows_path = base + ".jsonl"
+        self.header_path = base + ".json"
+        self.lock_path = base + ".lock"
+        self.dim = 0
+        self.count = 0
+        self.generation = ""
+        self.ids: List[str] = []
+        self.texts: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self._row_of: Dict[str, int] = {}
+        self._matrix: Optional[np.ndarray] = None
+        self._rows_offset = 0
+        self._header_version = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool):
+        with open(self.lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _read_header(self) -> Dict[str, Any]:
+        try:
+            with open(self.header_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"dim": 0, "count": 0, "generation": ""}
+
+    def _write_header(self, dim: int, count: int, generation: str) -> None:
+        tmp = self.header_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"dim": dim, "count": count, "generation": generation}, f)
+        os.replace(tmp, self.header_path)
+
+    def _map(self) -> None:
+        if self.dim and os.path.exists(self.vectors_path):
+            rows = os.path.getsize(self.vectors_path) // (4 * self.dim)
+            self._matrix = np.memmap(
+                self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dim)
+            )
+        else:
+            self._matrix = None
+
+    def refresh(self) -> None:
+        """Pick up rows appended by this or another process since the last call."""
+        try:
+            st = os.stat(self.header_path)
+        except FileNotFoundError:
+            return
+        # The header is replaced atomically, so a new inode means new rows
+        version = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if version == self._header_version:
+            return
+        with self._lock, self._file_lock(exclusive=False):
+            self._load_rows_locked()
+            if self._matrix is None or len(self._matrix) < self.count:
+                self._map()
+            self._header_version = version
+
+    def _load_rows_locked(self) -> None:
+        # Callers hold self._lock and a file lock
+        header = self._read_header()
+        if header["generation"] != self.generation:
+            # Rebuilt from scratch: start over on the new files
+            self.ids, self.texts, self.metadatas = [], [], []
+            self._row_of = {}
+            self._rows_offset = 0
+            self._matrix = None
+            self.generation = header["generation"]
+        self.dim, self.count = header["dim"], header["count"]
+        if not os.path.exists(self.rows_path):
+            return
+        with open(self.rows_path, "rb") as f:
+            f.seek(self._rows_offset)
+            for line in f:
+                row = json.loads(line)
+                index = row.get("row")
+                if index is None:
+                    index = len(self.ids)
+                    self.ids.append(row["id"])
+                    self.texts.append(row["text"])
+                    self.metadatas.append(row["metadata"])
+                else:
+                    self.texts[index] = row["text"]
+                    self.metadatas[index] = row["metadata"]
+                self._row_of[row["id"]] = index
+            self._rows_offset = f.tell()
+
+    def _replace_locked(
+        self,
+        rows: Sequence[int],
+        ids: Sequence[str],
+        vectors: np.ndarray,
+        texts: Sequence[str],
+        metadatas: Sequence[Dict[str, Any]],
+    ) -> None:
+        header = self._read_header()
+        dim = header["dim"]
+        if vectors.shape[1] != dim:
+            raise ValueError(f"Expected {dim}-dimensional vectors")
+        normalized = _normalize(vectors).astype(np.float32)
+        with open(self.vectors_path, "r+b") as f:
+            for row, vector in zip(rows, normalized):
+                f.seek(row * dim * 4)
+                f.write(vector.tobytes())
+        with open(self.rows_path, "a", encoding="utf-8") as f:
+            for row, row_id, text, metadata in zip(rows, ids, texts, metadatas):
+                f.write(
+                    json.dumps(
+                        {"id": row_id, "text": text, "metadata": metadata, "row": row}
+                    )
+                    + "\n"
+                )
+        # A new header file tells readers to load the replaced payloads
+        self._write_header(dim, header["count"], header["generation"])
+
+    def _append_locked(
+        self,
+        ids: Sequence[str],
+        vectors: np.ndarray,
+        texts: Sequence[str],
+        metadatas: Sequence[Dict[str, Any]],
+    ) -> None:
+        header = self._read_header()
+        dim, count = header["dim"] or vectors.shape[1], header["count"]
+        if vectors.shape[1] != dim:
+            raise ValueError(f"Expected {dim}-dimensional vectors")
+
+        capacity = 0
+        if os.path.exists(self.vectors_path):
+            capacity = os.path.getsize(self.vectors_path) // (4 * dim)
+        needed = count + len(ids)
+        with open(self.vectors_path, "r+b" if capacity else "w+b") as f:
+            if needed > capacity:
+                # Grow geometrically so appends stay amortized O(1)
+                capacity = max(needed, capacity * 2, _INITIAL_CAPACITY)
+                f.truncate(capacity * dim * 4)
+            f.seek(count * dim * 4)
+            f.write(_normalize(vectors).astype(np.float32).tobytes())
+        with open(self.rows_path, "a", encoding="utf-8") as f:
+            for row_id, text, metadata in zip(ids, texts, metadatas):
+                f.write(
+                    json.dumps({"id": row_id, "text": text, "metadata": metadata})
+                    + "\n"
+                )
+        self._write_header(dim, needed, header["generation"] or uuid.uuid4().hex)
+
+    def add(self, ids, vectors, texts, metadatas) -> None:
+        """Append new ids; overwrite the rows of ids already in the index."""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1)
+        # The last occurrence wins when a batch repeats an id
+        latest = sorted({row_id: i for i, row_id in enumerate(ids)}.values())
+        with self._lock, self._file_lock(exclusive=True):
+            self._load_rows_locked()
+            replaced = [i for i in latest if ids[i] in self._row_of]
+            appended = [i for i in latest if ids[i] not in self._row_of]
+
+            def pick(batch):
+                return (
+                    [ids[i] for i in batch],
+                    vectors[batch],
+                    [texts[i] for i in batch],
+                    [metadatas[i] for i in batch],
+                )
+
+            if replaced:
+                rows = [self._row_of[ids[i]] for i in replaced]
+                self._replace_locked(rows, *pick(replaced))
+            if appended:
+                self._append_locked(*pick(appended))
+        self.refresh()
+
+    def rebuild(self, rows: Iterable[Tuple[str, str, Dict[str, Any], Any]]) -> int:
+        """Replace the index contents with (id, text, metadata, vector) rows."""
+        with self._file_lock(exclusive=True):
+            for path in (self.vectors_path, self.rows_path, self.header_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            batch: List[Tuple[str, str, Dict[str, Any], Any]] = []
+            total = 0
+            for row in rows:
+                batch.append(row)
+                if len(batch) == 10_000:
+                    total += self._append_batch(batch)
+            total += self._append_batch(batch)
+            if not total:
+                self._write_header(0, 0, uuid.uuid4().hex)
+        self.refresh()
+        return total
+
+    def _append_batch(self, batch) -> int:
+        if not batch:
+            return 0
+        ids, texts, metadatas, vectors = zip(*batch)
+        self._append_locked(
+            ids, np.asarray(vectors, dtype=np.float32), texts, metadatas
+        )
+        n = len(batch)
+        batch.clear()
+        return n
+
+    def search(
+        self, queries: np.ndarray, k: int, filter: Optional[Dict[str, Any]] = None
+    ) -> List[List[Tuple[int, float]]]:
+        """Top-k (row, cosine similarity) for each query row."""
+        self.refresh()
+        with self._lock:
+            matrix, count = self._matrix, self.count
+            metadatas = self.metadatas
+        queries = _normalize(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+        if matrix is None or count == 0:
+            return [[] for _ in queries]
+
+        allowed = None
+        if filter:
+            allowed = np.fromiter(
+                (matches(m, filter) for m in metadatas[:count]), bool, count
+            )
+
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        for start in range(0, count, SEARCH_BLOCK_ROWS):
+            stop = min(start + SEARCH_BLOCK_ROWS, count)
+            scores = queries @ matrix[start:stop].T
+            if allowed is not None:
+                scores[:, ~allowed[start:stop]] = -np.inf
+            top = min(k, stop - start)
+            rows = np.argpartition(-scores, top - 1, axis=1)[:, :top]
+            best_scores = np.concatenate(
+                [best_scores, np.take_along_axis(scores, rows, axis=1)], axis=1
+            )
+            best_rows = np.concatenate([best_rows, rows + start], axis=1)
+            if best_scores.shape[1] > k:
+                keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+
+        results = []
+        for scores, rows in zip(best_scores, best_rows):
+            order = np.argsort(-scores)
+            results.append(
+                [
+                    (int(rows[i]), float(scores[i]))
+                    for i in order
+                    if scores[i] != -np.inf
+                ]
+            )
+        return results
+
+
+class NumpyVectorStore(VectorStore):
+    """LangChain vector store over an MmapVectorIndex (cosine similarity)."""
+
+    def __init__(self, embedding: Embeddings, index: MmapVectorIndex):
+        self.embedding = embedding
+        self.index = index
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    def sync_from_pgvector(self, engine, collection_name: str) -> Dict[str, int]:
+        """Load rows missing from the local index; rebuild if rows were deleted."""
+        self.index.refresh()
+        with engine.connect() as conn:
+            pg_ids = set(
+                str(i)
+                for i in conn.exec_driver_sql(
+                    PGVECTOR_IDS_SQL, (collection_name,)
+                ).scalars()
+            )
+            local_ids = set(self.index.ids)
+            if local_ids - pg_ids:
+                result = conn.exec_driver_sql(PGVECTOR_ROWS_SQL, (collection_name,))
+                loaded = self.index.rebuild(self._parse(row) for row in result)
+                logger.info(f"Rebuilt {collection_name} index with {loaded} rows")
+                return {"loaded": loaded, "rebuilt": 1}
+            missing = list(pg_ids - local_ids)
+            if not missing:
+                return {"loaded": 0, "rebuilt": 0}
+            rows = [
+                self._parse(row)
+                for row in conn.exec_driver_sql(
+                    PGVECTOR_ROWS_SQL + " AND e.id = ANY(%s)",
+                    (collection_name, missing),
+                )
+            ]
+        ids, texts, metadatas, vectors = zip(*rows)
+        self.index.add(ids, vectors, texts, metadatas)
+        logger.info(f"Loaded {len(rows)} {collection_name} rows into the local index")
+        return {"loaded": len(rows), "rebuilt": 0}
+
+    @staticmethod
+    def _parse(row) -> Tuple[str, str, Dict[str, Any], np.ndarray]:
+        row_id, text, metadata, vector = row
+        values = np.array(vector.strip("[]").split(","), dtype=np.float32)
+        return str(row_id), text, metadata or {}, values
+
+    def add_embeddings(
+        self,
+        texts: Sequence[str],
+        embeddings: Sequence[Sequence[float]],
+        metadatas: Optional[Sequence[Dict[str, Any]]] = None,
+        ids: Optional[Sequence[str]] = None,
+    ) -> List[str]:
+        ids = list(ids or [str(uuid.uuid4()) for _ in texts])
+        metadatas = list(metadatas or [{} for _ in texts])
+        self.index.add(ids, embeddings, list(texts), metadatas)
+        return ids
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        texts = list(texts)
+        vectors = self.embedding.embed_documents(texts)
+        return self.add_embeddings(texts, vectors, metadatas, ids)
+
+    def similarity_search_with_score_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+    ) -> List[Tuple[Document, float]]:
+        (hits,) = self.index.search(np.asarray([embedding]), k, filter)
+        return [
+            (
+                Document(
+                    id=self.index.ids[row],
+                    page_content=self.index.texts[row],
+                    metadata=self.index.metadatas[row],
+                ),
+                # Cosine distance, matching PGVector's scores
+                1.0 - score,
+            )
+            for row, score in hits
+        ]
+
+    def similarity_search_by_vector(
+        self, embedding: List[float], k: int = 4, **kwargs: Any
+    ) -> List[Document]:
+        hits = self.similarity_search_with_score_by_vector(
+            embedding, k, kwargs.get("filter")
+        )
+        return [doc for doc, _ in hits]
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(
+            self.embedding.embed_query(query), k, filter
+        )
+
+    def similarity_search(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> List[Document]:
+        return self.similarity_search_by_vector(
+            self.embedding.embed_query(query), k, **kwargs
+        )
+
+    async def asimilarity_search(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> List[Document]:
+        vector = await self.embedding.aembed_query(query)
+        return self.similarity_search_by_vector(vector, k, **kwargs)
+
+    def _select_relevance_score_fn(self):
+        return self._cosine_relevance_score_fn
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        *,
+        name: str = "default",
+        **kwargs: Any,
+    ) -> "NumpyVectorStore":
+        store = cls(embedding, MmapVectorIndex(name))
+        store.add_texts(texts, metadatas, **kwargs)
+        return store
+
+    def stats(self) -> Dict[str, Any]:
+        self.index.refresh()
+        return {
+            "rows": self.index.count,
+            "dim": self.index.dim,
+            "path": self.index.vectors_path,
+        }
@@ -0,0 +1,199 @@
+"""
+Optional monthly range partitioning of the expenses table.
+
+With EXPENSES_PARTITIONING=monthly the API lifespan converts `expenses`
+into a table partitioned by RANGE (date): one partition per calendar month
+(UTC) that holds data, plus expenses_default for rows outside every range.
+On each start it then creates the partitions for the current month and
+the next EXPENSES_PARTITIONS_AHEAD. A date-range query then only scans the
+months it covers. Rows that landed in the default partition are moved when
+their month's partition is created.
+
+The partitioned table's primary key is (id, date) because Postgres
+requires the partition key in every unique index; ids still come from
+expenses_id_seq.
+
+    python -m app.partitions [--convert] [--ensure]   (lists partitions)
+"""
+
+from datetime import date, datetime, timezone
+from typing import List, Optional
+import argparse
+import logging
+import os
+
+from sqlalchemy import Connection
+
+from .database import engine
+from .migrations import LOCK_SQL, UNLOCK_SQL
+from .models import Expense
+
+logger = logging.getLogger("partitions")
+
+EXPENSES_PARTITIONING = os.getenv("EXPENSES_PARTITIONING", "none")  # none | monthly
+EXPENSES_PARTITIONS_AHEAD = int(os.getenv("EXPENSES_PARTITIONS_AHEAD", "3"))
+
+
+def month_start(value: date, offset: int = 0) -> date:
+    months = value.year * 12 + value.month - 1 + offset
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_y{month.year}m{month.month:02d}"
+
+
+def _bound(month: date) -> str:
+    return f"'{month.isoformat()} 00:00:00+00'"
+
+
+def is_partitioned(connection: Connection, table: str = "expenses") -> bool:
+    kind = connection.exec_driver_sql(
+        "SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (table,)
+    ).scalar()
+    return kind == "p"
+
+
+def partitions(connection: Connection, table: str = "expenses") -> List[str]:
+    return list(
+        connection.exec_driver_sql(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(%s) ORDER BY c.relname",
+            (table,),
+        ).scalars()
+    )
+
+
+def create_month(connection: Connection, table: str, month: date) -> Optional[str]:
+    """Create the partition for `month` unless it exists, moving its rows
+    out of the default partition first."""
+    name = partition_name(table, month)
+    if connection.exec_driver_sql("SELECT to_regclass(%s)", (name,)).scalar():
+        return None
+    lower, upper = _bound(month), _bound(month_start(month, 1))
+    # Attaching would fail while the default partition holds rows of the range
+    connection.exec_driver_sql(
+        f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+    )
+    connection.exec_driver_sql(
+        f"WITH moved AS (DELETE FROM {table}_default "
+        f"WHERE date >= {lower} AND date < {upper} RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved"
+    )
+    connection.exec_driver_sql(
+        f"ALTER TABLE {table} ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ({lower}) TO ({upper})"
+    )
+    return name
+
+
+def ensure_partitions(
+    connection: Connection,
+    table: str = "expenses",
+    months_ahead: int = EXPENSES_PARTITIONS_AHEAD,
+    today: Optional[date] = None,
+) -> List[str]:
+    """Create partitions for this month and the next `months_ahead`."""
+    this_month = month_start(today or datetime.now(timezone.utc).date())
+    created = []
+    for offset in range(months_ahead + 1):
+        name = create_month(connection, table, month_start(this_month, offset))
+        if name:
+            created.append(name)
+    return created
+
+
+def convert(connection: Connection, table: str = "expenses") -> List[str]:
+    """Rewrite an ordinary `table` as a monthly partitioned one, in the
+    caller's transaction. Blocks all access to the table while it copies."""
+    if connection.exec_driver_sql(
+        f"SELECT EXISTS (SELECT 1 FROM {table} WHERE date IS NULL)"
+    ).scalar():
+        raise ValueError(f"{table} has rows without a date; set one to partition")
+
+    new = f"{table}_partitioned"
+    sequence = connection.exec_driver_sql(
+        "SELECT pg_get_serial_sequence(%s, 'id')", (table,)
+    ).scalar()
+    connection.exec_driver_sql(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE")
+    connection.exec_driver_sql(
+        f"CREATE TABLE {new} (LIKE {table} INCLUDING DEFAULTS) PARTITION BY RANGE (date)"
+    )
+    connection.exec_driver_sql(f"ALTER TABLE {new} ALTER COLUMN date SET NOT NULL")
+    connection.exec_driver_sql(f"CREATE TABLE {new}_default PARTITION OF {new} DEFAULT")
+    months = (
+        connection.exec_driver_sql(
+            f"SELECT DISTINCT date_trunc('month', date AT TIME ZONE 'UTC')::date "
+            f"FROM {table}"
+        )
+        .scalars()
+        .all()
+    )
+    for month in months:
+        create_month(connection, new, month)
+    connection.exec_driver_sql(f"INSERT INTO {new} SELECT * FROM {table}")
+
+    # Keep the id sequence alive when the old table is dropped
+    if sequence:
+        connection.exec_driver_sql(f"ALTER SEQUENCE {sequence} OWNED BY NONE")
+    connection.exec_driver_sql(f"DROP TABLE {table}")
+    connection.exec_driver_sql(f"ALTER TABLE {new} RENAME TO {table}")
+    for name in partitions(connection, table):
+        connection.exec_driver_sql(
+            f"ALTER TABLE {name} RENAME TO {name.replace(new, table, 1)}"
+        )
+    if sequence:
+        connection.exec_driver_sql(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id")
+    connection.exec_driver_sql(
+        f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id, date)"
+    )
+    for index in Expense.__table__.indexes:
+        connection.exec_driver_sql(
+            f"CREATE INDEX {index.name.replace('expenses', table, 1)} ON {table} "
+            f"({', '.join(column.name for column in index.columns)})"
+        )
+    return partitions(connection, table)
+
+
+def ensure_expense_partitions() -> List[str]:
+    """Lifespan step: convert `expenses` if needed, then create upcoming
+    partitions. Returns the partitions created."""
+    with engine.connect() as connection:
+        connection.exec_driver_sql(LOCK_SQL)
+        connection.commit()
+        try:
+            created = []
+            with connection.begin():
+                if not is_partitioned(connection):
+                    logger.info("Converting expenses to monthly partitions")
+                    created = convert(connection)
+            with connection.begin():
+                created += ensure_partitions(connection)
+        finally:
+            connection.exec_driver_sql(UNLOCK_SQL)
+            connection.commit()
+    if created:
+        logger.info(f"Created expense partitions: {', '.join(created)}")
+    return created
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monthly expense partitions")
+    parser.add_argument(
+        "--convert", action="store_true", help="Partition expenses if needed"
+    )
+    parser.add_argument(
+        "--ensure", action="store_true", help="Create upcoming partitions"
+    )
+    args = parser.parse_args()
+    if args.convert:
+        print(f"✅ Created: {ensure_expense_partitions()}")
+    elif args.ensure:
+        with engine.begin() as connection:
+            if not is_partitioned(connection):
+                parser.exit(1, "expenses is not partitioned; use --convert\n")
+            print(f"✅ Created: {ensure_partitions(connection)}")
+    with engine.connect() as connection:
+        for name in partitions(connection):
+            print(name)
@@ -0,0 +1,152 @@
+"""
+Incrementally maintained spending rollups.
+
+Every insert path calls `record_expenses` in the same transaction as the
+INSERT, which upserts day/week/month x category totals into
+`expense_rollups`. Aggregate questions are then answered from the rollups
+in O(buckets) instead of scanning raw expense rows. `rebuild_rollups`
+recomputes everything from scratch (`python -m app.rollups`).
+"""
+
+from collections.abc import Mapping
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from .models import ExpenseRollup
+import logging
+
+logger = logging.getLogger("rollups")
+
+GRANULARITIES = ("day", "week", "month")
+
+_AGGREGATE_SQL = """
+INSERT INTO expense_rollups
+    (granularity, bucket_start, category, total, count, min_amount, max_amount)
+SELECT g.granularity,
+       date_trunc(g.granularity, e.date)::date,
+       e.category,
+       SUM(e.amount), COUNT(*), MIN(e.amount), MAX(e.amount)
+FROM {source}
+CROSS JOIN (VALUES ('day'), ('week'), ('month')) AS g(granularity)
+WHERE e.date IS NOT NULL
+GROUP BY 1, 2, 3
+ORDER BY 1, 2, 3
+"""
+
+# pyformat placeholders, executed through exec_driver_sql on the sync
+# (psycopg2) and async (psycopg 3) engines alike. Rows are upserted in key
+# order so concurrent writers lock the same buckets in the same order;
+# without ORDER BY a prepared generic plan and a custom plan can emit the
+# groups differently and deadlock each other.
+ROLLUP_UPSERT_SQL = (
+    _AGGREGATE_SQL.format(
+        source="unnest(%(amounts)s::float8[], %(categories)s::text[], "
+        "%(dates)s::timestamptz[]) AS e(amount, category, date)"
+    )
+    + """ON CONFLICT (granularity, bucket_start, category) DO UPDATE SET
+    total = expense_rollups.total + EXCLUDED.total,
+    count = expense_rollups.count + EXCLUDED.count,
+    min_amount = LEAST(expense_rollups.min_amount, EXCLUDED.min_amount),
+    max_amount = GREATEST(expense_rollups.max_amount, EXCLUDED.max_amount)
+"""
+)
+
+REBUILD_SQL = _AGGREGATE_SQL.format(source="expenses AS e")
+
+
+def _field(expense: Any, name: str) -> Any:
+    if isinstance(expense, Mapping):
+        return expense[name]
+    return getattr(expense, name)
+
+
+def rollup_params(expenses: Iterable[Any]) -> Dict[str, List[Any]]:
+    """Build ROLLUP_UPSERT_SQL parameters from ORM objects or row dicts."""
+    amounts, categories, dates = [], [], []
+    for expense in expenses:
+        amounts.append(float(_field(expense, "amount")))
+        categories.append(_field(expense, "category"))
+        expense_date = _field(expense, "date")
+        dates.append(str(expense_date) if expense_date is not None else None)
+    return {"amounts": amounts, "categories": categories, "dates": dates}
+
+
+def record_expenses(db: Session, expenses: Iterable[Any]) -> None:
+    """Add newly inserted expenses to the rollups inside the caller's transaction."""
+    params = rollup_params(expenses)
+    if params["amounts"]:
+        db.connection().exec_driver_sql(ROLLUP_UPSERT_SQL, params)
+
+
+def rebuild_rollups(db: Session) -> None:
+    """Recompute every rollup bucket from the raw expenses table."""
+    conn = db.connection()
+    # Block concurrent inserts so no row is counted twice or missed
+    conn.exec_driver_sql("LOCK TABLE expenses IN SHARE MODE")
+    conn.exec_driver_sql("LOCK TABLE expense_rollups IN EXCLUSIVE MODE")
+    conn.exec_driver_sql("DELETE FROM expense_rollups")
+    conn.exec_driver_sql(REBUILD_SQL)
+
+
+def bucket_floor(day: date, granularity: str) -> date:
+    """Start of the bucket containing `day`, matching Postgres date_trunc."""
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+def summarize(
+    db: Session,
+    start_date: date,
+    end_date: date,
+    category: Optional[str] = None,
+    granularity: str = "day",
+) -> Dict[str, Any]:
+    """Totals over [start_date, end_date] read from the rollup buckets.
+
+    Week and month buckets are aligned to their boundaries, so the range is
+    widened to whole buckets; use "day" for exact date ranges.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {GRANULARITIES}")
+
+    stmt = (
+        select(ExpenseRollup)
+        .where(
+            ExpenseRollup.granularity == granularity,
+            ExpenseRollup.bucket_start >= bucket_floor(start_date, granularity),
+            ExpenseRollup.bucket_start <= end_date,
+        )
+        .order_by(ExpenseRollup.bucket_start, ExpenseRollup.category)
+    )
+    if category:
+        stmt = stmt.where(ExpenseRollup.category == category)
+    buckets = db.scalars(stmt).all()
+
+    return {
+        "granularity": granularity,
+        "start_date": start_date,
+        "end_date": end_date,
+        "category": category,
+        "total": sum(b.total for b in buckets),
+        "count": sum(b.count for b in buckets),
+        "min_amount": min((b.min_amount for b in buckets), default=None),
+        "max_amount": max((b.max_amount for b in buckets), default=None),
+        "buckets": buckets,
+    }
+
+
+if __name__ == "__main__":
+    session = SessionLocal()
+    try:
+        rebuild_rollups(session)
+        session.commit()
+        print("✅ Rebuilt expense rollups.")
+    finally:
+        session.close()
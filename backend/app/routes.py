@@ -1,27 +1,67 @@
-from fastapi import APIRouter, Depends, Body, HTTPException
-from langchain_ollama import ChatOllama
+from fastapi import (
+    APIRouter,
+    Depends,
+    Body,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+)
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import insert, select, tuple_
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.database import SessionLocal
-from app import models, schemas
-from app.llm_agent import extract_expense, test_agent_with_simple_query
-from pydantic import BaseModel
-from typing import Optional, List
-from langchain.chains import RetrievalQA
-from app.memory import vectorstore
-from .llm_agent import get_llm_response
+from app.database import SessionLocal, get_async_db, get_db, pool_status
+from app import (
+    analytics,
+    expense_writes,
+    http_cache,
+    intent_router,
+    jobs,
+    llm_cache,
+    llm_scheduler,
+    metrics,
+    models,
+    rollups,
+    schemas,
+    semantic_search,
+    serialization,
+    vector_index,
+)
+from app.llm_agent import (
+    extract_expense,
+    extract_expenses,
+    test_agent_with_simple_query,
+)
+from pydantic import BaseModel, ValidationError
+from typing import Any, Dict, Literal, Optional, List
+from app.expense_parser import UnsupportedCurrency
+from app.embedding_cache import embedding
+from app.memory import get_local_store, session_histories
+from .llm_agent import aget_llm_response, astream_llm_response
+from datetime import date, datetime
+import json
 import logging
+import os
 
 logger = logging.getLogger("api_routes")
 
-router = APIRouter()
+# Rows per transaction for bulk ingestion
+BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", "1000"))
+NDJSON_CONTENT_TYPES = (
+    "application/x-ndjson",
+    "application/jsonl",
+    "application/ndjson",
+)
 
+# Keyset pagination and streaming for GET /expenses
+DEFAULT_PAGE_SIZE = int(os.getenv("EXPENSES_PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = int(os.getenv("EXPENSES_MAX_PAGE_SIZE", "1000"))
+STREAM_CHUNK_SIZE = int(os.getenv("EXPENSES_STREAM_CHUNK_SIZE", "500"))
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+router = APIRouter()
 
 
 class ChatExpenseRequest(BaseModel):
@@ -33,16 +73,58 @@ class DebugRequest(BaseModel):
 
 
 @router.post("/ask")
-def ask_expense_agent(payload: dict):
+async def ask_expense_agent(request: Request, payload: dict):
     user_input = payload.get("message")
     if not user_input:
         raise HTTPException(status_code=400, detail="Message not found")
 
     logger.info(f"API request: /ask with message: {user_input[:50]}...")
-    response = get_llm_response(user_input)
+    with llm_scheduler.admission("interactive", disconnected=request.is_disconnected):
+        response = await aget_llm_response(user_input)
     return {"response": response}
 
 
+def _sse(event: Dict[str, Any]) -> str:
+    name = event.pop("event")
+    return f"event: {name}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+async def _ask_events(request: Request, user_input: str):
+    stream = astream_llm_response(user_input)
+    with llm_scheduler.admission("interactive", disconnected=request.is_disconnected):
+        try:
+            async for event in stream:
+                if await request.is_disconnected():
+                    logger.info("Client left /ask/stream, cancelling agent run")
+                    break
+                yield _sse(event)
+        finally:
+            # Cancels the in-flight Ollama request if the agent is mid-call
+            await stream.aclose()
+
+
+def _ask_stream_response(request: Request, user_input: Optional[str]):
+    if not user_input:
+        raise HTTPException(status_code=400, detail="Message not found")
+    logger.info(f"API request: /ask/stream with message: {user_input[:50]}...")
+    return StreamingResponse(
+        _ask_events(request, user_input),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/ask/stream")
+async def ask_stream(request: Request, message: Optional[str] = None):
+    """Server-sent events: route, agent steps, answer tokens, then final."""
+    return _ask_stream_response(request, message)
+
+
+@router.post("/ask/stream")
+async def ask_stream_post(request: Request, payload: dict = Body(...)):
+    return _ask_stream_response(request, payload.get("message"))
+
+
 @router.post("/debug/test-agent")
 def debug_agent(request: DebugRequest):
     """Endpoint for testing agent behavior with a specific query."""
@@ -63,24 +145,115 @@ def debug_parser(request: DebugRequest):
 def add_expense(expense: schemas.ExpenseCreate, db: Session = Depends(get_db)):
     db_expense = models.Expense(**expense.dict())
     db.add(db_expense)
+    expense_writes.record(db, [db_expense])
     db.commit()
     db.refresh(db_expense)
     return db_expense
 
 
-@router.post("/chat-expense", response_model=schemas.ExpenseOut)
-def add_expense_via_chat(request: ChatExpenseRequest, db: Session = Depends(get_db)):
-    parsed = extract_expense(request.text)
-    if not parsed or "amount" not in parsed or "category" not in parsed:
+def _parse_batch_body(body: bytes, content_type: str) -> List[Any]:
+    """Decode a JSON array or NDJSON stream into a list of raw rows."""
+    if content_type.split(";")[0].strip() in NDJSON_CONTENT_TYPES:
+        return [json.loads(line) for line in body.splitlines() if line.strip()]
+
+    items = json.loads(body)
+    if not isinstance(items, list):
+        raise ValueError("Expected a JSON array of expenses")
+    return items
+
+
+def _insert_expense_rows(db: Session, rows: List[Dict[str, Any]]) -> List[int]:
+    """Insert validated rows with one multi-row INSERT ... RETURNING id."""
+    stmt = insert(models.Expense).returning(
+        models.Expense.id, sort_by_parameter_order=True
+    )
+    return list(db.scalars(stmt, rows))
+
+
+def _insert_batch(
+    rows: List[Dict[str, Any]], indexes: List[int]
+) -> tuple[List[int], List[schemas.BatchRowError]]:
+    """Insert rows in chunked transactions, recording failed chunks per row."""
+    ids: List[int] = []
+    errors: List[schemas.BatchRowError] = []
+    db = SessionLocal()
+    try:
+        for start in range(0, len(rows), BATCH_CHUNK_SIZE):
+            chunk = rows[start : start + BATCH_CHUNK_SIZE]
+            try:
+                chunk_ids = _insert_expense_rows(db, chunk)
+                expense_writes.record(db, chunk, chunk_ids)
+                ids.extend(chunk_ids)
+                db.commit()
+            except SQLAlchemyError as e:
+                db.rollback()
+                logger.error(f"Batch chunk at row {start} failed: {e}")
+                errors.extend(
+                    schemas.BatchRowError(
+                        index=i, errors=[str(getattr(e, "orig", None) or e)]
+                    )
+                    for i in indexes[start : start + BATCH_CHUNK_SIZE]
+                )
+    finally:
+        db.close()
+    return ids, errors
+
+
+@router.post("/expenses/batch", response_model=schemas.ExpenseBatchResult)
+async def add_expenses_batch(request: Request):
+    """Bulk-insert a JSON array or NDJSON stream of expenses."""
+    try:
+        items = _parse_batch_body(
+            await request.body(), request.headers.get("content-type", "")
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid batch body: {e}")
+
+    rows: List[Dict[str, Any]] = []
+    indexes: List[int] = []
+    errors: List[schemas.BatchRowError] = []
+    for i, item in enumerate(items):
+        try:
+            rows.append(schemas.ExpenseCreate.model_validate(item).model_dump())
+            indexes.append(i)
+        except ValidationError as e:
+            errors.append(
+                schemas.BatchRowError(
+                    index=i, errors=e.errors(include_url=False, include_context=False)
+                )
+            )
+
+    logger.info(f"Batch request: {len(rows)} valid rows, {len(errors)} rejected")
+    ids, insert_errors = await run_in_threadpool(_insert_batch, rows, indexes)
+    errors.extend(insert_errors)
+    return {"ids": ids, "errors": errors}
+
+
+@router.post("/chat-expense", response_model=List[schemas.ExpenseOut])
+async def add_expense_via_chat(
+    request: ChatExpenseRequest, db: AsyncSession = Depends(get_async_db)
+):
+    """Add every expense named in the message in a single transaction."""
+    try:
+        parsed = extract_expenses(request.text)
+    except UnsupportedCurrency as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if not parsed:
         raise HTTPException(
             status_code=422, detail="Could not understand your expense input"
         )
 
-    db_expense = models.Expense(**parsed)
-    db.add(db_expense)
-    db.commit()
-    db.refresh(db_expense)
-    return db_expense
+    db_expenses = [models.Expense(**fields) for fields in parsed]
+    db.add_all(db_expenses)
+    await db.run_sync(expense_writes.record, db_expenses)
+    await db.commit()
+    # One round trip reloads server-side values (e.g. timestamptz dates)
+    await db.execute(
+        select(models.Expense)
+        .where(models.Expense.id.in_([expense.id for expense in db_expenses]))
+        .execution_options(populate_existing=True)
+    )
+    return db_expenses
 
 
 @router.get("/")
@@ -88,33 +261,277 @@ def welcome(db: Session = Depends(get_db)):
     return {"message": "Welcome to ZenSpend API"}
 
 
+@router.get("/expenses/summary", response_model=schemas.ExpenseSummary)
+def get_expense_summary(
+    request: Request,
+    response: Response,
+    start_date: date,
+    end_date: date,
+    category: Optional[str] = None,
+    granularity: Literal["day", "week", "month"] = "day",
+    db: Session = Depends(get_db),
+):
+    """Spending totals for a date range, answered from the rollup buckets.
+
+    The default day buckets give exact totals; week or month buckets are
+    fewer rows but widen the range to whole weeks or months."""
+    not_modified = http_cache.check(request, response, db)
+    if not_modified:
+        return not_modified
+    return rollups.summarize(db, start_date, end_date, category, granularity)
+
+
+def _parse_cursor(after: str) -> tuple[datetime, int]:
+    """Decode an `<iso date>,<id>` keyset cursor."""
+    try:
+        raw_date, raw_id = after.rsplit(",", 1)
+        # A literal "+" in the UTC offset arrives as a space when not URL-encoded
+        after_date = datetime.fromisoformat(raw_date.strip().replace(" ", "+"))
+        return after_date, int(raw_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=400, detail="Invalid cursor, expected 'after=<date>,<id>'"
+        )
+
+
+def _encode_cursor(row) -> str:
+    return f"{row.date.isoformat()},{row.id}"
+
+
+def _expenses_page_query(after: Optional[str]):
+    """Newest-first expense rows (plain tuples, see app.serialization) on
+    the stable (date, id) keyset."""
+    stmt = select(*serialization.EXPENSE_COLUMNS).order_by(
+        models.Expense.date.desc(), models.Expense.id.desc()
+    )
+    if after:
+        after_date, after_id = _parse_cursor(after)
+        stmt = stmt.where(
+            tuple_(models.Expense.date, models.Expense.id) < (after_date, after_id)
+        )
+    return stmt
+
+
+def _stream_expenses(stmt):
+    """Yield NDJSON chunks read through a server-side cursor."""
+    db = SessionLocal()
+    try:
+        result = db.execute(stmt.execution_options(yield_per=STREAM_CHUNK_SIZE))
+        for chunk in result.partitions():
+            yield serialization.encode_expense_lines(chunk)
+    finally:
+        db.close()
+
+
 @router.get("/expenses", response_model=list[schemas.ExpenseOut])
-def get_expenses(db: Session = Depends(get_db)):
-    expenses = db.query(models.Expense).order_by(models.Expense.date.desc()).all()
-    return expenses
+def get_expenses(
+    request: Request,
+    response: Response,
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    stream: bool = False,
+    db: Session = Depends(get_db),
+):
+    """List expenses newest first, one keyset page at a time.
+
+    Pass the `X-Next-Cursor` response header back as `after` to fetch the
+    next page. With `stream=true` the remaining rows are sent as NDJSON.
+    Conditional requests are answered with 304 while no expense has been
+    written (see app.http_cache).
+    """
+    not_modified = http_cache.check(request, response, db)
+    if not_modified:
+        return not_modified
+    stmt = _expenses_page_query(after)
+
+    if stream:
+        if limit:
+            stmt = stmt.limit(limit)
+        return StreamingResponse(
+            _stream_expenses(stmt),
+            media_type="application/x-ndjson",
+            headers=dict(response.headers),
+        )
+
+    page_size = limit or DEFAULT_PAGE_SIZE
+    rows = db.execute(stmt.limit(page_size)).all()
+    if len(rows) == page_size:
+        response.headers["X-Next-Cursor"] = _encode_cursor(rows[-1])
+    # Already ExpenseOut-shaped JSON; response_model only documents it
+    return Response(
+        serialization.encode_expenses(rows),
+        media_type="application/json",
+        headers=dict(response.headers),
+    )
+
+
+@router.get("/analytics/monthly")
+def analytics_monthly(
+    category: Optional[str] = None,
+    months: int = Query(12, ge=2, le=120),
+    window: int = Query(3, ge=1, le=24),
+):
+    """Monthly totals with month-over-month deltas, a trailing average and
+    this month's projection against the usual."""
+    return analytics.monthly(analytics.current(), category, months, window)
+
+
+@router.get("/analytics/rolling")
+def analytics_rolling(
+    category: Optional[str] = None,
+    days: int = Query(90, ge=1, le=3660),
+    window: int = Query(7, ge=1, le=365),
+):
+    """Daily totals over the last `days` days with a rolling average."""
+    return analytics.rolling(analytics.current(), category, days, window)
+
+
+@router.get("/analytics/percentiles")
+def analytics_percentiles(days: Optional[int] = Query(None, ge=1)):
+    """Per-category amount percentiles (p50, p90, p99), mean and count."""
+    return analytics.percentiles(analytics.current(), days=days)
+
+
+@router.get("/analytics/forecast")
+def analytics_forecast(
+    category: Optional[str] = None,
+    history: int = Query(6, ge=2, le=60),
+    horizon: int = Query(3, ge=1, le=24),
+):
+    """Linear-trend forecast of monthly spending."""
+    return analytics.forecast(analytics.current(), category, history, horizon)
+
+
+@router.get("/analytics/anomalies")
+def analytics_anomalies(
+    category: Optional[str] = None,
+    days: int = Query(90, ge=1, le=3660),
+    threshold: float = Query(3.5, gt=0),
+    limit: int = Query(50, ge=1, le=1000),
+):
+    """Recent expenses far above or below their category's usual amount."""
+    return analytics.anomalies(
+        analytics.current(), category, days, threshold, limit=limit
+    )
 
 
 @router.post("/semantic-search/")
-def search_expenses(query: str):
-    retriever = vectorstore.as_retriever()
-    qa = RetrievalQA.from_chain_type(
-        # llm=ChatOllama(model="llama3.1:8b"),
-        llm=ChatOllama(model="phi3:mini"),  # Use a smaller model for testing
-        retriever=retriever,
+async def search_expenses(
+    request: Request,
+    query: str,
+    role: Optional[Literal["user", "ai"]] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+):
+    """Answer from stored conversations, optionally pre-filtered by speaker
+    role and conversation date."""
+    search_filter = vector_index.metadata_filter(
+        role=role, start_date=start_date, end_date=end_date
     )
-    answer = qa.run(query)
+    with llm_scheduler.admission("bulk", disconnected=request.is_disconnected):
+        answer = await semantic_search.aanswer(query, search_filter)
     return {"response": answer}
 
 
+@router.get("/jobs/status")
+def jobs_status(failures: int = Query(10, ge=0, le=100)):
+    """Background job counts per kind and status, and recent failures."""
+    return jobs.status(failures)
+
+
+@router.get("/jobs/{job_id}")
+def job_detail(job_id: int):
+    job = jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/metrics")
+def prometheus_metrics():
+    """Request, LLM, database and embedding metrics in Prometheus text format."""
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@router.get("/debug/startup")
+def debug_startup(request: Request):
+    """Duration of each startup and warm-up step, in milliseconds."""
+    return getattr(request.app.state, "startup", None)
+
+
+@router.get("/debug/semantic-cache")
+def debug_semantic_cache():
+    """Hit/miss counters of the semantic search answer cache."""
+    return semantic_search.stats()
+
+
+@router.get("/debug/db-pool")
+def debug_db_pool():
+    """Connection pool usage and checkout wait times."""
+    return pool_status()
+
+
+@router.get("/debug/intent-router")
+def debug_intent_router():
+    """Messages per intent route and agent runs avoided by the fast path."""
+    return intent_router.stats.snapshot()
+
+
+@router.get("/debug/chat-sessions")
+def debug_chat_sessions():
+    """Size and eviction counters of the per-session chat histories."""
+    return session_histories.stats()
+
+
+@router.get("/debug/vector-index")
+def debug_vector_index():
+    """ANN index configuration and search tunables in effect."""
+    local_store = get_local_store()
+    return {
+        "type": vector_index.VECTOR_INDEX_TYPE,
+        "hnsw": {
+            "m": vector_index.HNSW_M,
+            "ef_construction": vector_index.HNSW_EF_CONSTRUCTION,
+        },
+        "search": vector_index.search_settings(),
+        "local_index": local_store.stats() if local_store else None,
+    }
+
+
+@router.get("/debug/llm-cache")
+def debug_llm_cache():
+    """Mode, size and stored hit count of the LLM completion cache."""
+    return llm_cache.stats()
+
+
+@router.get("/debug/analytics")
+def debug_analytics():
+    """Size and freshness of the in-memory analytics copy."""
+    return analytics.get_columns().stats()
+
+
+@router.get("/debug/llm-scheduler")
+def debug_llm_scheduler():
+    """LLM admission control: slots in use, queue depth and decisions."""
+    return llm_scheduler.scheduler.stats()
+
+
+@router.get("/debug/embedding-cache")
+def debug_embedding_cache():
+    """Hit/miss counters and size of the shared embedding cache."""
+    return embedding.stats()
+
+
 @router.post("/debug/parse-expense")
 def debug_parse_expense(request: ChatExpenseRequest):
     """Debug endpoint for testing expense extraction."""
     try:
-        parsed = extract_expense(request.text)
+        expenses = extract_expenses(request.text)
         return {
             "input": request.text,
-            "parsed": parsed,
-            "success": parsed is not None and "amount" in parsed,
+            "parsed": expenses[0] if expenses else None,
+            "expenses": expenses,
+            "success": bool(expenses),
         }
     except Exception as e:
         return {"input": request.text, "error": str(e), "success": False}
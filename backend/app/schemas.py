@@ -1,6 +1,6 @@
 from pydantic import BaseModel, ConfigDict
 from datetime import datetime
-from typing import Optional
+from typing import Any, List, Literal, Optional
 from datetime import date
 
 
@@ -19,8 +19,44 @@ class ExpenseQuery(BaseModel):
 
 class ExpenseOut(ExpenseCreate):
     id: int
-    date: datetime
+    # Required, but the column is nullable
+    date: Optional[datetime]
 
     model_config = ConfigDict(
         from_attributes=True,
     )
+
+
+class BatchRowError(BaseModel):
+    index: int
+    errors: List[Any]
+
+
+class ExpenseBatchResult(BaseModel):
+    ids: List[int]
+    errors: List[BatchRowError]
+
+
+class RollupBucket(BaseModel):
+    bucket_start: date
+    category: str
+    total: float
+    count: int
+    min_amount: float
+    max_amount: float
+
+    model_config = ConfigDict(
+        from_attributes=True,
+    )
+
+
+class ExpenseSummary(BaseModel):
+    granularity: Literal["day", "week", "month"]
+    start_date: date
+    end_date: date
+    category: Optional[str] = None
+    total: float
+    count: int
+    min_amount: Optional[float] = None
+    max_amount: Optional[float] = None
+    buckets: List[RollupBucket]
@@ -0,0 +1,77 @@
+"""
+Cached RetrievalQA pipeline behind POST /semantic-search/.
+
+The chain is built once and reused. Answers are cached on the normalized
+query plus the memory data version, so newly stored conversations
+invalidate them; identical queries that arrive while one is in flight
+share its LLM call instead of starting their own. The shared call ignores
+client disconnects, so one caller going away does not cancel it for the
+others.
+"""
+
+from functools import lru_cache
+from typing import Any, Dict, Optional
+import json
+import logging
+import os
+
+from langchain.chains import RetrievalQA
+
+from . import llm_scheduler
+from .cache import AsyncSingleFlight, TTLCache
+from .data_version import MEMORY, acurrent_version
+from .llm_cache import chat_ollama
+from .memory import get_async_search_store
+
+logger = logging.getLogger("semantic_search")
+
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "256"))
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", "300"))
+
+answer_cache = TTLCache(maxsize=SEMANTIC_CACHE_SIZE, ttl=SEMANTIC_CACHE_TTL)
+in_flight = AsyncSingleFlight()
+
+
+@lru_cache(maxsize=64)
+def get_qa_chain(filter_key: str = "") -> RetrievalQA:
+    """Chain whose retriever pre-filters on the JSON-encoded metadata filter."""
+    logger.info(f"Building semantic search chain {filter_key}".rstrip())
+    if filter_key:
+        retriever = get_async_search_store(filtered=True).as_retriever(
+            search_kwargs={"filter": json.loads(filter_key)}
+        )
+    else:
+        retriever = get_async_search_store().as_retriever()
+    return RetrievalQA.from_chain_type(
+        # llm=chat_ollama("llama3.1:8b"),
+        # Use a smaller model for testing; temperature 0 makes answers cacheable
+        llm=chat_ollama("phi3:mini", temperature=0),
+        retriever=retriever,
+    )
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split()).rstrip("?.! ")
+
+
+async def aanswer(query: str, filter: Optional[Dict[str, Any]] = None) -> str:
+    """Answer a question, serving repeats from the cache."""
+    filter_key = json.dumps(filter, sort_keys=True) if filter else ""
+    key = (normalize_query(query), filter_key, await acurrent_version(MEMORY))
+    cached = answer_cache.get(key)
+    if cached is not None:
+        logger.debug(f"Semantic search cache hit for: {key[0][:50]}")
+        return cached
+
+    async def run() -> str:
+        chain = get_qa_chain(filter_key)
+        with llm_scheduler.shared():
+            result = (await chain.ainvoke({"query": query}))["result"]
+        answer_cache.set(key, result)
+        return result
+
+    return await in_flight.do(key, run)
+
+
+def stats():
+    return {**answer_cache.stats(), "coalesced": in_flight.coalesced}
@@ -0,0 +1,70 @@
+"""
+ORM-free JSON encoding for bulk expense reads.
+
+GET /expenses selects EXPENSE_COLUMNS as plain row tuples and encodes them
+straight to JSON bytes: no ORM instances or identity map, and no Pydantic
+validation per row. The bytes are the same FastAPI would produce through
+`response_model=schemas.ExpenseOut` (same keys in the same order, floats
+as floats, ISO datetimes with a Z suffix for UTC); the columns are derived
+from ExpenseOut's fields so the two cannot drift apart, and
+tests/test_serialization.py checks the bytes against ExpenseOut while
+benchmarks/bench_read_path.py times both paths.
+
+Uses orjson when it is installed and the standard library otherwise.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, Iterable, Sequence
+import json
+
+from . import schemas
+from .models import Expense
+
+try:
+    import orjson
+except ImportError:  # optional; stdlib json is slower but equivalent
+    orjson = None
+
+# ExpenseOut's field order is the JSON key order
+FIELDS = tuple(schemas.ExpenseOut.model_fields)
+EXPENSE_COLUMNS = tuple(Expense.__table__.c[name] for name in FIELDS)
+
+if orjson is not None:
+    # Pydantic writes UTC offsets as "Z"
+    _OPTIONS = orjson.OPT_UTC_Z
+
+    def _dumps(value: Any) -> bytes:
+        return orjson.dumps(value, option=_OPTIONS)
+
+    def _dumps_line(value: Any) -> bytes:
+        return orjson.dumps(value, option=_OPTIONS | orjson.OPT_APPEND_NEWLINE)
+
+else:
+
+    def _default(value: Any) -> str:
+        if isinstance(value, datetime):
+            text = value.isoformat()
+            return text[:-6] + "Z" if text.endswith("+00:00") else text
+        raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+    def _dumps(value: Any) -> bytes:
+        return json.dumps(
+            value, separators=(",", ":"), ensure_ascii=False, default=_default
+        ).encode()
+
+    def _dumps_line(value: Any) -> bytes:
+        return _dumps(value) + b"\n"
+
+
+def expense_dicts(rows: Iterable[Sequence[Any]]) -> list[Dict[str, Any]]:
+    return [dict(zip(FIELDS, row)) for row in rows]
+
+
+def encode_expenses(rows: Iterable[Sequence[Any]]) -> bytes:
+    """JSON array of ExpenseOut objects for EXPENSE_COLUMNS rows."""
+    return _dumps(expense_dicts(rows))
+
+
+def encode_expense_lines(rows: Iterable[Sequence[Any]]) -> bytes:
+    """NDJSON: one ExpenseOut object per line."""
+    return b"".join(_dumps_line(dict(zip(FIELDS, row))) for row in rows)
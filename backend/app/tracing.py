@@ -0,0 +1,213 @@
+"""
+Per-request stage timings and sampled LLM prompt/response tracing.
+
+`trace()` opens a request-scoped Trace (held in a context variable, so it
+follows the request across awaits and LangChain's executor threads).
+`stage()` times a block into the trace and the stage histogram, and
+`TracingCallbackHandler` records each LLM and tool call. When the trace
+closes, one structured log line carries all timings. Full prompts and
+completions are only logged for a TRACE_SAMPLE_RATE fraction of requests,
+truncated to TRACE_MAX_CHARS.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+import logging
+import os
+import random
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from . import metrics
+
+logger = logging.getLogger("tracing")
+
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+TRACE_MAX_CHARS = int(os.getenv("TRACE_MAX_CHARS", "2000"))
+
+
+def truncate(text: Any, limit: int = TRACE_MAX_CHARS) -> str:
+    text = str(text)
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}... [{len(text) - limit} more chars]"
+
+
+class Trace:
+    def __init__(self, name: str, sampled: bool, **fields):
+        self.name = name
+        self.fields = fields
+        self.sampled = sampled
+        self.started = time.perf_counter()
+        self.stages: List[Dict[str, Any]] = []
+        self.llm_calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def add(self, stage: str, seconds: float, **fields) -> None:
+        self.stages.append({"stage": stage, "ms": round(seconds * 1000, 2), **fields})
+
+
+_current: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+
+
+def current() -> Optional[Trace]:
+    return _current.get()
+
+
+@contextmanager
+def trace(name: str, **fields):
+    """Collect stage timings for one request and log them when it ends."""
+    current_trace = Trace(name, random.random() < TRACE_SAMPLE_RATE, **fields)
+    previous = _current.get()
+    _current.set(current_trace)
+    try:
+        yield current_trace
+    finally:
+        # set() rather than reset(): a streaming generator may be closed
+        # from a different context than the one it started in
+        _current.set(previous)
+        if current_trace.llm_calls:
+            metrics.agent_iterations.observe(current_trace.llm_calls)
+        logger.info(
+            f"{name} finished",
+            extra={
+                **current_trace.fields,
+                "trace": name,
+                "total_ms": round(
+                    (time.perf_counter() - current_trace.started) * 1000, 2
+                ),
+                "stages": current_trace.stages,
+                "llm_calls": current_trace.llm_calls,
+                "prompt_tokens": current_trace.prompt_tokens,
+                "completion_tokens": current_trace.completion_tokens,
+            },
+        )
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block into the current trace and the stage histogram."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.stage_duration.observe(elapsed, stage=name)
+        current_trace = _current.get()
+        if current_trace is not None:
+            current_trace.add(name, elapsed)
+
+
+def _token_counts(response) -> tuple:
+    prompt = completion = 0
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(
+                getattr(generation, "message", None), "usage_metadata", None
+            )
+            info = generation.generation_info or {}
+            if usage:
+                prompt += usage.get("input_tokens", 0)
+                completion += usage.get("output_tokens", 0)
+            else:
+                prompt += info.get("prompt_eval_count") or 0
+                completion += info.get("eval_count") or 0
+    return prompt, completion
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """Times LLM and tool calls; logs prompts and outputs for sampled traces."""
+
+    # Bookkeeping only, so run on the caller's thread instead of an executor
+    run_inline = True
+
+    def __init__(self):
+        self._runs: Dict[Any, tuple] = {}
+
+    def _sampled(self) -> bool:
+        current_trace = _current.get()
+        if current_trace is None:
+            return random.random() < TRACE_SAMPLE_RATE
+        return current_trace.sampled
+
+    def _start(self, run_id, label: str, prompt: Any) -> None:
+        self._runs[run_id] = (time.perf_counter(), label)
+        if self._sampled():
+            logger.info(
+                "llm prompt",
+                extra={"model": label, "prompt": truncate(prompt), "run_id": run_id},
+            )
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id, self._model(kwargs), prompts[0] if prompts else "")
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        prompt = "\n".join(f"{m.type}: {m.content}" for m in messages[0])
+        self._start(run_id, self._model(kwargs), prompt)
+
+    @staticmethod
+    def _model(kwargs) -> str:
+        metadata = kwargs.get("metadata") or {}
+        params = kwargs.get("invocation_params") or {}
+        return metadata.get("ls_model_name") or params.get("model") or "unknown"
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        started, model = self._runs.pop(run_id, (None, "unknown"))
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        prompt_tokens, completion_tokens = _token_counts(response)
+        metrics.llm_call_duration.observe(elapsed, model=model)
+        metrics.llm_tokens.inc(prompt_tokens, model=model, kind="prompt")
+        metrics.llm_tokens.inc(completion_tokens, model=model, kind="completion")
+
+        current_trace = _current.get()
+        if current_trace is not None:
+            current_trace.llm_calls += 1
+            current_trace.prompt_tokens += prompt_tokens
+            current_trace.completion_tokens += completion_tokens
+            current_trace.add(
+                f"llm:{current_trace.llm_calls}",
+                elapsed,
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+            )
+        if self._sampled() and response.generations:
+            logger.info(
+                "llm response",
+                extra={
+                    "model": model,
+                    "response": truncate(response.generations[0][0].text),
+                    "run_id": run_id,
+                },
+            )
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._runs.pop(run_id, None)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self._runs[run_id] = (time.perf_counter(), serialized.get("name", "tool"))
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        started, tool = self._runs.pop(run_id, (None, "tool"))
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        metrics.tool_duration.observe(elapsed, tool=tool)
+        current_trace = _current.get()
+        if current_trace is not None:
+            current_trace.add(f"tool:{tool}", elapsed)
+        if self._sampled():
+            logger.info(
+                "tool output",
+                extra={"tool": tool, "output": truncate(output), "run_id": run_id},
+            )
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._runs.pop(run_id, None)
+
+
+tracing_callbacks = [TracingCallbackHandler()]
@@ -0,0 +1,332 @@
+"""
+ANN index management for the PGVector collections.
+
+Both collections live in langchain_pg_embedding. Each one gets its own
+partial HNSW (default) or IVFFlat index so a search never walks the other
+collection's vectors, and the pgvector search tunables are applied to every
+pooled connection. `ensure_vector_indexes` is idempotent: it creates
+missing indexes, swaps the index kind when VECTOR_INDEX_TYPE changes, and
+rebuilds IVFFlat indexes whose list count no longer fits the row count or
+whose dimension no longer matches the collection's vectors.
+
+The embedding column is left without a declared dimension, so changing
+EMBEDDING_MODEL never breaks inserts. Indexes are built on an expression
+that casts vectors of the collection's dimension to vector(N), or to
+halfvec(N) above pgvector's 2000-dimension vector index limit, and is NULL
+(not indexed) for any other width; IndexedPGVector orders searches by the
+same expression so the planner can use the index.
+
+    python -m app.vector_index [--rebuild]
+"""
+
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+import argparse
+import logging
+import math
+import os
+
+from langchain_postgres import PGVector
+from langchain_postgres.vectorstores import DistanceStrategy
+from pgvector.sqlalchemy import HALFVEC, VECTOR
+from sqlalchemy import case, cast, event, func, literal_column
+
+from .database import async_engine, engine
+
+logger = logging.getLogger("vector_index")
+
+VECTOR_INDEX_TYPE = os.getenv("VECTOR_INDEX_TYPE", "hnsw")  # hnsw | ivfflat | none
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "64"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "40"))
+IVFFLAT_LISTS = int(os.getenv("IVFFLAT_LISTS", "0"))  # 0 = derive from rows
+IVFFLAT_PROBES = int(os.getenv("IVFFLAT_PROBES", "10"))
+# pgvector >= 0.8 keeps scanning the index until filtered searches have k rows
+VECTOR_ITERATIVE_SCAN = os.getenv("VECTOR_ITERATIVE_SCAN", "relaxed_order")
+
+COLLECTIONS = ("expense_embeddings", "memory_store")
+INDEX_KINDS = ("hnsw", "ivfflat")
+TABLE = "langchain_pg_embedding"
+# Widest vectors pgvector's HNSW and IVFFlat indexes accept, by storage type
+MAX_INDEX_DIMS = {"vector": 2000, "halfvec": 4000}
+STORAGE_TYPES = {"vector": VECTOR, "halfvec": HALFVEC}
+
+
+def ivfflat_lists(rows: int) -> int:
+    """pgvector's guidance: rows / 1000 up to 1M rows, sqrt(rows) beyond."""
+    if IVFFLAT_LISTS:
+        return IVFFLAT_LISTS
+    if rows <= 1_000_000:
+        return max(rows // 1000, 1)
+    return int(math.sqrt(rows))
+
+
+def index_storage(dims: int) -> Optional[str]:
+    """vector, halfvec (pgvector >= 0.7) or None when `dims` is too wide to index."""
+    if dims <= MAX_INDEX_DIMS["vector"]:
+        return "vector"
+    halfvec = _pgvector_version is not None and _pgvector_version >= (0, 7)
+    if halfvec and dims <= MAX_INDEX_DIMS["halfvec"]:
+        return "halfvec"
+    return None
+
+
+def embedding_expression(dims: int, storage: str) -> str:
+    """SQL of the indexed expression; keep in step with `_embedding_expression`."""
+    typed = f"{storage}({dims})"
+    return (
+        f"(CASE WHEN vector_dims(embedding) = {dims} "
+        f"THEN embedding::{typed} END)::{typed}"
+    )
+
+
+def index_ddl(
+    name: str,
+    table: str,
+    kind: str,
+    rows: int = 0,
+    where: Optional[str] = None,
+    concurrently: bool = False,
+    dims: Optional[int] = None,
+    storage: str = "vector",
+) -> str:
+    """CREATE INDEX statement for an HNSW or IVFFlat cosine index on
+    `embedding`, or on `embedding_expression(dims, storage)` when `dims`
+    is given (the column itself then needs no declared dimension)."""
+    if kind == "hnsw":
+        options = f"m = {HNSW_M}, ef_construction = {HNSW_EF_CONSTRUCTION}"
+    elif kind == "ivfflat":
+        options = f"lists = {ivfflat_lists(rows)}"
+    else:
+        raise ValueError(f"index kind must be one of {INDEX_KINDS}")
+    column = f"({embedding_expression(dims, storage)})" if dims else "embedding"
+    return (
+        f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}IF NOT EXISTS {name} "
+        f"ON {table} USING {kind} ({column} {storage}_cosine_ops) WITH ({options})"
+        + (f" WHERE {where}" if where else "")
+    )
+
+
+_pgvector_version: Optional[Tuple[int, ...]] = None
+
+
+def _load_version(cursor) -> Optional[Tuple[int, ...]]:
+    global _pgvector_version
+    if _pgvector_version is None:
+        cursor.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+        row = cursor.fetchone()
+        if row is not None:
+            _pgvector_version = tuple(int(p) for p in row[0].split(".")[:2])
+    return _pgvector_version
+
+
+def _supports_iterative_scan(cursor) -> bool:
+    version = _load_version(cursor)
+    return version is not None and version >= (0, 8) and VECTOR_ITERATIVE_SCAN != "off"
+
+
+def search_settings() -> Dict[str, Any]:
+    settings: Dict[str, Any] = {
+        "hnsw.ef_search": HNSW_EF_SEARCH,
+        "ivfflat.probes": IVFFLAT_PROBES,
+    }
+    if _pgvector_version and _pgvector_version >= (0, 8):
+        settings["hnsw.iterative_scan"] = VECTOR_ITERATIVE_SCAN
+        settings["ivfflat.iterative_scan"] = VECTOR_ITERATIVE_SCAN
+    return settings
+
+
+def _apply_search_settings(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    _supports_iterative_scan(cursor)
+    for name, value in search_settings().items():
+        cursor.execute(f"SET {name} = '{value}'")
+    cursor.close()
+    # Outside a committed transaction the pool's reset would undo the SETs
+    dbapi_connection.commit()
+
+
+for _pool in (engine.pool, async_engine.sync_engine.pool):
+    event.listen(_pool, "connect", _apply_search_settings)
+
+
+def _prefilter(conn) -> None:
+    # Without iterative scans an ANN index returns at most ef_search (or
+    # probes' worth of) candidates before the metadata filter runs, so a
+    # selective filter can come back empty. Scan the filtered rows exactly.
+    cursor = conn.connection.cursor()
+    try:
+        exact = not _supports_iterative_scan(cursor)
+    finally:
+        cursor.close()
+    if exact:
+        conn.exec_driver_sql("SET LOCAL enable_indexscan = off")
+
+
+def filtered(bind):
+    """View of `bind` (an Engine or AsyncEngine) for metadata-filtered searches."""
+    view = bind.execution_options()
+    event.listen(getattr(view, "sync_engine", view), "begin", _prefilter)
+    return view
+
+
+def _index_name(collection: str, kind: str) -> str:
+    return f"ix_{TABLE}_{collection}_{kind}"
+
+
+def _collection_dims(conn, where: str) -> Optional[int]:
+    dims = list(
+        conn.exec_driver_sql(
+            f"SELECT DISTINCT vector_dims(embedding) FROM {TABLE} WHERE {where}"
+        ).scalars()
+    )
+    return dims[0] if len(dims) == 1 else None
+
+
+def _existing_indexes(conn) -> Dict[str, Tuple[List[str], str]]:
+    """Index name -> (reloptions, definition)."""
+    rows = conn.exec_driver_sql(
+        "SELECT c.relname, coalesce(c.reloptions, '{}'), pg_get_indexdef(c.oid) "
+        "FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid "
+        f"WHERE i.indrelid = '{TABLE}'::regclass"
+    ).all()
+    return {name: (list(options), definition) for name, options, definition in rows}
+
+
+def ensure_vector_indexes(rebuild: bool = False) -> Dict[str, str]:
+    """Create, swap or rebuild the per-collection ANN indexes. Returns actions."""
+    actions: Dict[str, str] = {}
+    if VECTOR_INDEX_TYPE == "none":
+        return actions
+    if VECTOR_INDEX_TYPE not in INDEX_KINDS:
+        raise ValueError(f"VECTOR_INDEX_TYPE must be one of {INDEX_KINDS} or none")
+
+    # CONCURRENTLY keeps the collections writable but cannot run in a transaction
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if conn.exec_driver_sql(f"SELECT to_regclass('{TABLE}')").scalar() is None:
+            return actions
+        _load_version(conn.connection.cursor())
+
+        existing = _existing_indexes(conn)
+        collections = conn.exec_driver_sql(
+            "SELECT name, uuid FROM langchain_pg_collection WHERE name = ANY(%s)",
+            (list(COLLECTIONS),),
+        ).all()
+        for collection, uuid in collections:
+            name = _index_name(collection, VECTOR_INDEX_TYPE)
+            where = f"collection_id = '{uuid}'"
+            rows = conn.exec_driver_sql(
+                f"SELECT count(*) FROM {TABLE} WHERE {where}"
+            ).scalar()
+            stale = rebuild
+
+            dims = _collection_dims(conn, where)
+            storage = index_storage(dims) if dims else None
+            if storage is None:
+                if dims:
+                    reason = f"{dims}-dimension vectors are too wide to index"
+                    logger.warning(
+                        f"Not indexing {collection}: {reason} "
+                        f"(halfvec allows {MAX_INDEX_DIMS['halfvec']} "
+                        "on pgvector >= 0.7)"
+                    )
+                else:
+                    reason = "no vectors, or vectors of several dimensions"
+                actions[collection] = f"skipped: {reason}"
+                continue
+            for kind in INDEX_KINDS:
+                other = _index_name(collection, kind)
+                if kind != VECTOR_INDEX_TYPE and other in existing:
+                    conn.exec_driver_sql(f"DROP INDEX CONCURRENTLY IF EXISTS {other}")
+
+            if VECTOR_INDEX_TYPE == "ivfflat":
+                if rows == 0:
+                    # IVFFlat trains its lists on existing rows
+                    actions[collection] = "skipped: no vectors yet"
+                    continue
+                options = existing.get(name, ([], ""))[0]
+                built = [o for o in options if o.startswith("lists=")]
+                lists = int(built[0].split("=")[1]) if built else None
+                wanted = ivfflat_lists(rows)
+                if lists and not (wanted / 2 <= lists <= wanted * 2):
+                    logger.info(f"{name}: {rows} rows, lists {lists} -> {wanted}")
+                    stale = True
+
+            if name in existing and f"{storage}({dims})" not in existing[name][1]:
+                logger.info(f"{name}: vectors are now {storage}({dims})")
+                stale = True
+
+            if name in existing and not stale:
+                actions[collection] = "ok"
+                continue
+            if name in existing:
+                conn.exec_driver_sql(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+            logger.info(f"Building {VECTOR_INDEX_TYPE} index {name} over {rows} rows")
+            conn.exec_driver_sql(
+                index_ddl(
+                    name, TABLE, VECTOR_INDEX_TYPE, rows, where, True, dims, storage
+                )
+            )
+            actions[collection] = "rebuilt" if name in existing else "created"
+    return actions
+
+
+def _embedding_expression(column, dims: int, storage: str):
+    """`embedding_expression` as a SQLAlchemy expression over `column`."""
+    typed = STORAGE_TYPES[storage](dims)
+    # A literal, not a bound parameter, or the expression would not match
+    # the index's
+    same_width = func.vector_dims(column) == literal_column(str(int(dims)))
+    return cast(case((same_width, cast(column, typed))), typed)
+
+
+class IndexedPGVector(PGVector):
+    """PGVector whose cosine searches order by the indexed expression."""
+
+    @property
+    def distance_strategy(self) -> Any:
+        plain = super().distance_strategy
+        if self._distance_strategy != DistanceStrategy.COSINE:
+            return plain
+
+        def cosine_distance(query: List[float]):
+            storage = index_storage(len(query))
+            if storage is None:
+                return plain(query)
+            typed = STORAGE_TYPES[storage](len(query))
+            column = self.EmbeddingStore.embedding
+            return _embedding_expression(column, len(query), storage).cosine_distance(
+                cast(query, typed)
+            )
+
+        return cosine_distance
+
+
+def metadata_filter(
+    role: Optional[str] = None,
+    category: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+) -> Optional[Dict[str, Any]]:
+    """PGVector metadata filter. Dates are stored and compared as ISO strings."""
+    clauses = []
+    if role:
+        clauses.append({"role": {"$eq": role}})
+    if category:
+        clauses.append({"category": {"$eq": category}})
+    if start_date:
+        clauses.append({"date": {"$gte": str(start_date)}})
+    if end_date:
+        # Stored dates may carry a time, so bound by the start of the next day
+        clauses.append({"date": {"$lt": str(end_date + timedelta(days=1))}})
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build PGVector ANN indexes")
+    parser.add_argument("--rebuild", action="store_true")
+    args = parser.parse_args()
+    for collection, action in ensure_vector_indexes(args.rebuild).items():
+        print(f"✅ {collection}: {action}")
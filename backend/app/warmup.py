@@ -0,0 +1,88 @@
+"""
+Optional warm-up run by the API lifespan before it starts serving.
+
+With STARTUP_WARMUP=1 the first request does not pay for cold resources:
+both connection pools are primed with WARMUP_DB_CONNECTIONS connections,
+the vector stores, agent and chains are built, the analytics copy of the
+expenses is loaded, one memory search runs end to end, and the chat and embedding models are loaded into Ollama (kept
+resident for OLLAMA_KEEP_ALIVE). Every step fails soft: an error is
+logged and startup carries on.
+"""
+
+from contextlib import contextmanager
+from typing import Dict
+import logging
+import os
+import time
+
+from fastapi.concurrency import run_in_threadpool
+import ollama
+
+from . import analytics, memory, semantic_search
+from .database import async_engine, engine
+from .embedding_cache import embedding
+from .llm_agent import get_agent_executor, get_fixing_parser, get_llm
+from .llm_scheduler import OLLAMA_KEEP_ALIVE
+
+logger = logging.getLogger("warmup")
+
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "0") == "1"
+WARMUP_DB_CONNECTIONS = int(os.getenv("WARMUP_DB_CONNECTIONS", "4"))
+
+
+@contextmanager
+def step(timings: Dict[str, float], name: str, fatal: bool = False):
+    """Record how long a startup step took; log and swallow its errors."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        if fatal:
+            raise
+        logger.warning(f"Startup step {name} failed: {e}")
+    finally:
+        timings[name] = round((time.perf_counter() - started) * 1000, 2)
+
+
+def _prime_sync_pool(size: int) -> None:
+    # Hold the connections together so the pool really opens `size` of them
+    connections = [engine.connect() for _ in range(size)]
+    for connection in connections:
+        connection.exec_driver_sql("SELECT 1")
+        connection.close()
+
+
+async def _prime_async_pool(size: int) -> None:
+    connections = [await async_engine.connect() for _ in range(size)]
+    for connection in connections:
+        await connection.exec_driver_sql("SELECT 1")
+        await connection.close()
+
+
+def _build_chains() -> None:
+    get_agent_executor()
+    get_fixing_parser()
+    memory.get_chat_chain()
+    semantic_search.get_qa_chain()
+
+
+async def run(timings: Dict[str, float]) -> None:
+    """Run every warm-up step, adding its duration in ms to `timings`."""
+    with step(timings, "warmup_db_pools"):
+        await run_in_threadpool(_prime_sync_pool, WARMUP_DB_CONNECTIONS)
+        await _prime_async_pool(WARMUP_DB_CONNECTIONS)
+    with step(timings, "warmup_chat_model"):
+        # A generate request without a prompt only loads the model
+        await ollama.AsyncClient().generate(
+            model=get_llm().model, keep_alive=OLLAMA_KEEP_ALIVE
+        )
+    with step(timings, "warmup_embedding_model"):
+        # Straight to the model: a cache hit would not load it
+        await embedding.underlying.aembed_query("warm-up")
+    with step(timings, "warmup_chains"):
+        await run_in_threadpool(_build_chains)
+    with step(timings, "warmup_analytics"):
+        await run_in_threadpool(analytics.current)
+    with step(timings, "warmup_vector_stores"):
+        await run_in_threadpool(memory.get_search_store)
+        await memory.aquery_memory("warm-up", k=1)
@@ -0,0 +1 @@
+"""Benchmarks for the ZenSpend backend. Run modules with `python -m benchmarks.<name>`."""
@@ -0,0 +1,78 @@
+"""
+Compare ingestion throughput of POST /add-expense against POST /expenses/batch.
+
+Start the API first (`uvicorn app.main:app`), then run from backend/:
+
+    python -m benchmarks.bench_batch_insert --rows 5000 --single-rows 500
+"""
+
+import argparse
+import json
+import random
+import time
+from datetime import date, timedelta
+
+import httpx
+
+CATEGORIES = ["Food", "Groceries", "Transport", "Rent", "Shopping", "Utilities"]
+
+
+def make_rows(n: int, seed: int = 42):
+    rng = random.Random(seed)
+    start = date.today() - timedelta(days=30)
+    return [
+        {
+            "amount": round(rng.uniform(10, 5000), 2),
+            "category": rng.choice(CATEGORIES),
+            "date": str(start + timedelta(days=rng.randrange(30))),
+            "description": f"bench row {i}",
+        }
+        for i in range(n)
+    ]
+
+
+def bench_single(client: httpx.Client, rows) -> float:
+    started = time.perf_counter()
+    for row in rows:
+        client.post("/add-expense", json=row).raise_for_status()
+    return len(rows) / (time.perf_counter() - started)
+
+
+def bench_batch(client: httpx.Client, rows, ndjson: bool) -> float:
+    if ndjson:
+        body = "\n".join(json.dumps(row) for row in rows).encode()
+        headers = {"content-type": "application/x-ndjson"}
+    else:
+        body = json.dumps(rows).encode()
+        headers = {"content-type": "application/json"}
+
+    started = time.perf_counter()
+    res = client.post("/expenses/batch", content=body, headers=headers)
+    res.raise_for_status()
+    elapsed = time.perf_counter() - started
+
+    result = res.json()
+    if result["errors"]:
+        raise RuntimeError(f"Batch reported {len(result['errors'])} row errors")
+    return len(result["ids"]) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--single-rows", type=int, default=500)
+    parser.add_argument("--ndjson", action="store_true", help="Send NDJSON")
+    args = parser.parse_args()
+
+    with httpx.Client(base_url=args.url, timeout=300) as client:
+        single = bench_single(client, make_rows(args.single_rows, seed=1))
+        batch = bench_batch(client, make_rows(args.rows, seed=2), args.ndjson)
+
+    print(f"single-row /add-expense : {single:10.1f} rows/sec")
+    print(f"/expenses/batch         : {batch:10.1f} rows/sec")
+    print(f"speedup                 : {batch / single:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+HTTP load generator for the LLM and database endpoints.
+
+Run against the API backed by the fake Ollama server, e.g. from backend/:
+
+    python -m benchmarks.fake_ollama --latency 0.2 &
+    OLLAMA_HOST=http://127.0.0.1:11435 uvicorn app.main:app --port 8000 &
+    python -m benchmarks.bench_concurrency --concurrency 50 200
+
+Each of C clients sends --requests requests back to back; throughput is
+completed requests per second of wall time. `python -m benchmarks.suite`
+starts both servers itself and checks the results against thresholds.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+from .results import write
+
+ENDPOINTS = {
+    "root": ("GET", "/", None, None),
+    "add-expense": (
+        "POST",
+        "/add-expense",
+        {"amount": 250, "category": "food", "date": "2025-07-12"},
+        None,
+    ),
+    "expenses": ("GET", "/expenses", None, {"limit": 50}),
+    "ask": ("POST", "/ask", {"message": "I spent 500 on food yesterday"}, None),
+    "chat-expense": (
+        "POST",
+        "/chat-expense",
+        {"text": "Spent 250 on lunch on 12 July 2025"},
+        None,
+    ),
+    "semantic-search": (
+        "POST",
+        "/semantic-search/",
+        None,
+        {"query": "How much did I spend on food?"},
+    ),
+}
+
+
+def percentile(samples, pct: float) -> float:
+    if not samples:
+        return float("nan")
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_endpoint(url: str, name: str, concurrency: int, requests: int):
+    method, path, body, params = ENDPOINTS[name]
+    latencies = []
+    errors = 0
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=120, limits=limits) as client:
+
+        async def worker():
+            nonlocal errors
+            for _ in range(requests):
+                started = time.perf_counter()
+                try:
+                    res = await client.request(method, path, json=body, params=params)
+                    res.raise_for_status()
+                    latencies.append(time.perf_counter() - started)
+                except httpx.HTTPError:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "endpoint": name,
+        "concurrency": concurrency,
+        "ok": len(latencies),
+        "errors": errors,
+        "throughput_rps": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": (statistics.mean(latencies) * 1000) if latencies else float("nan"),
+    }
+
+
+def flatten(results) -> dict:
+    """`load.<endpoint>.c<concurrency>.<stat>` metrics for a results file."""
+    metrics = {}
+    for result in results:
+        prefix = f"load.{result['endpoint']}.c{result['concurrency']}"
+        for stat in ("throughput_rps", "p50_ms", "p99_ms", "errors"):
+            metrics[f"{prefix}.{stat}"] = result[stat]
+    return metrics
+
+
+async def main_async(args):
+    results = []
+    for concurrency in args.concurrency:
+        for name in args.endpoints:
+            result = await run_endpoint(args.url, name, concurrency, args.requests)
+            results.append(result)
+            print(
+                f"{name:16s} c={concurrency:<4d} "
+                f"{result['throughput_rps']:8.1f} req/s  "
+                f"p50={result['p50_ms']:8.1f}ms  p99={result['p99_ms']:8.1f}ms  "
+                f"errors={result['errors']}"
+            )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrency benchmark")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[50, 200])
+    parser.add_argument("--requests", type=int, default=5, help="Per client")
+    parser.add_argument(
+        "--endpoints", nargs="+", default=list(ENDPOINTS), choices=list(ENDPOINTS)
+    )
+    parser.add_argument("--output", help="Write metrics as JSON to this file")
+    args = parser.parse_args()
+    results = asyncio.run(main_async(args))
+    if args.output:
+        write(args.output, flatten(results), [])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Microbenchmarks for the CPU-bound helpers on the request path.
+
+Never calls a model or the database:
+
+    python -m benchmarks.bench_micro --seconds 1 --output micro.json
+"""
+
+from datetime import datetime
+from typing import Callable, Dict
+import argparse
+import json
+import time
+
+from app import schemas, serialization
+from app.llm_agent import _parse_flexible_input, extract_expense
+from app.utils import stringify_expense
+
+from .results import write
+
+EXPENSE_TEXTS = [
+    "I spent 500 on food yesterday",
+    "Add 2000 rupees for rent payment",
+    "Spent ₹1,250.50 on groceries on 26 July 2025",
+    "uber 1.5k last friday",
+    "bought a desk for $40 on July 4, 2025",
+]
+TOOL_INPUTS = [
+    '{"amount": 500, "category": "food", "date": "2025-07-26"}',
+    "amount=500, category=food, date=2025-07-26",
+    "500 on food yesterday",
+]
+EXPENSE = {
+    "id": 1,
+    "amount": 1250.5,
+    "category": "groceries",
+    "date": datetime(2025, 7, 26),
+    "description": "weekly groceries",
+}
+PAGE = [dict(EXPENSE, id=i) for i in range(100)]
+PAGE_ROWS = [tuple(row[field] for field in serialization.FIELDS) for row in PAGE]
+REQUEST_BODY = json.dumps(
+    {"amount": 1250.5, "category": "groceries", "date": "2025-07-26"}
+)
+
+
+def _cycle(func: Callable, inputs) -> Callable[[], None]:
+    def run():
+        for value in inputs:
+            func(value)
+
+    return run
+
+
+def _serialize_page():
+    json.dumps(
+        [schemas.ExpenseOut.model_validate(row).model_dump(mode="json") for row in PAGE]
+    )
+
+
+BENCHMARKS: Dict[str, tuple] = {
+    # name -> (callable, calls per invocation)
+    "extract_expense": (_cycle(extract_expense, EXPENSE_TEXTS), len(EXPENSE_TEXTS)),
+    "parse_flexible_input": (
+        _cycle(_parse_flexible_input, TOOL_INPUTS),
+        len(TOOL_INPUTS),
+    ),
+    "stringify_expense": (lambda: stringify_expense(EXPENSE), 1),
+    "parse_request": (
+        lambda: schemas.ExpenseCreate.model_validate_json(REQUEST_BODY),
+        1,
+    ),
+    "serialize_expense_page": (_serialize_page, 1),
+    "serialize_expense_page_fast": (
+        lambda: serialization.encode_expenses(PAGE_ROWS),
+        1,
+    ),
+}
+
+
+def bench(func: Callable[[], None], calls: int, seconds: float) -> Dict[str, float]:
+    func()  # warm up
+    done = 0
+    started = time.perf_counter()
+    deadline = started + seconds
+    while time.perf_counter() < deadline:
+        func()
+        done += calls
+    elapsed = time.perf_counter() - started
+    return {"ops_per_sec": done / elapsed, "us_per_op": elapsed / done * 1e6}
+
+
+def run(seconds: float, names=None) -> Dict[str, float]:
+    """Run the benchmarks and return flat `micro.<name>.<stat>` metrics."""
+    metrics = {}
+    for name, (func, calls) in BENCHMARKS.items():
+        if names and name not in names:
+            continue
+        result = bench(func, calls, seconds)
+        print(
+            f"{name:24s} {result['ops_per_sec']:12.0f} ops/s "
+            f"{result['us_per_op']:10.2f} us/op"
+        )
+        for stat, value in result.items():
+            metrics[f"micro.{name}.{stat}"] = value
+    return metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Request-path microbenchmarks")
+    parser.add_argument("--seconds", type=float, default=1.0, help="Per benchmark")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS))
+    parser.add_argument("--output", help="Write metrics as JSON to this file")
+    args = parser.parse_args()
+
+    metrics = run(args.seconds, args.only)
+    if args.output:
+        write(args.output, metrics, [])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Microbenchmark for the rule-based expense parser.
+
+    python -m benchmarks.bench_parser --seconds 2
+"""
+
+import argparse
+import time
+
+from app.expense_parser import ExpenseParser
+
+CORPUS = [
+    "I spent 500 on food yesterday",
+    "Show me my expenses from last week",
+    "Add 2000 rupees for rent payment",
+    "How much did I spend on groceries this month?",
+    "I paid 150 for coffee on Monday",
+    "Spent ₹1,250.50 on groceries on 26 July 2025",
+    "uber 1.5k last friday",
+    "bought a desk for $40 on July 4, 2025",
+    "3 days ago paid rs.300 for medicine",
+    "lunch 26/07/2025 450",
+    "hello there, how are you?",
+]
+
+
+def bench(parser: ExpenseParser, seconds: float) -> float:
+    parses = 0
+    deadline = time.perf_counter() + seconds
+    started = time.perf_counter()
+    while time.perf_counter() < deadline:
+        for text in CORPUS:
+            parser.parse(text)
+        parses += len(CORPUS)
+    return parses / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Expense parser microbenchmark")
+    parser.add_argument("--seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    engine = ExpenseParser()
+    build_ms = (time.perf_counter() - started) * 1000
+
+    print(f"parser build      : {build_ms:8.2f} ms")
+    print(f"parse throughput  : {bench(engine, args.seconds):8.0f} parses/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Range-query latency on the expenses table before and after the composite
+indexes and monthly partitioning.
+
+    python -m benchmarks.bench_partitions --rows 1000000 10000000 --output partitions.json
+
+For each row count it builds an `expenses` table in the scratch schema
+bench_partitions (never the real one) with rows spread over three years,
+and times three queries shaped like the API's:
+
+  month_total     count/sum over one month            (/expenses/summary)
+  category_month  one category over one month         (/expenses/query)
+  month_page      newest 50 rows of a month, by date  (GET /expenses)
+
+against three layouts, built one after another from the same rows:
+  baseline     primary key only, as create_all made it before migrations
+  indexed      after the migrations: (date, id) and (category, date)
+  partitioned  after app.partitions.convert
+The scratch schema is dropped afterwards. Needs DATABASE_URL; 10M rows
+take a few GB of disk and several minutes to load.
+"""
+
+from datetime import date, datetime, time as clock, timezone
+from typing import Dict, List
+import argparse
+import random
+import statistics
+import time
+
+from sqlalchemy import Connection
+
+from app import migrations, partitions
+from app.database import engine
+
+from .results import write
+
+SCHEMA = "bench_partitions"
+START = date(2023, 1, 1)
+MONTHS = 36
+CATEGORIES = [
+    "food",
+    "rent",
+    "travel",
+    "groceries",
+    "utilities",
+    "shopping",
+    "health",
+    "entertainment",
+    "education",
+    "transport",
+    "gifts",
+    "other",
+]
+
+CREATE_SQL = """
+CREATE TABLE expenses (
+    id SERIAL PRIMARY KEY,
+    amount FLOAT NOT NULL,
+    category VARCHAR NOT NULL,
+    description VARCHAR,
+    date TIMESTAMP WITH TIME ZONE DEFAULT now()
+);
+CREATE INDEX ix_expenses_id ON expenses (id);
+"""
+LOAD_SQL = f"""
+INSERT INTO expenses (amount, category, description, date)
+SELECT round((random() * 5000)::numeric, 2),
+       (%(categories)s::text[])[1 + i %% {len(CATEGORIES)}],
+       'benchmark row',
+       timestamptz '{START.isoformat()} 00:00:00+00'
+           + random() * interval '{MONTHS * 30} days'
+FROM generate_series(1, %(rows)s) AS i
+"""
+QUERIES = {
+    "month_total": (
+        "SELECT count(*), sum(amount) FROM expenses "
+        "WHERE date >= %(lower)s AND date < %(upper)s"
+    ),
+    "category_month": (
+        "SELECT count(*), sum(amount) FROM expenses "
+        "WHERE category = %(category)s AND date >= %(lower)s AND date < %(upper)s"
+    ),
+    "month_page": (
+        "SELECT id, amount, category, description, date FROM expenses "
+        "WHERE date >= %(lower)s AND date < %(upper)s "
+        "ORDER BY date DESC, id DESC LIMIT 50"
+    ),
+}
+
+
+def _vacuum(connection: Connection) -> None:
+    # VACUUM cannot run inside a transaction block
+    connection.commit()
+    connection.execution_options(isolation_level="AUTOCOMMIT")
+    connection.exec_driver_sql("VACUUM ANALYZE expenses")
+    connection.commit()
+    connection.execution_options(isolation_level="READ COMMITTED")
+
+
+def _utc(day: date) -> datetime:
+    # timestamptz bounds, so the planner prunes partitions (dates would only
+    # be pruned at executor start, after planning every partition)
+    return datetime.combine(day, clock.min, timezone.utc)
+
+
+def _parameters(rng: random.Random) -> dict:
+    month = partitions.month_start(START, rng.randrange(MONTHS - 1))
+    return {
+        "lower": _utc(month),
+        "upper": _utc(partitions.month_start(month, 1)),
+        "category": rng.choice(CATEGORIES),
+    }
+
+
+def measure(connection: Connection, repeats: int) -> Dict[str, Dict[str, float]]:
+    rng = random.Random(42)
+    results = {}
+    for name, sql in QUERIES.items():
+        connection.exec_driver_sql(sql, _parameters(rng)).all()  # warm up
+        timings = []
+        for _ in range(repeats):
+            parameters = _parameters(rng)
+            started = time.perf_counter()
+            connection.exec_driver_sql(sql, parameters).all()
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        results[name] = {
+            "p50_ms": statistics.median(timings),
+            "p95_ms": timings[int(len(timings) * 0.95) - 1],
+        }
+    connection.commit()
+    return results
+
+
+def run(row_counts: List[int], repeats: int = 20) -> Dict[str, float]:
+    metrics = {}
+    with engine.connect() as connection:
+        connection.exec_driver_sql(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        connection.exec_driver_sql(f"CREATE SCHEMA {SCHEMA}")
+        connection.exec_driver_sql(f"SET search_path TO {SCHEMA}")
+        connection.commit()
+        try:
+            for rows in row_counts:
+                connection.exec_driver_sql("DROP TABLE IF EXISTS expenses CASCADE")
+                connection.exec_driver_sql(CREATE_SQL)
+                started = time.perf_counter()
+                connection.exec_driver_sql(
+                    LOAD_SQL, {"rows": rows, "categories": CATEGORIES}
+                )
+                _vacuum(connection)
+                print(f"loaded {rows:,} rows in {time.perf_counter() - started:.1f} s")
+
+                layouts = {}
+                layouts["baseline"] = measure(connection, repeats)
+                for _, _, apply in migrations.MIGRATIONS:
+                    apply(connection)
+                _vacuum(connection)
+                layouts["indexed"] = measure(connection, repeats)
+                partitions.convert(connection)
+                _vacuum(connection)
+                layouts["partitioned"] = measure(connection, repeats)
+
+                for layout, results in layouts.items():
+                    for query, stats in results.items():
+                        print(
+                            f"{rows:>11,} {layout:12s} {query:15s} "
+                            f"p50={stats['p50_ms']:9.2f} ms  "
+                            f"p95={stats['p95_ms']:9.2f} ms"
+                        )
+                        for stat, value in stats.items():
+                            metrics[f"partitions.{rows}.{layout}.{query}.{stat}"] = (
+                                value
+                            )
+        finally:
+            connection.rollback()
+            connection.exec_driver_sql(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+            connection.exec_driver_sql("RESET search_path")
+            connection.commit()
+    return metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Expenses range-query benchmark")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    parser.add_argument("--repeats", type=int, default=20, help="Per query")
+    parser.add_argument("--output", help="Write metrics as JSON to this file")
+    args = parser.parse_args()
+
+    metrics = run(args.rows, args.repeats)
+    if args.output:
+        write(args.output, metrics, [])
+
+
+if __name__ == "__main__":
+    main()
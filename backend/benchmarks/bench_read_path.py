@@ -0,0 +1,167 @@
+"""
+GET /expenses page building: ORM + Pydantic against the ORM-free path.
+
+    python -m benchmarks.bench_read_path --pages 100 1000 10000 --output read.json
+
+Loads --rows synthetic expenses into the scratch schema bench_read_path
+(never the real table) and, for each page size, builds the newest page
+the way each path does:
+
+  orm   select(Expense) -> ORM instances -> ExpenseOut.model_validate
+        -> model_dump(mode="json") -> json.dumps  (the previous route)
+  fast  select(*EXPENSE_COLUMNS) -> row tuples -> serialization.encode_expenses
+
+Each page is built on a fresh Session, as in a request. Reports rows/sec
+and the peak memory traced (tracemalloc) while building one page, and
+checks that both paths produce the same JSON. The scratch schema is
+dropped afterwards. Needs DATABASE_URL.
+"""
+
+from typing import Callable, Dict, List
+import argparse
+import json
+import statistics
+import time
+import tracemalloc
+
+from sqlalchemy import Connection, select
+from sqlalchemy.orm import Session
+
+from app import models, schemas, serialization
+from app.database import engine
+
+from .results import write
+
+SCHEMA = "bench_read_path"
+
+CREATE_SQL = """
+CREATE TABLE expenses (
+    id SERIAL PRIMARY KEY,
+    amount FLOAT NOT NULL,
+    category VARCHAR NOT NULL,
+    description VARCHAR,
+    date TIMESTAMP WITH TIME ZONE DEFAULT now()
+);
+CREATE INDEX ix_expenses_date_id ON expenses (date, id);
+"""
+LOAD_SQL = """
+INSERT INTO expenses (amount, category, description, date)
+SELECT round((random() * 5000)::numeric, 2),
+       (ARRAY['food', 'rent', 'travel', 'groceries', 'utilities'])[1 + i %% 5],
+       CASE WHEN i %% 4 = 0 THEN NULL ELSE 'benchmark row ' || i END,
+       now() - random() * interval '365 days'
+FROM generate_series(1, %(rows)s) AS i
+"""
+
+
+def _order(stmt):
+    return stmt.order_by(models.Expense.date.desc(), models.Expense.id.desc())
+
+
+def orm_page(connection: Connection, size: int) -> bytes:
+    with Session(bind=connection) as db:
+        expenses = db.scalars(_order(select(models.Expense)).limit(size)).all()
+        return json.dumps(
+            [
+                schemas.ExpenseOut.model_validate(expense).model_dump(mode="json")
+                for expense in expenses
+            ],
+            ensure_ascii=False,
+            separators=(",", ":"),
+        ).encode()
+
+
+def fast_page(connection: Connection, size: int) -> bytes:
+    with Session(bind=connection) as db:
+        stmt = _order(select(*serialization.EXPENSE_COLUMNS)).limit(size)
+        return serialization.encode_expenses(db.execute(stmt).all())
+
+
+PATHS: Dict[str, Callable[[Connection, int], bytes]] = {
+    "orm": orm_page,
+    "fast": fast_page,
+}
+
+
+def measure(
+    build: Callable[[Connection, int], bytes],
+    connection: Connection,
+    size: int,
+    seconds: float,
+) -> Dict[str, float]:
+    build(connection, size)  # warm up
+    timings: List[float] = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline or len(timings) < 3:
+        started = time.perf_counter()
+        build(connection, size)
+        timings.append(time.perf_counter() - started)
+    tracemalloc.start()
+    try:
+        build(connection, size)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "rows_per_sec": size / statistics.median(timings),
+        "p50_ms": statistics.median(timings) * 1000,
+        "peak_kib": peak / 1024,
+    }
+
+
+def run(pages: List[int], rows: int, seconds: float) -> Dict[str, float]:
+    metrics = {}
+    with engine.connect() as connection:
+        connection.exec_driver_sql(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        connection.exec_driver_sql(f"CREATE SCHEMA {SCHEMA}")
+        connection.exec_driver_sql(f"SET search_path TO {SCHEMA}")
+        try:
+            connection.exec_driver_sql(CREATE_SQL)
+            connection.exec_driver_sql(LOAD_SQL, {"rows": max(rows, max(pages))})
+            connection.exec_driver_sql("ANALYZE expenses")
+            connection.commit()
+
+            for size in pages:
+                if orm_page(connection, size) != fast_page(connection, size):
+                    raise AssertionError(f"Paths disagree on a {size}-row page")
+                results = {
+                    name: measure(build, connection, size, seconds)
+                    for name, build in PATHS.items()
+                }
+                for name, stats in results.items():
+                    print(
+                        f"{size:>7,} rows {name:5s} "
+                        f"{stats['rows_per_sec']:>11,.0f} rows/s "
+                        f"p50={stats['p50_ms']:8.2f} ms "
+                        f"peak={stats['peak_kib']:9.1f} KiB"
+                    )
+                    for stat, value in stats.items():
+                        metrics[f"read_path.{size}.{name}.{stat}"] = value
+                speedup = (
+                    results["fast"]["rows_per_sec"] / results["orm"]["rows_per_sec"]
+                )
+                print(f"{size:>7,} rows speedup {speedup:.1f}x")
+                metrics[f"read_path.{size}.speedup"] = speedup
+        finally:
+            connection.rollback()
+            connection.exec_driver_sql(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+            connection.exec_driver_sql("RESET search_path")
+            connection.commit()
+    return metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Expense page building benchmark")
+    parser.add_argument("--pages", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--rows", type=int, default=20000, help="Rows to load")
+    parser.add_argument("--seconds", type=float, default=2.0, help="Per measurement")
+    parser.add_argument("--output", help="Write metrics as JSON to this file")
+    args = parser.parse_args()
+
+    metrics = run(args.pages, args.rows, args.seconds)
+    if args.output:
+        write(args.output, metrics, [])
+
+
+if __name__ == "__main__":
+    main()
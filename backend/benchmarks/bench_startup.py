@@ -0,0 +1,109 @@
+"""
+Cold-start benchmark: import time, time to ready and first-request latency.
+
+    python -m benchmarks.bench_startup --output startup.json
+
+Import time is measured in fresh interpreters with DATABASE_URL and
+OLLAMA_HOST pointing at servers that do not exist, which also checks
+that importing the app touches neither Postgres nor Ollama. Startup is then measured with
+and without STARTUP_WARMUP against the fake Ollama server. It reports
+the lifespan step durations, time until the first answered request, and
+the latency of the first and second /ask and /expenses requests.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from .results import write
+from .servers import servers
+
+IMPORT_SNIPPET = (
+    "import time; started = time.perf_counter(); import app.main; "
+    "print(time.perf_counter() - started)"
+)
+UNREACHABLE_DATABASE_URL = "postgresql://postgres:@/postgres?host=/nonexistent"
+UNREACHABLE_OLLAMA_HOST = "http://127.0.0.1:9"
+ASK = {"message": "Compare my food and travel spending and also suggest a budget"}
+
+
+def measure_import(runs: int) -> dict:
+    timings = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", IMPORT_SNIPPET],
+            env=dict(
+                os.environ,
+                DATABASE_URL=UNREACHABLE_DATABASE_URL,
+                OLLAMA_HOST=UNREACHABLE_OLLAMA_HOST,
+            ),
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            print(result.stderr.strip().splitlines()[-1])
+            return {"startup.import_without_services_ok": 0}
+        timings.append(float(result.stdout.strip().splitlines()[-1]))
+    median = statistics.median(timings) * 1000
+    print(f"import app.main        {median:8.1f} ms (median of {runs})")
+    return {"startup.import_without_services_ok": 1, "startup.import_ms": median}
+
+
+def _timed_request(client: httpx.Client, method: str, path: str, **kwargs) -> float:
+    started = time.perf_counter()
+    client.request(method, path, **kwargs).raise_for_status()
+    return (time.perf_counter() - started) * 1000
+
+
+def measure_serving(warmup: bool, llm_latency: float) -> dict:
+    prefix = f"startup.warmup{int(warmup)}"
+    metrics = {}
+    with servers(llm_latency, 0.005, STARTUP_WARMUP=str(int(warmup))) as running:
+        metrics[f"{prefix}.ready_ms"] = running.ready_seconds * 1000
+        with httpx.Client(base_url=running.url, timeout=120) as client:
+            for step, ms in (client.get("/debug/startup").json() or {}).items():
+                metrics[f"{prefix}.step.{step}_ms"] = ms
+            for attempt in ("first", "second"):
+                metrics[f"{prefix}.{attempt}_ask_ms"] = _timed_request(
+                    client, "POST", "/ask", json=ASK
+                )
+                metrics[f"{prefix}.{attempt}_expenses_ms"] = _timed_request(
+                    client, "GET", "/expenses", params={"limit": 50}
+                )
+
+    label = "with warm-up" if warmup else "no warm-up"
+    print(
+        f"{label:22s} ready={metrics[f'{prefix}.ready_ms']:8.1f} ms  "
+        f"first /ask={metrics[f'{prefix}.first_ask_ms']:8.1f} ms  "
+        f"second /ask={metrics[f'{prefix}.second_ask_ms']:8.1f} ms  "
+        f"first /expenses={metrics[f'{prefix}.first_expenses_ms']:6.1f} ms"
+    )
+    return metrics
+
+
+def run(import_runs: int = 3, llm_latency: float = 0.05) -> dict:
+    metrics = measure_import(import_runs)
+    for warmup in (False, True):
+        metrics.update(measure_serving(warmup, llm_latency))
+    return metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start benchmark")
+    parser.add_argument("--import-runs", type=int, default=3)
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--output", help="Write metrics as JSON to this file")
+    args = parser.parse_args()
+
+    metrics = run(args.import_runs, args.llm_latency)
+    if args.output:
+        write(args.output, metrics, [])
+
+
+if __name__ == "__main__":
+    main()
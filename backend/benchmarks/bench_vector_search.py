@@ -0,0 +1,145 @@
+"""
+Recall@k and latency of the PGVector ANN indexes against exact search.
+
+Loads clustered synthetic vectors into a scratch table, builds each index
+kind with the same DDL the service uses (app.vector_index), and compares
+ANN results with an exact sequential scan for every ef_search / probes
+value given:
+
+    python -m benchmarks.bench_vector_search --sizes 10000 100000 1000000
+"""
+
+import argparse
+import io
+import statistics
+import time
+
+import numpy as np
+
+from app import vector_index
+from app.database import engine
+
+TABLE = "bench_vectors"
+QUERY_SQL = f"SELECT id FROM {TABLE} ORDER BY embedding <=> %s::vector LIMIT %s"
+
+
+def percentile(samples, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def clustered(rng, n: int, centers: np.ndarray) -> np.ndarray:
+    labels = rng.integers(0, len(centers), n)
+    points = centers[labels] + rng.normal(0, 0.35, (n, centers.shape[1]))
+    return (points / np.linalg.norm(points, axis=1, keepdims=True)).astype(np.float32)
+
+
+def literal(vector: np.ndarray) -> str:
+    return "[" + ",".join(f"{v:.6f}" for v in vector) + "]"
+
+
+def load(cur, rng, size: int, centers: np.ndarray, chunk: int = 50_000) -> float:
+    started = time.perf_counter()
+    cur.execute(f"DROP TABLE IF EXISTS {TABLE}")
+    cur.execute(
+        f"CREATE UNLOGGED TABLE {TABLE} "
+        f"(id bigserial PRIMARY KEY, embedding vector({centers.shape[1]}))"
+    )
+    for offset in range(0, size, chunk):
+        rows = clustered(rng, min(chunk, size - offset), centers)
+        data = "".join(literal(row) + "\n" for row in rows)
+        copy_sql = f"COPY {TABLE} (embedding) FROM STDIN"
+        if hasattr(cur, "copy_expert"):  # psycopg2
+            cur.copy_expert(copy_sql, io.StringIO(data))
+        else:  # psycopg 3
+            with cur.copy(copy_sql) as copy:
+                copy.write(data)
+    cur.execute(f"ANALYZE {TABLE}")
+    return time.perf_counter() - started
+
+
+def search(cur, queries, k: int):
+    results, latencies = [], []
+    for query in queries:
+        started = time.perf_counter()
+        cur.execute(QUERY_SQL, (query, k))
+        results.append({row[0] for row in cur.fetchall()})
+        latencies.append(time.perf_counter() - started)
+    return results, latencies
+
+
+def report(label: str, latencies, recall=None):
+    line = (
+        f"  {label:26s} p50={percentile(latencies, 50) * 1000:8.2f}ms "
+        f"p99={percentile(latencies, 99) * 1000:8.2f}ms"
+    )
+    if recall is not None:
+        line += f"  recall@k={recall:.3f}"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PGVector ANN recall/latency")
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=64)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--index", nargs="+", default=list(vector_index.INDEX_KINDS))
+    parser.add_argument(
+        "--ef-search", type=int, nargs="+", default=[vector_index.HNSW_EF_SEARCH]
+    )
+    parser.add_argument(
+        "--probes", type=int, nargs="+", default=[vector_index.IVFFLAT_PROBES]
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    centers = rng.normal(0, 1, (args.clusters, args.dim))
+    queries = [literal(q) for q in clustered(rng, args.queries, centers)]
+
+    raw = engine.raw_connection()
+    raw.driver_connection.autocommit = True
+    cur = raw.cursor()
+    try:
+        for size in args.sizes:
+            print(
+                f"{size} vectors x {args.dim} dims "
+                f"(loaded in {load(cur, rng, size, centers):.1f}s)"
+            )
+
+            cur.execute("SET enable_indexscan = off")
+            truth, latencies = search(cur, queries, args.k)
+            cur.execute("RESET enable_indexscan")
+            report("exact (seq scan)", latencies)
+
+            for kind in args.index:
+                name = f"ix_{TABLE}_{kind}"
+                started = time.perf_counter()
+                cur.execute(vector_index.index_ddl(name, TABLE, kind, rows=size))
+                print(f"  {kind} built in {time.perf_counter() - started:.1f}s")
+
+                setting, values = (
+                    ("hnsw.ef_search", args.ef_search)
+                    if kind == "hnsw"
+                    else ("ivfflat.probes", args.probes)
+                )
+                for value in values:
+                    cur.execute(f"SET {setting} = {value}")
+                    found, latencies = search(cur, queries, args.k)
+                    recall = statistics.mean(
+                        len(f & t) / args.k for f, t in zip(found, truth)
+                    )
+                    report(f"{kind} {setting}={value}", latencies, recall)
+                cur.execute(f"DROP INDEX {name}")
+    finally:
+        cur.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        cur.close()
+        raw.close()
+
+
+if __name__ == "__main__":
+    main()
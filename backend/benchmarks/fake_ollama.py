@@ -0,0 +1,161 @@
+"""
+Deterministic local stand-in for the Ollama HTTP API.
+
+Serves /api/chat, /api/generate, /api/embed and /api/embeddings with a
+configurable latency so the backend can be load-tested without a GPU or a
+real model. Point the API at it with OLLAMA_HOST:
+
+    python -m benchmarks.fake_ollama --port 11435 --latency 0.2
+    OLLAMA_HOST=http://127.0.0.1:11435 uvicorn app.main:app
+"""
+
+from datetime import datetime, timezone
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+import uvicorn
+
+app = FastAPI(title="Fake Ollama")
+app.state.latency = 0.2
+app.state.token_latency = 0.0
+app.state.embed_latency = 0.01
+app.state.dim = 384
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def fake_embedding(text: str, dim: int) -> list:
+    """Unit-length pseudo-random vector seeded by the text."""
+    rng = random.Random(hashlib.sha256(text.encode()).digest())
+    vector = [rng.gauss(0, 1) for _ in range(dim)]
+    norm = sum(v * v for v in vector) ** 0.5
+    return [v / norm for v in vector]
+
+
+def fake_completion(prompt: str) -> str:
+    """A ReAct-compatible final answer that echoes the last user line."""
+    last_line = prompt.strip().splitlines()[-1] if prompt.strip() else ""
+    return (
+        "Thought: I now know the final answer\n"
+        f"Final Answer: Noted. You said: {last_line[:80]}"
+    )
+
+
+def _tokens(text: str):
+    words = text.split(" ")
+    return [w + (" " if i < len(words) - 1 else "") for i, w in enumerate(words)]
+
+
+async def _respond(body: dict, prompt: str, make_chunk):
+    content = fake_completion(prompt)
+    stats = {
+        "done_reason": "stop",
+        "total_duration": int(app.state.latency * 1e9),
+        "prompt_eval_count": len(prompt.split()),
+        "eval_count": len(content.split()),
+    }
+    await asyncio.sleep(app.state.latency)
+
+    if not body.get("stream", True):
+        return JSONResponse({**make_chunk(content), "done": True, **stats})
+
+    async def stream():
+        for token in _tokens(content):
+            if app.state.token_latency:
+                await asyncio.sleep(app.state.token_latency)
+            yield json.dumps({**make_chunk(token), "done": False}) + "\n"
+        yield json.dumps({**make_chunk(""), "done": True, **stats}) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@app.post("/api/chat")
+async def chat(request: Request):
+    body = await request.json()
+    messages = body.get("messages") or []
+    prompt = "\n".join(str(m.get("content", "")) for m in messages)
+    return await _respond(
+        body,
+        prompt,
+        lambda text: {
+            "model": body.get("model"),
+            "created_at": _now(),
+            "message": {"role": "assistant", "content": text},
+        },
+    )
+
+
+@app.post("/api/generate")
+async def generate(request: Request):
+    body = await request.json()
+    return await _respond(
+        body,
+        body.get("prompt", ""),
+        lambda text: {
+            "model": body.get("model"),
+            "created_at": _now(),
+            "response": text,
+        },
+    )
+
+
+@app.post("/api/embed")
+async def embed(request: Request):
+    body = await request.json()
+    inputs = body.get("input") or []
+    if isinstance(inputs, str):
+        inputs = [inputs]
+    await asyncio.sleep(app.state.embed_latency)
+    return {
+        "model": body.get("model"),
+        "embeddings": [fake_embedding(text, app.state.dim) for text in inputs],
+    }
+
+
+@app.post("/api/embeddings")
+async def embeddings(request: Request):
+    body = await request.json()
+    await asyncio.sleep(app.state.embed_latency)
+    return {"embedding": fake_embedding(body.get("prompt", ""), app.state.dim)}
+
+
+@app.get("/api/tags")
+async def tags():
+    return {"models": [{"name": "phi3:mini", "model": "phi3:mini"}]}
+
+
+@app.get("/api/version")
+async def version():
+    return {"version": "0.0.0-fake"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Ollama API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument(
+        "--latency", type=float, default=0.2, help="Seconds before a completion"
+    )
+    parser.add_argument(
+        "--token-latency", type=float, default=0.0, help="Seconds per streamed token"
+    )
+    parser.add_argument("--embed-latency", type=float, default=0.01)
+    parser.add_argument("--dim", type=int, default=384, help="Embedding dimensions")
+    args = parser.parse_args()
+
+    app.state.latency = args.latency
+    app.state.token_latency = args.token_latency
+    app.state.embed_latency = args.embed_latency
+    app.state.dim = args.dim
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
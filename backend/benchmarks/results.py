@@ -0,0 +1,78 @@
+"""
+Machine-readable benchmark results and regression thresholds.
+
+Every benchmark reports flat metric names such as
+`micro.extract_expense.ops_per_sec` or `load.ask.c10.p99_ms`. A results
+file is JSON with the run environment and those metrics; `check()`
+compares it against `thresholds.json`, where each metric has a `min`
+and/or `max` bound. Metrics missing from a run are skipped, so partial
+runs can still be checked.
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, List
+import json
+import os
+import platform
+import sys
+
+THRESHOLDS_FILE = os.path.join(os.path.dirname(__file__), "thresholds.json")
+
+
+def environment() -> Dict[str, str]:
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": str(os.cpu_count()),
+    }
+
+
+def write(path: str, metrics: Dict[str, float], failures: List[str]) -> None:
+    with open(path, "w") as f:
+        json.dump(
+            {
+                "environment": environment(),
+                "metrics": dict(sorted(metrics.items())),
+                "failures": failures,
+            },
+            f,
+            indent=2,
+        )
+        f.write("\n")
+
+
+def load_thresholds(path: str = THRESHOLDS_FILE) -> Dict[str, Dict[str, float]]:
+    with open(path) as f:
+        return json.load(f)
+
+
+def check(
+    metrics: Dict[str, float], thresholds: Dict[str, Dict[str, float]]
+) -> List[str]:
+    """Describe every metric outside its bounds."""
+    failures = []
+    for name, bounds in sorted(thresholds.items()):
+        value = metrics.get(name)
+        if value is None:
+            continue
+        if "min" in bounds and value < bounds["min"]:
+            failures.append(f"{name}={value:.2f} below min {bounds['min']}")
+        if "max" in bounds and value > bounds["max"]:
+            failures.append(f"{name}={value:.2f} above max {bounds['max']}")
+    return failures
+
+
+def main():
+    """Re-check an existing results file: python -m benchmarks.results FILE"""
+    with open(sys.argv[1]) as f:
+        metrics = json.load(f)["metrics"]
+    failures = check(metrics, load_thresholds())
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
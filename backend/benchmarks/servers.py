@@ -0,0 +1,89 @@
+"""
+Fake Ollama and API child processes for the HTTP benchmarks.
+"""
+
+from contextlib import contextmanager
+from types import SimpleNamespace
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(url: str, timeout: float, interval: float = 0.2) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(interval)
+    raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+
+
+@contextmanager
+def servers(llm_latency: float, embed_latency: float, **env_overrides):
+    """Run fake Ollama and the API as child processes for the duration.
+
+    Yields the API URL and how long the API took from launch to its first
+    answered request.
+    """
+    ollama_port, api_port = free_port(), free_port()
+    ollama_url = f"http://127.0.0.1:{ollama_port}"
+    api_url = f"http://127.0.0.1:{api_port}"
+    env = dict(
+        os.environ,
+        OLLAMA_HOST=ollama_url,
+        LOG_FILE="",
+        LOG_LEVEL="WARNING",
+        **env_overrides,
+    )
+    processes = [
+        subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "benchmarks.fake_ollama",
+                "--port",
+                str(ollama_port),
+                "--latency",
+                str(llm_latency),
+                "--embed-latency",
+                str(embed_latency),
+            ],
+            env=env,
+        )
+    ]
+    try:
+        wait_until_up(f"{ollama_url}/api/version", 30)
+        launched = time.perf_counter()
+        processes.append(
+            subprocess.Popen(
+                [
+                    sys.executable,
+                    "-m",
+                    "uvicorn",
+                    "app.main:app",
+                    "--port",
+                    str(api_port),
+                    "--log-level",
+                    "warning",
+                ],
+                env=env,
+            )
+        )
+        wait_until_up(f"{api_url}/", 120, interval=0.02)
+        yield SimpleNamespace(url=api_url, ready_seconds=time.perf_counter() - launched)
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            process.wait(timeout=30)
@@ -0,0 +1,61 @@
+"""
+Offline benchmark suite: microbenchmarks, an HTTP load test and a
+cold-start benchmark.
+
+Starts the fake Ollama server and the API on free local ports, so it runs
+on a laptop with no GPU, model or network; only DATABASE_URL must point
+at a Postgres with pgvector. From backend/:
+
+    python -m benchmarks.suite --output benchmark-results.json
+
+Writes every metric and the environment to the results file, compares
+them against benchmarks/thresholds.json and exits non-zero on a
+regression.
+"""
+
+import argparse
+import asyncio
+import sys
+
+from . import bench_concurrency, bench_micro, bench_startup
+from .results import THRESHOLDS_FILE, check, load_thresholds, write
+from .servers import servers
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark suite")
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--thresholds", default=THRESHOLDS_FILE)
+    parser.add_argument("--micro-seconds", type=float, default=1.0)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10])
+    parser.add_argument("--requests", type=int, default=20, help="Per client")
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--embed-latency", type=float, default=0.005)
+    parser.add_argument("--skip-load", action="store_true")
+    parser.add_argument("--skip-startup", action="store_true")
+    args = parser.parse_args()
+
+    metrics = bench_micro.run(args.micro_seconds)
+    if not args.skip_load:
+        with servers(args.llm_latency, args.embed_latency) as running:
+            load_args = argparse.Namespace(
+                url=running.url,
+                concurrency=args.concurrency,
+                requests=args.requests,
+                endpoints=list(bench_concurrency.ENDPOINTS),
+            )
+            results = asyncio.run(bench_concurrency.main_async(load_args))
+        metrics.update(bench_concurrency.flatten(results))
+    if not args.skip_startup:
+        metrics.update(bench_startup.run(llm_latency=args.llm_latency))
+
+    failures = check(metrics, load_thresholds(args.thresholds))
+    write(args.output, metrics, failures)
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    print(f"wrote {len(metrics)} metrics to {args.output}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
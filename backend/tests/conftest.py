@@ -0,0 +1,41 @@
+"""Shared fixtures. Run from backend/: python -m pytest"""
+
+from datetime import date
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# app.database needs a URL at import time; only the `db` fixture connects
+os.environ.setdefault(
+    "DATABASE_URL", "postgresql://postgres:@/postgres?host=/nonexistent"
+)
+
+# A Saturday
+TODAY = date(2026, 10, 17)
+
+
+@pytest.fixture
+def today():
+    return TODAY
+
+
+@pytest.fixture
+def db():
+    """Session on DATABASE_URL whose work is rolled back; skips without Postgres."""
+    from sqlalchemy.exc import OperationalError
+
+    from app.database import SessionLocal
+    from app.migrations import migrate
+
+    try:
+        migrate()
+    except OperationalError as e:
+        pytest.skip(f"Postgres not available: {e.orig}")
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.close()
@@ -0,0 +1,162 @@
+from datetime import date
+
+import pytest
+
+from app.expense_parser import UnsupportedCurrency, parser
+
+
+@pytest.mark.parametrize(
+    "text, amount, currency",
+    [
+        ("spent 500 on food", 500, "INR"),
+        ("₹1,25,000 for rent", 125000, "INR"),
+        ("2.5k on a new chair", 2500, "INR"),
+        ("uber 250 rs", 250, "INR"),
+        ("$40 on coffee", 40, "USD"),
+        ("12 euros for lunch", 12, "EUR"),
+        ("2 coffees for ₹100", 100, "INR"),
+    ],
+)
+def test_amount(text, amount, currency, today):
+    result = parser.parse(text, today)
+    assert result.amount == amount
+    assert result.currency == currency
+
+
+@pytest.mark.parametrize(
+    "text, amount",
+    [
+        ("2 coffees for 100", 100),
+        ("bought 2 chairs for 3000", 3000),
+        ("3 movies on 600", 600),
+        ("paid 500 for 2 tickets", 500),
+        ("uber 250 yesterday", 250),
+    ],
+)
+def test_leading_quantity_is_not_the_amount(text, amount, today):
+    assert parser.parse(text, today).amount == amount
+
+
+@pytest.mark.parametrize(
+    "text, expected, source",
+    [
+        ("500 on food on 26 July 2025", date(2025, 7, 26), "explicit"),
+        ("500 on food 2025-07-26", date(2025, 7, 26), "explicit"),
+        ("500 on food 05/08/2025", date(2025, 8, 5), "explicit"),
+        ("500 on food yesterday", date(2026, 10, 16), "relative"),
+        ("500 on food 3 days ago", date(2026, 10, 14), "relative"),
+        ("500 on food last Monday", date(2026, 10, 12), "relative"),
+        ("500 on food on Sunday", date(2026, 10, 11), "relative"),
+        ("500 on food last sat", date(2026, 10, 10), "relative"),
+        ("500 on food on wed", date(2026, 10, 14), "relative"),
+    ],
+)
+def test_date(text, expected, source, today):
+    result = parser.parse(text, today)
+    assert (result.date, result.date_source) == (expected, source)
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "I bought sun glasses for 1500",
+        "sat on a bus for 40",
+        "wed dress fitting 3000",
+        "500 for a mon cheri gift box",
+    ],
+)
+def test_weekday_abbreviations_need_a_prefix(text, today):
+    result = parser.parse(text, today)
+    assert (result.date, result.date_source) == (today, "default")
+
+
+def test_amount_inside_a_date_is_ignored(today):
+    result = parser.parse("on 26 July 2025 I paid 300 for fuel", today)
+    assert result.amount == 300
+    assert result.category == "Transport"
+
+
+def test_category_and_description(today):
+    expense = parser.parse("₹50 on chai", today).to_expense()
+    assert expense == {
+        "amount": 50,
+        "category": "Food",
+        "description": "Purchase of chai",
+        "date": "2026-10-17",
+    }
+
+
+@pytest.mark.parametrize(
+    "text, category, description",
+    [
+        ("bought chairs for 3000", "Furniture", "Purchase of chairs"),
+        ("2 coffees for 100", "Food", "Purchase of coffees"),
+        ("paid 200 for buses", "Transport", "Purchase of buses"),
+        ("3 movies for 600", "Entertainment", "Purchase of movies"),
+    ],
+)
+def test_plural_keywords(text, category, description, today):
+    expense = parser.parse(text, today).to_expense()
+    assert (expense["category"], expense["description"]) == (category, description)
+
+
+def test_unknown_category_is_miscellaneous(today):
+    assert parser.parse("paid 70 for stamps", today).to_expense()["category"] == (
+        "Miscellaneous"
+    )
+
+
+def test_other_currencies_are_not_recorded_as_rupees(today):
+    with pytest.raises(UnsupportedCurrency, match="USD 40.00"):
+        parser.parse("$40 on coffee", today).to_expense()
+
+
+def test_parse_many_splits_on_separators(today):
+    results = parser.parse_many("I spent ₹200 on groceries and ₹50 on chai", today)
+    assert [(r.amount, r.category) for r in results] == [
+        (200, "Groceries"),
+        (50, "Food"),
+    ]
+
+
+def test_parse_many_shares_a_date_mentioned_once(today):
+    results = parser.parse_many("rent 12,000; uber 250 plus movie 400 yesterday", today)
+    assert [r.amount for r in results] == [12000, 250, 400]
+    assert {r.date for r in results} == {date(2026, 10, 16)}
+
+
+def test_parse_many_keeps_each_items_own_date(today):
+    results = parser.parse_many("yesterday 200 on food, today 50 on taxi", today)
+    assert [r.date for r in results] == [date(2026, 10, 16), today]
+
+
+def test_parse_many_ignores_bare_counts_next_to_marked_amounts(today):
+    results = parser.parse_many("2 coffees for ₹100 and ₹50 on bus", today)
+    assert [r.amount for r in results] == [100, 50]
+
+
+def test_parse_many_needs_a_separator_between_amounts(today):
+    results = parser.parse_many("2 coffees for 100", today)
+    assert [r.amount for r in results] == [100]
+
+
+def test_parse_many_spans_point_into_the_whole_text(today):
+    text = "₹200 on groceries and ₹50 on chai"
+    second = parser.parse_many(text, today)[1]
+    start, end = second.spans["amount"]
+    assert text[start:end] == "₹50"
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("this month", (date(2026, 10, 1), date(2026, 10, 17))),
+        ("last month", (date(2026, 9, 1), date(2026, 9, 30))),
+        ("last week", (date(2026, 10, 5), date(2026, 10, 11))),
+        ("last 7 days", (date(2026, 10, 11), date(2026, 10, 17))),
+        ("in November", (date(2025, 11, 1), date(2025, 11, 30))),
+        ("yesterday", (date(2026, 10, 16), date(2026, 10, 16))),
+    ],
+)
+def test_period(text, expected, today):
+    assert parser.match_period(f"how much did I spend {text}", today)[0] == expected
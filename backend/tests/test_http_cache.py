@@ -0,0 +1,95 @@
+from datetime import datetime, timezone
+
+from fastapi import Request, Response
+import pytest
+
+from app import http_cache
+
+UPDATED_AT = datetime(2026, 10, 17, 9, 30, 15, 123456, tzinfo=timezone.utc)
+
+
+def _request(headers=None, query=b"limit=100&category=Food"):
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": "/expenses",
+            "query_string": query,
+            "headers": [
+                (k.lower().encode(), v.encode()) for k, v in (headers or {}).items()
+            ],
+        }
+    )
+
+
+@pytest.fixture(autouse=True)
+def version(monkeypatch):
+    monkeypatch.setattr(http_cache.data_version, "current", lambda db: (7, UPDATED_AT))
+
+
+def _check(headers=None, **kwargs):
+    response = Response()
+    return (
+        http_cache.check(_request(headers, **kwargs), response, db=object()),
+        response,
+    )
+
+
+def test_first_request_gets_validators():
+    not_modified, response = _check()
+    assert not_modified is None
+    assert response.headers["etag"].startswith('W/"7-')
+    assert response.headers["last-modified"] == "Sat, 17 Oct 2026 09:30:15 GMT"
+    assert response.headers["cache-control"] == "no-cache"
+
+
+def test_matching_etag_is_304():
+    _, first = _check()
+    not_modified, _ = _check({"If-None-Match": first.headers["etag"]})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == first.headers["etag"]
+
+
+def test_strong_form_and_lists_match_weakly():
+    _, first = _check()
+    opaque = first.headers["etag"].removeprefix("W/")
+    not_modified, _ = _check({"If-None-Match": f'"other", {opaque}'})
+    assert not_modified.status_code == 304
+
+
+def test_query_order_does_not_change_the_etag():
+    _, first = _check()
+    _, second = _check(query=b"category=Food&limit=100")
+    assert first.headers["etag"] == second.headers["etag"]
+
+
+def test_new_version_or_query_is_200(monkeypatch):
+    _, first = _check()
+    etag = first.headers["etag"]
+    assert _check({"If-None-Match": etag}, query=b"limit=50")[0] is None
+    monkeypatch.setattr(http_cache.data_version, "current", lambda db: (8, UPDATED_AT))
+    assert _check({"If-None-Match": etag})[0] is None
+
+
+@pytest.mark.parametrize(
+    "since, status",
+    [
+        ("Sat, 17 Oct 2026 09:30:15 GMT", 304),
+        ("Sat, 17 Oct 2026 10:00:00 GMT", 304),
+        ("Sat, 17 Oct 2026 09:30:14 GMT", None),
+        ("not a date", None),
+    ],
+)
+def test_if_modified_since(since, status):
+    not_modified, _ = _check({"If-Modified-Since": since})
+    assert getattr(not_modified, "status_code", None) == status
+
+
+def test_if_none_match_takes_precedence():
+    not_modified, _ = _check(
+        {
+            "If-None-Match": 'W/"6-000000000000"',
+            "If-Modified-Since": "Sat, 17 Oct 2026 10:00:00 GMT",
+        }
+    )
+    assert not_modified is None
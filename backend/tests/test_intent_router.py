@@ -0,0 +1,139 @@
+from datetime import date, datetime, timezone
+
+import pytest
+
+from app import expense_writes, intent_router, models
+from app.expense_parser import ParseResult
+from app.intent_router import (
+    ADD,
+    CHITCHAT,
+    COMPLEX,
+    QUERY,
+    Intent,
+    classify,
+    execute,
+)
+
+
+@pytest.mark.parametrize(
+    "text, route",
+    [
+        ("hi", CHITCHAT),
+        ("thanks!", CHITCHAT),
+        ("spent ₹500 on groceries yesterday", ADD),
+        ("how much on food this month?", QUERY),
+        ("how much did I spend?", COMPLEX),  # no date range
+        ("500 on groceries and 200 on fuel", COMPLEX),  # compound
+        ("paid 500 for 2 tickets", COMPLEX),  # two amounts
+        ("paid 70 for stamps", COMPLEX),  # no category
+        ("delete my last expense", COMPLEX),
+    ],
+)
+def test_classify(text, route, today):
+    assert classify(text, today).route == route
+
+
+def test_query_period(today):
+    intent = classify("how much on food last month?", today)
+    assert intent.period == (date(2026, 9, 1), date(2026, 9, 30))
+    assert intent.parsed.category == "Food"
+
+
+@pytest.mark.parametrize(
+    "text, listing",
+    [
+        ("show my food expenses last week", True),
+        ("list expenses from yesterday", True),
+        ("show the total on food this month", False),
+        ("how much on food this month?", False),
+    ],
+)
+def test_listing_queries(text, listing, today):
+    intent = classify(text, today)
+    assert (intent.route, intent.listing) == (QUERY, listing)
+
+
+def test_low_confidence_goes_to_the_agent(monkeypatch, today):
+    monkeypatch.setattr(intent_router, "INTENT_ROUTER_MIN_CONFIDENCE", 0.95)
+    assert classify("500 on groceries", today).route == COMPLEX
+
+
+def test_disabled_router_sends_everything_to_the_agent(monkeypatch, today):
+    monkeypatch.setattr(intent_router, "INTENT_ROUTER_ENABLED", False)
+    assert classify("hi", today).route == COMPLEX
+
+
+def test_chitchat_reply():
+    assert execute(None, classify("hello")) == intent_router.CHITCHAT_REPLY
+
+
+def test_other_currencies_are_refused_without_a_write(today):
+    intent = classify("spent $40 on coffee", today)
+    assert intent.route == ADD
+    # No session: the refusal must not touch the database
+    reply = execute(None, intent)
+    assert "USD 40.00" in reply and "₹" in reply
+
+
+def test_complex_intents_cannot_be_executed(today):
+    with pytest.raises(ValueError):
+        execute(None, classify("delete my last expense", today))
+
+
+CATEGORY = "__router_test__"
+
+
+def test_listing_returns_the_rows(db, monkeypatch):
+    expenses = [
+        models.Expense(
+            amount=amount,
+            category=CATEGORY,
+            description=f"item {n}",
+            date=datetime(2001, 2, day, 12, tzinfo=timezone.utc),
+        )
+        for n, (amount, day) in enumerate([(120, 3), (80, 4), (30, 4), (99, 9)])
+    ]
+    db.add_all(expenses)
+    expense_writes.record(db, expenses)
+
+    reply = execute(
+        db,
+        Intent(
+            QUERY,
+            ParseResult(category=CATEGORY),
+            period=(date(2001, 2, 3), date(2001, 2, 4)),
+            listing=True,
+        ),
+    )
+    assert reply.splitlines() == [
+        f"You spent ₹230.00 on {CATEGORY} from 2001-02-03 to 2001-02-04 "
+        "across 3 expenses.",
+        f"- 2001-02-03: ₹120.00 on {CATEGORY} (item 0)",
+        f"- 2001-02-04: ₹80.00 on {CATEGORY} (item 1)",
+        f"- 2001-02-04: ₹30.00 on {CATEGORY} (item 2)",
+    ]
+
+    monkeypatch.setattr(intent_router, "INTENT_ROUTER_MAX_ROWS", 1)
+    reply = execute(
+        db,
+        Intent(
+            QUERY,
+            ParseResult(category=CATEGORY),
+            period=(date(2001, 2, 1), date(2001, 2, 28)),
+            listing=True,
+        ),
+    )
+    assert reply.splitlines()[1:] == [
+        f"- 2001-02-03: ₹120.00 on {CATEGORY} (item 0)",
+        "...and 3 more.",
+    ]
+
+
+def test_listing_nothing(db):
+    intent = Intent(
+        QUERY,
+        ParseResult(category=CATEGORY),
+        period=(date(2001, 3, 1), date(2001, 3, 1)),
+        listing=True,
+    )
+    assert execute(db, intent) == f"You have no expenses on {CATEGORY} on 2001-03-01."
@@ -0,0 +1,79 @@
+import pytest
+
+from app import jobs
+
+KIND = "__jobs_test__"
+
+
+@pytest.fixture
+def queue(db, monkeypatch):
+    """An empty queue of test jobs; other kinds are invisible to workers."""
+    monkeypatch.setattr(jobs, "HANDLERS", {})
+    monkeypatch.setattr(jobs, "JOB_RETRY_BASE", 0)
+    with jobs.engine.begin() as connection:
+        connection.exec_driver_sql("DELETE FROM jobs WHERE kind = %(k)s", {"k": KIND})
+    yield
+    with jobs.engine.begin() as connection:
+        connection.exec_driver_sql("DELETE FROM jobs WHERE kind = %(k)s", {"k": KIND})
+
+
+def _register(func, batch_size=1, max_attempts=3):
+    jobs.handler(KIND, batch_size, max_attempts)(func)
+
+
+def _statuses(ids):
+    return [(jobs.get_job(i)["status"], jobs.get_job(i)["attempts"]) for i in ids]
+
+
+def test_batches_are_claimed_once_in_order(queue):
+    calls = []
+    _register(calls.append, batch_size=2)
+    ids = [jobs.submit(KIND, {"n": n}) for n in range(3)]
+    worker = jobs.Worker("test")
+
+    assert worker.run_once() == 2
+    assert worker.run_once() == 1
+    assert worker.run_once() == 0
+    assert calls == [[{"n": 0}, {"n": 1}], [{"n": 2}]]
+    assert _statuses(ids) == [("done", 1)] * 3
+
+
+def test_claimed_jobs_are_skipped_by_other_workers(queue):
+    _register(lambda payloads: None, batch_size=2)
+    ids = [jobs.submit(KIND, {"n": n}) for n in range(3)]
+    with jobs.engine.connect() as a, jobs.engine.connect() as b:
+        first = jobs.Worker("a").claim(a)
+        second = jobs.Worker("b").claim(b)
+    assert [job.id for job in first] == ids[:2]
+    assert [job.id for job in second] == ids[2:]
+    assert jobs.get_job(ids[2])["locked_by"] == "b"
+
+
+def test_failing_job_is_retried_then_kept_as_failed(queue):
+    def fail(payloads):
+        raise RuntimeError("boom")
+
+    _register(fail, max_attempts=2)
+    job_id = jobs.submit(KIND, {})
+    worker = jobs.Worker("test")
+
+    assert worker.run_once() == 1
+    job = jobs.get_job(job_id)
+    assert (job["status"], job["attempts"]) == ("queued", 1)
+    assert job["last_error"] == "RuntimeError: boom"
+
+    assert worker.run_once() == 1
+    assert _statuses([job_id]) == [("failed", 2)]
+    assert worker.run_once() == 0
+
+
+def test_failed_batch_is_retried_job_by_job(queue):
+    def handle(payloads):
+        if any(p["bad"] for p in payloads):
+            raise ValueError("bad payload")
+
+    _register(handle, batch_size=3)
+    ids = [jobs.submit(KIND, {"bad": bad}) for bad in (False, True, False)]
+
+    assert jobs.Worker("test").run_once() == 3
+    assert _statuses(ids) == [("done", 1), ("queued", 1), ("done", 1)]
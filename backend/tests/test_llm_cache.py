@@ -0,0 +1,30 @@
+import pytest
+
+from app import memory
+from app.llm_cache import CompletionCache, chat_ollama
+
+
+@pytest.mark.parametrize(
+    "mode, temperature, serves",
+    [
+        ("on", 0, True),
+        ("on", None, False),
+        ("on", 0.7, False),
+        ("replay", None, True),
+        ("record", 0, False),
+        ("off", 0, False),
+    ],
+)
+def test_which_calls_are_served(mode, temperature, serves):
+    cache = CompletionCache("phi3:mini", temperature, mode=mode)
+    assert cache._serves() is serves
+
+
+def test_chat_ollama_keys_the_cache_on_temperature():
+    llm = chat_ollama("phi3:mini", temperature=0)
+    assert (llm.cache.model, llm.cache.temperature) == ("phi3:mini", 0)
+    assert llm.cache.deterministic
+
+
+def test_memory_summaries_are_cacheable():
+    assert memory.get_llm().cache.deterministic
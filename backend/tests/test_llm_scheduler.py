@@ -0,0 +1,132 @@
+import asyncio
+import threading
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import pytest
+
+from app import llm_scheduler
+from app.llm_scheduler import (
+    ClientGone,
+    DeadlineExceeded,
+    LLMScheduler,
+    Overloaded,
+    Ticket,
+)
+
+
+def _wait_until(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def _queue_in_thread(scheduler, ticket, admitted):
+    def run():
+        scheduler.acquire(ticket)
+        admitted.append(ticket.priority)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_full_queue_is_refused_with_429():
+    scheduler = LLMScheduler(concurrency=1, max_queue=1, max_queue_bulk=1)
+    scheduler.acquire(Ticket())
+    admitted = []
+    thread = _queue_in_thread(scheduler, Ticket(), admitted)
+    _wait_until(lambda: scheduler.stats()["queued"] == 1)
+
+    with pytest.raises(Overloaded) as refused:
+        scheduler.acquire(Ticket())
+    assert refused.value.status_code == 429
+    assert refused.value.retry_after >= 1
+
+    scheduler.release()
+    thread.join(2)
+    assert admitted == ["default"]
+    assert scheduler.stats()["results"]["default.rejected"] == 1
+
+
+def test_bulk_work_has_a_shorter_queue():
+    scheduler = LLMScheduler(concurrency=1, max_queue=1, max_queue_bulk=0)
+    scheduler.acquire(Ticket())
+    with pytest.raises(Overloaded):
+        scheduler.acquire(Ticket("bulk"))
+    admitted = []
+    thread = _queue_in_thread(scheduler, Ticket("interactive"), admitted)
+    _wait_until(lambda: scheduler.stats()["queued"] == 1)
+    scheduler.release()
+    thread.join(2)
+    assert admitted == ["interactive"]
+
+
+def test_released_slot_goes_to_the_highest_priority():
+    scheduler = LLMScheduler(concurrency=1, max_queue=4)
+    scheduler.acquire(Ticket())
+    admitted = []
+    threads = []
+    for priority in ("bulk", "default", "interactive"):
+        threads.append(_queue_in_thread(scheduler, Ticket(priority), admitted))
+        _wait_until(lambda n=len(threads): scheduler.stats()["queued"] == n)
+    for _ in threads:
+        before = len(admitted)
+        scheduler.release()
+        _wait_until(lambda: len(admitted) == before + 1)
+    assert admitted == ["interactive", "default", "bulk"]
+
+
+def test_deadline_while_queued_is_503():
+    scheduler = LLMScheduler(concurrency=1)
+    scheduler.acquire(Ticket())
+    with pytest.raises(DeadlineExceeded) as dropped:
+        scheduler.acquire(Ticket(deadline=time.monotonic() + 0.05))
+    assert dropped.value.status_code == 503
+    assert scheduler.stats()["queued"] == 0
+
+
+def test_passed_deadline_is_refused_even_with_a_free_slot():
+    scheduler = LLMScheduler(concurrency=1)
+    with pytest.raises(DeadlineExceeded):
+        scheduler.acquire(Ticket(deadline=time.monotonic() - 1))
+    assert scheduler.stats()["active"] == 0
+
+
+def test_disconnected_client_leaves_the_queue(monkeypatch):
+    monkeypatch.setattr(llm_scheduler, "LLM_DISCONNECT_POLL", 0.01)
+    scheduler = LLMScheduler(concurrency=1)
+    scheduler.acquire(Ticket())
+
+    async def gone():
+        return True
+
+    with pytest.raises(ClientGone) as dropped:
+        asyncio.run(scheduler.aacquire(Ticket(disconnected=gone)))
+    assert dropped.value.status_code == 503
+    scheduler.release()
+    assert (scheduler.stats()["active"], scheduler.stats()["queued"]) == (0, 0)
+
+
+def test_admission_errors_map_to_http():
+    from app.main import llm_not_admitted
+
+    app = FastAPI()
+    app.add_exception_handler(llm_scheduler.AdmissionError, llm_not_admitted)
+
+    @app.get("/full")
+    def full():
+        raise Overloaded("LLM queue is full", retry_after=7)
+
+    @app.get("/late")
+    def late():
+        raise DeadlineExceeded("Request deadline passed")
+
+    client = TestClient(app)
+    response = client.get("/full")
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "7"
+    assert response.json() == {"detail": "LLM queue is full"}
+    assert client.get("/late").status_code == 503
@@ -0,0 +1,71 @@
+from datetime import date, datetime, timezone
+
+import pytest
+
+from app import rollups
+from app.rollups import bucket_floor, summarize
+
+
+@pytest.mark.parametrize(
+    "granularity, expected",
+    [
+        ("day", date(2026, 10, 15)),
+        ("week", date(2026, 10, 12)),
+        ("month", date(2026, 10, 1)),
+    ],
+)
+def test_bucket_floor(granularity, expected):
+    assert bucket_floor(date(2026, 10, 15), granularity) == expected
+
+
+def test_unknown_granularity():
+    with pytest.raises(ValueError):
+        summarize(None, date(2026, 10, 1), date(2026, 10, 2), granularity="year")
+
+
+def test_rollup_params_accept_orm_objects_and_dicts():
+    class Row:
+        amount, category, date = 5, "Food", date(2026, 10, 1)
+
+    params = rollups.rollup_params(
+        [Row(), {"amount": 7.5, "category": "Rent", "date": None}]
+    )
+    assert params == {
+        "amounts": [5.0, 7.5],
+        "categories": ["Food", "Rent"],
+        "dates": ["2026-10-01", None],
+    }
+
+
+CATEGORY = "__rollups_test__"
+
+
+def _expense(amount, day):
+    return {
+        "amount": amount,
+        "category": CATEGORY,
+        "date": datetime(2026, 10, day, 12, tzinfo=timezone.utc),
+    }
+
+
+def test_upserts_accumulate_and_summaries_are_exact(db):
+    rollups.record_expenses(db, [_expense(100, 10), _expense(40, 12)])
+    rollups.record_expenses(db, [_expense(60, 12), _expense(5, 20)])
+
+    day = summarize(db, date(2026, 10, 10), date(2026, 10, 12), CATEGORY)
+    assert (day["total"], day["count"]) == (200, 3)
+    assert (day["min_amount"], day["max_amount"]) == (40, 100)
+    assert [b.total for b in day["buckets"]] == [100, 100]
+
+    # Month buckets widen the range to the whole month
+    month = summarize(db, date(2026, 10, 10), date(2026, 10, 12), CATEGORY, "month")
+    assert (month["total"], month["count"]) == (205, 4)
+
+    week = summarize(db, date(2026, 10, 12), date(2026, 10, 18), CATEGORY, "week")
+    assert (week["total"], week["count"]) == (100, 2)
+
+
+def test_summary_of_an_empty_range(db):
+    summary = summarize(db, date(1999, 1, 1), date(1999, 1, 31), CATEGORY)
+    assert summary["total"] == 0 and summary["count"] == 0
+    assert summary["min_amount"] is None
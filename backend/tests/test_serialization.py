@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta, timezone
+import importlib
+import sys
+
+import pytest
+
+from app import serialization
+from app.schemas import ExpenseOut
+
+IST = timezone(timedelta(hours=5, minutes=30))
+
+ROWS = [
+    (250.0, "Transport", datetime(2026, 10, 17, 8, 30, tzinfo=timezone.utc), None, 1),
+    (12.5, "Food", datetime(2026, 10, 16, 21, 5, 1, 250000, IST), "₹ chai", 2),
+    (100.0, "Rent", None, "no date", 3),
+]
+
+
+@pytest.fixture(params=["orjson", "json"])
+def encoder(request, monkeypatch):
+    if request.param == "orjson":
+        pytest.importorskip("orjson")
+        yield serialization
+        return
+    # Reload without orjson to get the standard library fallback
+    monkeypatch.setitem(sys.modules, "orjson", None)
+    yield importlib.reload(serialization)
+    monkeypatch.undo()
+    importlib.reload(serialization)
+
+
+def _expected(row):
+    return ExpenseOut.model_validate(dict(zip(serialization.FIELDS, row)))
+
+
+def test_fields_follow_expense_out():
+    assert serialization.FIELDS == tuple(ExpenseOut.model_fields)
+
+
+def test_array_matches_expense_out(encoder):
+    expected = "[" + ",".join(_expected(row).model_dump_json() for row in ROWS) + "]"
+    assert encoder.encode_expenses(ROWS) == expected.encode()
+
+
+def test_lines_match_expense_out(encoder):
+    expected = "".join(_expected(row).model_dump_json() + "\n" for row in ROWS)
+    assert encoder.encode_expense_lines(ROWS) == expected.encode()
+
+
+def test_empty_page(encoder):
+    assert encoder.encode_expenses([]) == b"[]"
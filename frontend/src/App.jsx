@@ -13,9 +13,17 @@ function App() {
 
   const fetchExpenses = async () => {
     try {
-      const response = await fetch("http://localhost:8000/expenses");
-      const data = await response.json();
-      setExpenses(data);
+      // GET /expenses is paginated: follow X-Next-Cursor to the last page
+      const all = [];
+      let after = null;
+      do {
+        const params = new URLSearchParams({ limit: "1000" });
+        if (after) params.set("after", after);
+        const response = await fetch(`http://localhost:8000/expenses?${params}`);
+        all.push(...(await response.json()));
+        after = response.headers.get("X-Next-Cursor");
+      } while (after);
+      setExpenses(all);
     } catch (error) {
       console.error("Error fetching expenses:", error);
     }
@@ -29,35 +29,7 @@ export default function ChatBox() {
             // If it looks like an expense, try the direct expense endpoint first
             if (isExpensePattern) {
                 try {
-                    // Use the debug endpoint to parse the expense first
-                    const debugRes = await axios.post("http://localhost:8000/debug/parse-expense", {
-                        text: userMsg,
-                    });
-
-                    if (debugRes.data.success) {
-                        // If parsing succeeded, use the parsed data to add the expense
-                        const parsed = debugRes.data.parsed;
-                        const addRes = await axios.post("http://localhost:8000/add-expense", parsed);
-
-                        if (addRes.data) {
-                            const { amount, category, date } = addRes.data;
-                            // Format date nicely
-                            const formattedDate = new Date(date).toLocaleDateString(undefined, {
-                                year: 'numeric',
-                                month: 'short',
-                                day: 'numeric'
-                            });
-
-                            setMessages((prev) => [
-                                ...prev,
-                                { role: "assistant", content: `✅ Added expense: ₹${amount} for ${category} on ${formattedDate}` }
-                            ]);
-                            setIsLoading(false);
-                            return;
-                        }
-                    }
-
-                    // Try the direct method as fallback
+                    // /chat-expense adds every expense in the message at once
                     const directResult = await addExpenseDirectly(userMsg);
                     if (directResult) {
                         setMessages((prev) => [
@@ -131,6 +103,17 @@ export default function ChatBox() {
         }
     };
 
+    const formatAddedExpense = ({ amount, category, date, description }) => {
+        // Format date nicely
+        const formattedDate = new Date(date).toLocaleDateString(undefined, {
+            year: 'numeric',
+            month: 'short',
+            day: 'numeric'
+        });
+
+        return `✅ Added expense: ₹${amount} for ${category || 'Miscellaneous'} on ${formattedDate}${description ? ` (${description})` : ''}`;
+    };
+
     // Direct expense addition method
     const addExpenseDirectly = async (expenseText) => {
         try {
@@ -139,17 +122,8 @@ export default function ChatBox() {
                 text: expenseText,
             });
 
-            if (res.data && res.data.amount) {
-                const { amount, category, date, description } = res.data;
-
-                // Format date nicely
-                const formattedDate = new Date(date).toLocaleDateString(undefined, {
-                    year: 'numeric',
-                    month: 'short',
-                    day: 'numeric'
-                });
-
-                return `✅ Added expense: ₹${amount} for ${category || 'Miscellaneous'} on ${formattedDate}${description ? ` (${description})` : ''}`;
+            if (Array.isArray(res.data) && res.data.length > 0) {
+                return res.data.map(formatAddedExpense).join("\n");
             }
 
             // If that fails, try the fallback method using regular add-expense endpoint
@@ -200,7 +174,7 @@ export default function ChatBox() {
                 {messages.map((msg, idx) => (
                     <div
                         key={idx}
-                        className={`p-3 rounded-lg max-w-md ${msg.role === "user"
+                        className={`p-3 rounded-lg max-w-md whitespace-pre-line ${msg.role === "user"
                             ? "bg-blue-100 ml-auto text-right"
                             : "bg-gray-200 mr-auto"
                             }`}